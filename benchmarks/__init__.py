@@ -0,0 +1 @@
+"""gxsmread benchmarks (run with asv, see asv.conf.json)."""
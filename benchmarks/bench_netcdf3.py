@@ -0,0 +1,32 @@
+"""Benchmarks of netcdf3.read_header() and netcdf3.read_metadata()."""
+
+import os
+from gxsmread import netcdf3
+from gxsmread import synthetic
+
+# The header size does not depend on the scan size
+SCAN_SIZE = 256
+
+
+class ReadHeader:
+    timeout = 300
+
+    def setup_cache(self):
+        return synthetic.write_scan_set(os.getcwd(), 'scan', SCAN_SIZE,
+                                        seed=0)[0]
+
+    def setup(self, filename):
+        with open(filename, 'rb') as file:
+            self.contents = file.read()
+
+    def time_read_header(self, filename):
+        netcdf3.read_header(filename)
+
+    def time_read_header_bytes(self, filename):
+        netcdf3.read_header(self.contents)
+
+    def time_read_metadata(self, filename):
+        netcdf3.read_metadata(filename)
+
+    def time_read_metadata_bytes(self, filename):
+        netcdf3.read_metadata(self.contents)
@@ -0,0 +1,57 @@
+"""Benchmarks of each preprocess stage (see preprocess.preprocess())."""
+
+import os
+import xarray
+from gxsmread import channel_config as cc
+from gxsmread import filename as fn
+from gxsmread import preprocess as pp
+from gxsmread import synthetic
+
+SCAN_SIZES = [256, 1024, 4096]
+
+
+class PreprocessStages:
+    params = SCAN_SIZES
+    param_names = ['size']
+    timeout = 300
+    # Stages modify their input dataset: each run needs a fresh setup().
+    number = 1
+    repeat = 10
+
+    def setup_cache(self):
+        return {size: synthetic.write_scan_set(os.getcwd(), f'scan{size}',
+                                               size, seed=0)[0]
+                for size in SCAN_SIZES}
+
+    def setup(self, filenames, size):
+        self.filename = filenames[size]
+        self.lazy_ds = xarray.open_dataset(self.filename, chunks={})
+        self.ds = xarray.open_dataset(self.filename).load()
+        self.channel_config = cc.CreateGxsmChannelConfig(
+            None, self.ds, fn.parse_gxsm_filename(self.filename), False,
+            False)
+        self.cleaned_ds = pp.clean_kept_coords(
+            pp.clean_floatfield(self.ds.copy()))
+        self.converted_ds = pp.convert_floatfield(self.cleaned_ds.copy(),
+                                                  self.channel_config)
+
+    def teardown(self, filenames, size):
+        self.lazy_ds.close()
+
+    def time_preprocess(self, filenames, size):
+        pp.preprocess(self.lazy_ds, False, False, True, None)
+
+    def time_load_metadata(self, filenames, size):
+        pp.load_metadata(self.lazy_ds, self.filename)
+
+    def time_clean_floatfield(self, filenames, size):
+        pp.clean_floatfield(self.ds)
+
+    def time_clean_kept_coords(self, filenames, size):
+        pp.clean_kept_coords(self.ds)
+
+    def time_convert_floatfield(self, filenames, size):
+        pp.convert_floatfield(self.cleaned_ds, self.channel_config)
+
+    def time_clean_up_metadata(self, filenames, size):
+        pp.clean_up_metadata(self.converted_ds, [self.channel_config.name])
@@ -0,0 +1,66 @@
+"""Benchmarks of read.open_dataset() and read.open_mfdataset()."""
+
+import os
+from gxsmread import read
+from gxsmread import synthetic
+
+SCAN_SIZES = [256, 1024, 4096]
+CHANNEL_COUNTS = [1, 4, 16]
+
+
+def write_scan_sets() -> dict[int, list[str]]:
+    """Write a scan set of max(CHANNEL_COUNTS) channels for each size."""
+    return {size: synthetic.write_scan_set(
+                os.getcwd(), f'scan{size}', size,
+                num_channels=max(CHANNEL_COUNTS), seed=0)
+            for size in SCAN_SIZES}
+
+
+class OpenDataset:
+    params = (SCAN_SIZES, [False, True])
+    param_names = ['size', 'memmap']
+    timeout = 300
+
+    def setup_cache(self):
+        return write_scan_sets()
+
+    def setup(self, scan_sets, size, memmap):
+        self.filename = scan_sets[size][0]
+
+    def time_open_dataset(self, scan_sets, size, memmap):
+        read.open_dataset(self.filename, use_physical_units=False,
+                          memmap=memmap)
+
+    def time_open_dataset_load(self, scan_sets, size, memmap):
+        read.open_dataset(self.filename, use_physical_units=False,
+                          memmap=memmap).load()
+
+    def peakmem_open_dataset_load(self, scan_sets, size, memmap):
+        read.open_dataset(self.filename, use_physical_units=False,
+                          memmap=memmap).load()
+
+
+class OpenMFDataset:
+    params = (SCAN_SIZES, CHANNEL_COUNTS, [False, True])
+    param_names = ['size', 'channels', 'fast_merge']
+    timeout = 600
+
+    def setup_cache(self):
+        return write_scan_sets()
+
+    def setup(self, scan_sets, size, channels, fast_merge):
+        self.paths = scan_sets[size][:channels]
+
+    def time_open_mfdataset(self, scan_sets, size, channels, fast_merge):
+        read.open_mfdataset(self.paths, use_physical_units=False,
+                            fast_merge=fast_merge)
+
+    def time_open_mfdataset_load(self, scan_sets, size, channels,
+                                 fast_merge):
+        read.open_mfdataset(self.paths, use_physical_units=False,
+                            fast_merge=fast_merge).load()
+
+    def peakmem_open_mfdataset_load(self, scan_sets, size, channels,
+                                    fast_merge):
+        read.open_mfdataset(self.paths, use_physical_units=False,
+                            fast_merge=fast_merge).load()
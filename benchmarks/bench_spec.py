@@ -0,0 +1,39 @@
+"""Benchmarks of read.open_spec() and read.iter_spec()."""
+
+import os
+from gxsmread import read
+from gxsmread import synthetic
+
+SPEC_ROWS = [1000, 10000, 100000, 1000000]
+
+
+class OpenSpec:
+    params = SPEC_ROWS
+    param_names = ['rows']
+    timeout = 300
+
+    def setup_cache(self):
+        return {rows: synthetic.write_spec_file(
+                    os.path.join(os.getcwd(), f'spec{rows}.vpdata'), rows,
+                    seed=0)
+                for rows in SPEC_ROWS}
+
+    def setup(self, filenames, rows):
+        self.filename = filenames[rows]
+
+    def time_open_spec(self, filenames, rows):
+        read.open_spec(self.filename)
+
+    def peakmem_open_spec(self, filenames, rows):
+        read.open_spec(self.filename)
+
+    def time_open_spec_usecols(self, filenames, rows):
+        read.open_spec(self.filename, usecols=[0, 5])
+
+    def time_iter_spec(self, filenames, rows):
+        for _ in read.iter_spec(self.filename):
+            pass
+
+    def peakmem_iter_spec(self, filenames, rows):
+        for _ in read.iter_spec(self.filename):
+            pass
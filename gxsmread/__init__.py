@@ -1,2 +1,5 @@
 # Expose top-level methods
-from gxsmread.read import open_mfdataset, open_dataset, open_spec
+from gxsmread.read import (open_mfdataset, open_dataset, open_directory,
+                           open_series,
+                           open_spec, iter_spec, open_spec_many,
+                           open_spec_metadata, open_spec_grid)
@@ -0,0 +1,95 @@
+"""gxsmread command line interface.
+
+Usage:
+    gxsmread convert PATH [PATH ...] -o OUTPUT_DIR [options]
+    python -m gxsmread convert PATH [PATH ...] -o OUTPUT_DIR [options]
+
+Run with --help for the list of commands and options.
+"""
+
+import argparse
+import os
+import sys
+from . import convert
+from . import read
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the command line interface, returning the exit code."""
+    parser = _create_parser()
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+def _create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='gxsmread',
+                                     description='Read gxsm data files.')
+    subparsers = parser.add_subparsers(required=True)
+
+    convert_parser = subparsers.add_parser(
+        'convert', help='Convert gxsm scans to Zarr or NetCDF4 stores.',
+        description='Convert each gxsm scan set (the .nc files sharing a '
+        'base filename) to a single chunked, compressed Zarr or NetCDF4 '
+        'store. Scan sets whose store is up to date are skipped.')
+    convert_parser.add_argument(
+        'paths', nargs='+',
+        help='a directory containing the .nc files, or the files themselves.')
+    convert_parser.add_argument('-o', '--output-dir', required=True,
+                                help='the directory to write the stores to.')
+    convert_parser.add_argument(
+        '-f', '--format', choices=list(convert.FORMAT_SUFFIXES),
+        default=convert.FORMAT_ZARR, help='the store format.')
+    convert_parser.add_argument('-c', '--channels-config',
+                                help='the channels config toml file.')
+    convert_parser.add_argument('--raw', action='store_true',
+                                help='do not convert to physical units.')
+    convert_parser.add_argument(
+        '--allow-convert-from-metadata', action='store_true',
+        help='use the metadata conversion factors as a fallback.')
+    convert_parser.add_argument(
+        '-j', '--workers', type=int,
+        help='the number of worker processes (default: number of CPUs).')
+    convert_parser.add_argument(
+        '--chunks', type=int, nargs=2, metavar=('DIMY', 'DIMX'),
+        default=convert.DEFAULT_CHUNKS, help='the data chunk shape.')
+    convert_parser.add_argument(
+        '--compression-level', type=int,
+        default=convert.DEFAULT_COMPRESSION_LEVEL,
+        help='the compression level.')
+    convert_parser.add_argument('--overwrite', action='store_true',
+                                help='convert up-to-date scan sets too.')
+    convert_parser.set_defaults(func=_run_convert)
+    return parser
+
+
+def _run_convert(args: argparse.Namespace) -> int:
+    # Directories are expanded to their gxsm files, so that they can be
+    # mixed with files (and other directories). Scan sets are then grouped
+    # by directory (see convert.group_scan_sets()).
+    paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            for scan_set_paths in read.find_scan_sets(path).values():
+                paths.extend(scan_set_paths)
+        else:
+            paths.append(path)
+    statuses = convert.convert(
+        paths, args.output_dir, output_format=args.format,
+        workers=args.workers, channels_config_path=args.channels_config,
+        use_physical_units=not args.raw,
+        allow_convert_from_metadata=args.allow_convert_from_metadata,
+        chunks=tuple(args.chunks), compression_level=args.compression_level,
+        overwrite=args.overwrite)
+
+    num_errors = 0
+    for file_base, status in statuses.items():
+        if isinstance(status, Exception):
+            num_errors += 1
+            print(f'{file_base}: error: {status!r}', file=sys.stderr)
+        else:
+            print(f'{file_base}: {status}')
+    return 1 if num_errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,264 @@
+"""Asyncio API for reading gxsm scans and spectra.
+
+The read methods (see read.py) block while reading and parsing files, which
+would stall an asyncio event loop (e.g. of an ingestion service). This file
+contains async equivalents, which run the read methods in a bounded
+executor (worker threads, by default), so that a slow read (e.g. over NFS)
+or a large scan only occupies one worker.
+
+An AsyncReader bounds the number of files being read concurrently
+(max_concurrency): further reads wait for a free slot, without blocking the
+event loop. The module-level methods use a default AsyncReader per event
+loop (see get_default_reader()), shut down along with its loop.
+
+Reads can be cancelled (e.g. with asyncio.wait_for() or task.cancel()). A
+read still waiting for a slot is dropped; one already running in a worker
+cannot be interrupted: it holds its slot until it completes, and the
+dataset it returns is then closed.
+
+Note that, by default, the returned datasets are loaded into memory in the
+worker (see load), since reading lazily-loaded data later on would block the
+event loop.
+
+Basic usage:
+    async with AsyncReader(max_concurrency=4) as reader:
+        ds = await reader.open_mfdataset(...)
+    ds = await open_dataset_async(...)
+    spec_df = await open_spec_async(...)
+"""
+
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable
+import asyncio
+import weakref
+import numpy as np
+import pandas as pd
+import xarray
+from . import read
+from . import spec
+
+DEFAULT_MAX_CONCURRENCY = 4
+WORKER_THREAD_NAME_PREFIX = 'gxsmread-aio'
+
+_default_readers = weakref.WeakKeyDictionary()
+
+
+class AsyncReader:
+    """Runner of the read methods in a bounded executor.
+
+    Can be used as an (async) context manager, shutting down its executor
+    on exit (if the AsyncReader created it).
+
+    Attributes:
+        max_concurrency: the maximum number of reads running at once.
+    """
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 executor: Executor | None = None):
+        """Create an AsyncReader.
+
+        Args:
+            max_concurrency: the maximum number of reads running at once.
+            executor: optional executor to run the reads in (e.g. a
+                ProcessPoolExecutor, for CPU-bound spec parsing; the read
+                arguments and results must then be picklable). If None, a
+                ThreadPoolExecutor of max_concurrency workers is used.
+
+        Raises:
+            ValueError if max_concurrency is less than 1.
+        """
+        if max_concurrency < 1:
+            raise ValueError(f'max_concurrency must be at least 1, got '
+                             f'{max_concurrency}.')
+        self.max_concurrency = max_concurrency
+        self._owns_executor = executor is None
+        if self._owns_executor:
+            executor = ThreadPoolExecutor(
+                max_concurrency, thread_name_prefix=WORKER_THREAD_NAME_PREFIX)
+        self._executor = executor
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Shut down the executor, if the AsyncReader created it.
+
+        Reads already running complete in the background.
+        """
+        if self._owns_executor:
+            self._executor.shutdown(wait=False)
+
+    async def open_dataset(self, filename_or_obj: str | Path,
+                           load: bool = True, **kwargs) -> xarray.Dataset:
+        """Async equivalent of read.open_dataset().
+
+        Args:
+            filename_or_obj: see read.open_dataset().
+            load: whether to load the dataset into memory (in the worker).
+            **kwargs: arguments passed to read.open_dataset().
+
+        Returns:
+            See read.open_dataset().
+        """
+        return await self.run(_open_and_load, read.open_dataset, load,
+                              filename_or_obj, **kwargs)
+
+    async def open_mfdataset(self, paths: str | list[str | Path],
+                             load: bool = True, **kwargs) -> xarray.Dataset:
+        """Async equivalent of read.open_mfdataset().
+
+        Args:
+            paths: see read.open_mfdataset().
+            load: whether to load the dataset into memory (in the worker).
+            **kwargs: arguments passed to read.open_mfdataset().
+
+        Returns:
+            See read.open_mfdataset().
+        """
+        return await self.run(_open_and_load, read.open_mfdataset, load,
+                              paths, **kwargs)
+
+    async def open_spec(self, filename: str | Path, **kwargs
+                        ) -> pd.DataFrame | tuple[np.ndarray
+                                                  | xarray.Dataset,
+                                                  spec.SpecMetadata]:
+        """Async equivalent of read.open_spec().
+
+        Args:
+            filename: see read.open_spec().
+            **kwargs: arguments passed to read.open_spec().
+
+        Returns:
+            See read.open_spec().
+        """
+        return await self.run(read.open_spec, filename, **kwargs)
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Run a (blocking) function in the executor, once a slot is free.
+
+        Args:
+            func: the function to run.
+            *args: positional arguments passed to func.
+            **kwargs: keyword arguments passed to func.
+
+        Returns:
+            The result of func.
+        """
+        await self._semaphore.acquire()
+        try:
+            future = asyncio.get_running_loop().run_in_executor(
+                self._executor, partial(func, *args, **kwargs))
+        except BaseException:
+            self._semaphore.release()
+            raise
+        # The slot is only freed once func completes (even if cancelled).
+        future.add_done_callback(lambda _: self._semaphore.release())
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            future.add_done_callback(_close_result)
+            raise
+
+
+def get_default_reader() -> AsyncReader:
+    """Get the default AsyncReader of the running event loop.
+
+    It is created (with DEFAULT_MAX_CONCURRENCY) on first use, and closed
+    once its loop is garbage collected. As a reader waiting for a slot
+    references its loop, the readers of closed loops are also closed here.
+    """
+    for closed_loop in [loop for loop in _default_readers
+                        if loop.is_closed()]:
+        _default_readers.pop(closed_loop).close()
+
+    loop = asyncio.get_running_loop()
+    reader = _default_readers.get(loop)
+    if reader is None:
+        reader = _default_readers[loop] = AsyncReader()
+        # Not reader.close, which would keep the reader (and so the loop)
+        # alive.
+        weakref.finalize(loop, reader._executor.shutdown, wait=False)
+    return reader
+
+
+async def open_dataset_async(filename_or_obj: str | Path,
+                             reader: AsyncReader | None = None,
+                             **kwargs) -> xarray.Dataset:
+    """Async equivalent of read.open_dataset().
+
+    Args:
+        filename_or_obj: see read.open_dataset().
+        reader: the AsyncReader to read with. If None, the default one is
+            used (see get_default_reader()).
+        **kwargs: arguments passed to AsyncReader.open_dataset().
+
+    Returns:
+        See read.open_dataset().
+    """
+    reader = reader or get_default_reader()
+    return await reader.open_dataset(filename_or_obj, **kwargs)
+
+
+async def open_mfdataset_async(paths: str | list[str | Path],
+                               reader: AsyncReader | None = None,
+                               **kwargs) -> xarray.Dataset:
+    """Async equivalent of read.open_mfdataset().
+
+    Args:
+        paths: see read.open_mfdataset().
+        reader: the AsyncReader to read with. If None, the default one is
+            used (see get_default_reader()).
+        **kwargs: arguments passed to AsyncReader.open_mfdataset().
+
+    Returns:
+        See read.open_mfdataset().
+    """
+    reader = reader or get_default_reader()
+    return await reader.open_mfdataset(paths, **kwargs)
+
+
+async def open_spec_async(filename: str | Path,
+                          reader: AsyncReader | None = None, **kwargs
+                          ) -> pd.DataFrame | tuple[np.ndarray
+                                                    | xarray.Dataset,
+                                                    spec.SpecMetadata]:
+    """Async equivalent of read.open_spec().
+
+    Args:
+        filename: see read.open_spec().
+        reader: the AsyncReader to read with. If None, the default one is
+            used (see get_default_reader()).
+        **kwargs: arguments passed to read.open_spec().
+
+    Returns:
+        See read.open_spec().
+    """
+    reader = reader or get_default_reader()
+    return await reader.open_spec(filename, **kwargs)
+
+
+def _open_and_load(open_func: Callable, load: bool, *args, **kwargs
+                   ) -> xarray.Dataset:
+    ds = open_func(*args, **kwargs)
+    if load:
+        try:
+            ds.load()
+        except BaseException:
+            ds.close()
+            raise
+    return ds
+
+
+def _close_result(future: asyncio.Future):
+    """Close the dataset returned by a cancelled read, if any."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    result = future.result()
+    if isinstance(result, xarray.Dataset):
+        result.close()
@@ -0,0 +1,309 @@
+"""Reading gxsm files directly out of zip and tar archives.
+
+Measurement sessions are often stored as a single archive (.zip, .tar,
+.tar.gz, ...) holding thousands of gxsm files. Extracting a whole archive to
+read a few scans costs time and scratch disk. An Archive instead lists its
+members, groups the scan (.nc) members into scan sets by their file_base
+(see filename.parse_gxsm_filename()), and reads only the requested members
+into memory, passing them to the buffer-reading methods of read.py (no
+temporary files are written). As archives often hold several directories
+(e.g. one per day), scan sets are keyed by their member directory and
+file_base, e.g. 'day1/my_scan'.
+
+Zip archives compress each member separately, so any member can be read
+directly (random access). Compressed tar archives (e.g. .tar.gz) are a
+single compressed stream: listing them requires decompressing the whole
+archive once, and reading a member requires decompressing up to it. Members
+are therefore always read in archive order, and iterating over many scan
+sets or spec files (see iter_scan_sets() and iter_spec()) reads the archive
+in a single pass.
+
+Basic usage:
+    with Archive('/path/to/session.tar.gz') as archive:
+        scan_sets = archive.scan_sets()
+        ds = archive.open_mfdataset('session/my_scan',
+                                    channels_config_path=...)
+        spec_df = archive.open_spec('session/my_spec-VP001-VP.vpdata')
+        for scan_set, ds in archive.iter_scan_sets():
+            [...]
+"""
+
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Iterable, Iterator
+import fnmatch
+import tarfile
+import zipfile
+import numpy as np
+import pandas as pd
+import xarray
+from . import filename as fn
+from . import read
+from . import spec
+
+SCAN_PATTERN = '*.nc'
+SPEC_PATTERN = '*.vpdata'
+
+
+class Archive:
+    """A zip or tar archive of gxsm files.
+
+    Member names are the (posix) paths within the archive. Only regular
+    file members are considered.
+
+    Can be used as a context manager, closing the archive on exit. The
+    datasets and spectra read from it are held in memory, so remain usable
+    once it is closed.
+
+    Attributes:
+        names: the names of the file members, in archive order.
+    """
+
+    def __init__(self, path_or_obj: str | Path | BinaryIO):
+        """Open an archive.
+
+        Args:
+            path_or_obj: the path of the archive, or a (seekable) binary
+                file object holding it. The archive type (and tar
+                compression) is detected from its contents.
+
+        Raises:
+            ValueError if it is neither a zip nor a tar archive.
+        """
+        if zipfile.is_zipfile(path_or_obj):
+            self._zip = zipfile.ZipFile(path_or_obj)
+            self._tar = None
+            self.names = [info.filename for info in self._zip.infolist()
+                          if not info.is_dir()]
+            return
+        self._zip = None
+        try:
+            if isinstance(path_or_obj, (str, Path)):
+                self._tar = tarfile.open(path_or_obj, mode='r:*')
+            else:
+                path_or_obj.seek(0)
+                self._tar = tarfile.open(fileobj=path_or_obj, mode='r:*')
+        except tarfile.ReadError as err:
+            raise ValueError(f'{path_or_obj} is not a zip or tar '
+                             f'archive.') from err
+        # Listing a compressed tar archive decompresses it entirely.
+        self._members = {member.name: member
+                         for member in self._tar.getmembers()
+                         if member.isfile()}
+        self.names = list(self._members)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def is_random_access(self) -> bool:
+        """Whether members can be read without reading the ones before."""
+        return self._zip is not None
+
+    def close(self):
+        """Close the archive."""
+        if self._zip is not None:
+            self._zip.close()
+        else:
+            self._tar.close()
+
+    def scan_sets(self, pattern: str = SCAN_PATTERN,
+                  errors: dict[str, Exception] | None = None
+                  ) -> dict[str, list[str]]:
+        """Group the scan members into scan sets.
+
+        Members are grouped by their directory and file_base (see
+        filename.parse_gxsm_filename()), so that scans sharing a file_base
+        in different directories are kept apart. Members which are not
+        gxsm filenames are skipped.
+
+        Args:
+            pattern: glob pattern of the (base) names of the members to
+                consider.
+            errors: optional dict, to which NAME:EXCEPTION pairs are added
+                for the skipped members.
+
+        Returns:
+            A dict of SCAN_SET:names, both sorted, SCAN_SET being the
+            member directory joined with the file_base (e.g.
+            'day1/my_scan', or 'my_scan' at the archive root).
+        """
+        groups = {}
+        for name in sorted(self._match(pattern)):
+            try:
+                file_base = fn.parse_gxsm_filename(name).file_base
+            except ValueError as e:
+                if errors is not None:
+                    errors[name] = e
+                continue
+            scan_set = str(PurePosixPath(name).with_name(file_base))
+            groups.setdefault(scan_set, []).append(name)
+        return dict(sorted(groups.items()))
+
+    def spec_files(self, pattern: str = SPEC_PATTERN) -> list[str]:
+        """List the spec members.
+
+        Args:
+            pattern: glob pattern of the (base) names of the members to
+                consider.
+
+        Returns:
+            The names of the matching members, in archive order.
+        """
+        return self._match(pattern)
+
+    def read(self, name: str) -> bytes:
+        """Read the contents of a member.
+
+        Args:
+            name: the name of the member.
+
+        Returns:
+            Its contents.
+
+        Raises:
+            KeyError if there is no such file member.
+        """
+        return next(self.iter_members([name]))[1]
+
+    def iter_members(self, names: Iterable[str]
+                     ) -> Iterator[tuple[str, bytes]]:
+        """Read the contents of members, in archive order.
+
+        Args:
+            names: the names of the members to read.
+
+        Returns:
+            An iterator of (name, contents) tuples, following the order of
+            the members in the archive (rather than that of names).
+
+        Raises:
+            KeyError if there is no such file member (before any member is
+            read).
+        """
+        if self._zip is not None:
+            infos = [self._zip.getinfo(name) for name in names]
+            infos.sort(key=lambda info: info.header_offset)
+            for info in infos:
+                yield info.filename, self._zip.read(info)
+            return
+
+        members = [self._members[name] for name in names]
+        members.sort(key=lambda member: member.offset_data)
+        for member in members:
+            with self._tar.extractfile(member) as file:
+                yield member.name, file.read()
+
+    def open_dataset(self, name: str, **kwargs) -> xarray.Dataset:
+        """Open a scan member (see read.open_dataset()).
+
+        Args:
+            name: the name of the member, which must be a gxsm filename.
+            **kwargs: arguments passed to read.open_dataset().
+
+        Returns:
+            See read.open_dataset().
+        """
+        return read.open_dataset(self.read(name),
+                                 filename=PurePosixPath(name).name, **kwargs)
+
+    def open_mfdataset(self, scan_set_or_names: str | list[str], **kwargs
+                       ) -> xarray.Dataset:
+        """Open a scan set (see read.open_mfdataset()).
+
+        Args:
+            scan_set_or_names: either the key of the scan set (see
+                scan_sets()) or an explicit list of scan members to open.
+            **kwargs: arguments passed to read.open_mfdataset().
+
+        Returns:
+            See read.open_mfdataset().
+
+        Raises:
+            KeyError if there is no such scan set.
+        """
+        names = scan_set_or_names
+        if isinstance(names, str):
+            names = self.scan_sets()[names]
+        return read.open_mfdataset(dict(self.iter_members(names)), **kwargs)
+
+    def open_spec(self, name: str, **kwargs
+                  ) -> pd.DataFrame | tuple[np.ndarray | xarray.Dataset,
+                                            spec.SpecMetadata]:
+        """Open a spec member (see read.open_spec()).
+
+        Args:
+            name: the name of the member.
+            **kwargs: arguments passed to read.open_spec() (without cache,
+                which only supports files).
+
+        Returns:
+            See read.open_spec().
+        """
+        return read.open_spec(self.read(name), **kwargs)
+
+    def iter_scan_sets(self, scan_sets: list[str] | None = None,
+                       pattern: str = SCAN_PATTERN, **kwargs
+                       ) -> Iterator[tuple[str, xarray.Dataset]]:
+        """Open scan sets, reading the archive in a single pass.
+
+        Each scan set is opened once all its members have been read, and its
+        contents are then released, so only the scan sets being read are
+        held in memory.
+
+        Args:
+            scan_sets: the keys of the scan sets to open (see scan_sets()).
+                If None, all are opened.
+            pattern: glob pattern of the (base) names of the scan members
+                to consider.
+            **kwargs: arguments passed to read.open_mfdataset().
+
+        Returns:
+            An iterator of (scan set key, xarray.Dataset) tuples, in the
+            order in which the scan sets are completed in the archive.
+
+        Raises:
+            KeyError if there is no such scan set.
+        """
+        groups = self.scan_sets(pattern)
+        if scan_sets is not None:
+            groups = {scan_set: groups[scan_set] for scan_set in scan_sets}
+        scan_set_of = {name: scan_set for scan_set, names in groups.items()
+                       for name in names}
+        pending = {}
+        for name, contents in self.iter_members(scan_set_of):
+            scan_set = scan_set_of[name]
+            buffers = pending.setdefault(scan_set, {})
+            buffers[name] = contents
+            if len(buffers) == len(groups[scan_set]):
+                del pending[scan_set]
+                yield scan_set, read.open_mfdataset(buffers, **kwargs)
+
+    def iter_spec(self, names: list[str] | None = None,
+                  pattern: str = SPEC_PATTERN, **kwargs
+                  ) -> Iterator[tuple[str, pd.DataFrame
+                                      | tuple[np.ndarray | xarray.Dataset,
+                                              spec.SpecMetadata]]]:
+        """Open spec members, reading the archive in a single pass.
+
+        Args:
+            names: the names of the spec members to open. If None, all the
+                members matching pattern are opened.
+            pattern: glob pattern of the (base) names of the spec members
+                to consider (if names is None).
+            **kwargs: arguments passed to read.open_spec().
+
+        Returns:
+            An iterator of (name, output) tuples (see read.open_spec()), in
+            archive order.
+        """
+        if names is None:
+            names = self.spec_files(pattern)
+        for name, contents in self.iter_members(names):
+            yield name, read.open_spec(contents, **kwargs)
+
+    def _match(self, pattern: str) -> list[str]:
+        return [name for name in self.names
+                if fnmatch.fnmatch(PurePosixPath(name).name, pattern)]
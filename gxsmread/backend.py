@@ -0,0 +1,120 @@
+"""xarray backend for gxsm files.
+
+This file contains an xarray backend engine ('gxsm'), which performs the
+gxsm pre-processing (see preprocess.py) while opening a file, rather than
+after. The FloatField is not read when opening: it is served by a
+BackendArray, which reads (from a memory-map of the file, see
+netcdf3.memmap_variable()) and converts only the data being indexed. Thus,
+xarray's lazy loading and dask chunking apply to the converted data.
+
+The engine is registered with xarray (as an entry point in pyproject.toml),
+so once gxsmread is installed it can be selected with engine='gxsm':
+
+    ds = xarray.open_dataset(filename, engine='gxsm',
+                             channels_config_path=...)
+    ds = xarray.open_mfdataset(paths, engine='gxsm', combine='nested',
+                               concat_dim=None, compat='identical',
+                               channels_config_path=..., chunks={})
+
+The backend options (channels_config_path, use_physical_units,
+allow_convert_from_metadata, simplify_metadata and dtype) are the same as
+those of read.open_dataset().
+"""
+
+from pathlib import Path
+import numpy as np
+import xarray
+from xarray.backends import BackendArray, BackendEntrypoint
+from xarray.core import indexing
+from . import channel_config as cc
+from . import filename as fn
+from . import netcdf3
+from . import preprocess as pp
+
+
+class GxsmBackendArray(BackendArray):
+    """Lazily-indexed, converted gxsm FloatField.
+
+    Indexing reads the requested FloatField values (without its spurious
+    'time' and 'value' dimensions, see preprocess.clean_floatfield()) and
+    applies the unit conversion to them (see preprocess.convert_floatfield()).
+
+    Only the file path and variable info are stored (the file being
+    memory-mapped on access), so instances can be pickled to dask workers.
+
+    Attributes:
+        filename: path of the gxsm file.
+        variable: the FloatField header info.
+        scale: the conversion scale factor (dz * conversion_factor).
+        shape: the shape of the converted data, (dimy, dimx).
+        dtype: the dtype of the converted data.
+    """
+
+    def __init__(self, filename: str, variable: netcdf3.NetCDF3Variable,
+                 scale: float, dtype: np.dtype):
+        self.filename = filename
+        self.variable = variable
+        self.scale = scale
+        self.shape = variable.shape[2:]
+        self.dtype = np.dtype(dtype)
+
+    def __getitem__(self, key: indexing.ExplicitIndexer) -> np.ndarray:
+        return indexing.explicit_indexing_adapter(
+            key, self.shape, indexing.IndexingSupport.OUTER_1VECTOR,
+            self._raw_indexing_method)
+
+    def _raw_indexing_method(self, key: tuple) -> np.ndarray:
+        data = netcdf3.memmap_variable(self.filename, self.variable)[0, 0]
+        return np.multiply(data[key], self.scale, dtype=self.dtype)
+
+
+class GxsmBackendEntrypoint(BackendEntrypoint):
+    """xarray backend entrypoint for gxsm files (engine='gxsm')."""
+
+    description = 'Open gxsm .nc files, converted to physical units.'
+    url = 'https://github.com/grutter-spm-group/gxsmread'
+    open_dataset_parameters = ('filename_or_obj', 'drop_variables',
+                               'channels_config_path', 'use_physical_units',
+                               'allow_convert_from_metadata',
+                               'simplify_metadata', 'dtype')
+
+    def open_dataset(self, filename_or_obj: str | Path, *,
+                     drop_variables: list[str] | None = None,
+                     channels_config_path: str | Path | None = None,
+                     use_physical_units: bool = True,
+                     allow_convert_from_metadata: bool = False,
+                     simplify_metadata: bool = True,
+                     dtype: np.dtype = pp.DEFAULT_DTYPE) -> xarray.Dataset:
+        """Open a gxsm file, pre-processed (see read.open_dataset())."""
+        filename = str(filename_or_obj)
+        drop_variables = list(drop_variables) if drop_variables else []
+        with xarray.open_dataset(
+                filename, drop_variables=[pp.GXSM_DATA_VAR] + drop_variables
+                ) as metadata_ds:
+            ds = metadata_ds.load()
+        if not pp.is_gxsm_file(ds):
+            raise TypeError('The provided file does not appear to be a gxsm '
+                            'file!')
+
+        channel_config = cc.CreateGxsmChannelConfig(
+            cc.load_channels_config_dict(channels_config_path), ds,
+            fn.parse_gxsm_filename(filename), use_physical_units,
+            allow_convert_from_metadata)
+        scale = (ds[pp.GXSM_DATA_DIFFERENTIAL].item() *
+                 channel_config.conversion_factor)
+        variable = netcdf3.read_header(filename).variables[pp.GXSM_DATA_VAR]
+        data = indexing.LazilyIndexedArray(
+            GxsmBackendArray(filename, variable, scale, dtype))
+
+        ds = pp.clean_kept_coords(ds)
+        ds[channel_config.name] = xarray.Variable(
+            ('dimy', 'dimx'), data, attrs={'units': channel_config.units})
+        ds = ds.drop_vars(pp.GXSM_DATA_DIFFERENTIAL)
+        if simplify_metadata:
+            ds = pp.clean_up_metadata(ds, [channel_config.name])
+        return ds
+
+    def guess_can_open(self, filename_or_obj) -> bool:
+        # gxsm files are regular NetCDF3 files (which the default engines
+        # open): the gxsm engine must be requested explicitly.
+        return False
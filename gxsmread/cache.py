@@ -0,0 +1,245 @@
+"""Persistent on-disk cache of parsed spectroscopy files.
+
+Parsing a (text) spectroscopy file is slow compared to loading its data from
+a binary array. This file contains a cache of parsed spectroscopy files,
+allowing us to only parse each file once.
+
+Each cache entry is stored as 2 files in the cache directory:
+    - $key$.npy: the data array, in numpy's binary format. On a cache hit, it
+        is memory-mapped rather than read.
+    - $key$.json: the raw metadata, channel names and units.
+
+where $key$ is a hash of the spec file path, its size and modification time
+(or, optionally, of its contents only), the requested columns and dtype, and
+the spec parser version (spec.PARSER_VERSION). Thus, a modified file or a
+parser update will simply not hit the old entries.
+
+The cache is size-bounded: when adding an entry makes it exceed its maximum
+size, the least recently used entries are evicted. Files orphaned by an
+interrupted write (e.g. a process killed between writing the two files of
+an entry) count towards the size, and are removed once older than
+ORPHAN_MIN_AGE (younger ones may belong to a write in progress, so are never
+removed).
+
+The cache is safe to use from multiple processes at once: entries are
+written to temporary files and atomically renamed into place (the .json file
+last, marking the entry as complete), and readers treat an entry that
+disappears underneath them as a cache miss. Marking an entry as used is
+best-effort, so a read-only cache can still be read.
+
+Basic usage:
+    df = open_spec(filename, cache='/path/to/cache/dir')
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+import hashlib
+import json
+import os
+import tempfile
+import time
+import numpy as np
+from . import spec
+
+DATA_SUFFIX = '.npy'
+METADATA_SUFFIX = '.json'
+TMP_SUFFIX = '.tmp'
+
+DEFAULT_MAX_SIZE = 2**30  # 1 GiB
+HASH_READ_SIZE = 2**20
+# Age (in seconds) after which a file without the rest of its entry is
+# considered orphaned (rather than part of an entry being written).
+ORPHAN_MIN_AGE = 60.0
+
+KEY_RAW_METADATA = 'raw_metadata'
+KEY_NAMES = 'names'
+KEY_UNITS = 'units'
+
+
+@dataclass
+class CachedSpec:
+    """Class holding a parsed spectroscopy file, as stored in the cache.
+
+    Attributes:
+        raw_metadata: str:str dict containing METADATA_KEY:METADATA_STR.
+        names: list[str] of data table channel names.
+        units: list[str] of data table units.
+        data: the (read-only, memory-mapped) data array.
+    """
+
+    raw_metadata: dict[str, str]
+    names: list[str]
+    units: list[str]
+    data: np.ndarray
+
+
+class SpecCache:
+    """Content-addressed, size-bounded, on-disk cache of spec files.
+
+    Attributes:
+        directory: the directory the cache entries are stored in.
+        max_size: the maximum total size (in bytes) of the cache entries.
+        hash_contents: whether to identify a file by a hash of its contents
+            only (rather than its path and modification time). Slower, but
+            robust to files being copied, moved or touched: identical files
+            share their cache entries.
+    """
+
+    def __init__(self, directory: str | Path,
+                 max_size: int = DEFAULT_MAX_SIZE,
+                 hash_contents: bool = False):
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self.hash_contents = hash_contents
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def get_key(self, filename: str | Path,
+                usecols: list[int | str] | None = None,
+                dtype: np.dtype = np.float32) -> str:
+        """Compute the cache key of a spec file (read with given options)."""
+        path = Path(filename).resolve()
+        stat = path.stat()
+        if self.hash_contents:
+            file_id = [_hash_file_contents(path)]
+        else:
+            file_id = [str(path), stat.st_mtime_ns]
+        if usecols is not None:
+            # numpy integers are not JSON serializable
+            usecols = [int(c) if isinstance(c, np.integer) else c
+                       for c in usecols]
+        key_data = [*file_id, stat.st_size, usecols, np.dtype(dtype).str,
+                    spec.PARSER_VERSION]
+        return hashlib.sha256(json.dumps(key_data).encode()).hexdigest()
+
+    def get(self, filename: str | Path,
+            usecols: list[int | str] | None = None,
+            dtype: np.dtype = np.float32) -> CachedSpec | None:
+        """Get the cached parse of a spec file, or None if not cached.
+
+        Args:
+            filename: path of the spec file.
+            usecols: the data columns requested (see spec.extract_data()).
+            dtype: the numpy dtype requested.
+
+        Returns:
+            A CachedSpec instance (with a memory-mapped data array) on a
+            cache hit, None otherwise.
+        """
+        key = self.get_key(filename, usecols, dtype)
+        metadata_path = self._get_path(key, METADATA_SUFFIX)
+        try:
+            with open(metadata_path, 'r') as f:
+                metadata = json.load(f)
+            data = np.load(self._get_path(key, DATA_SUFFIX), mmap_mode='r')
+        except FileNotFoundError:
+            # Not cached, or evicted while we were reading it.
+            return None
+        try:
+            # Mark entry as recently used (for LRU eviction)
+            os.utime(metadata_path)
+        except OSError:
+            pass  # E.g. a read-only cache: still a hit
+
+        return CachedSpec(metadata[KEY_RAW_METADATA], metadata[KEY_NAMES],
+                          metadata[KEY_UNITS], data)
+
+    def put(self, filename: str | Path, cached_spec: CachedSpec,
+            usecols: list[int | str] | None = None,
+            dtype: np.dtype = np.float32):
+        """Store the parse of a spec file, evicting old entries if needed.
+
+        Args:
+            filename: path of the spec file.
+            cached_spec: the parsed spec file contents.
+            usecols: the data columns requested (see spec.extract_data()).
+            dtype: the numpy dtype requested.
+        """
+        key = self.get_key(filename, usecols, dtype)
+        metadata = {KEY_RAW_METADATA: cached_spec.raw_metadata,
+                    KEY_NAMES: cached_spec.names,
+                    KEY_UNITS: cached_spec.units}
+
+        # Data first: an entry is only visible once its metadata exists.
+        self._write_atomic(key, DATA_SUFFIX,
+                           lambda f: np.save(f, cached_spec.data))
+        self._write_atomic(key, METADATA_SUFFIX,
+                           lambda f: f.write(json.dumps(metadata).encode()))
+        self.evict()
+
+    def evict(self):
+        """Evict least recently used entries until within max_size.
+
+        Orphaned files (the data or metadata of an entry without the other,
+        or temporary files) older than ORPHAN_MIN_AGE are removed first.
+        Younger ones may belong to an entry being written: they are counted
+        towards the size, but never removed.
+        """
+        stats = {}
+        for suffix in [METADATA_SUFFIX, DATA_SUFFIX, TMP_SUFFIX]:
+            for path in self.directory.glob('*' + suffix):
+                try:
+                    stats[path] = path.stat()
+                except FileNotFoundError:
+                    continue  # Evicted by another process
+
+        entries = {}
+        for path, stat in stats.items():
+            entries.setdefault(path.with_suffix(''), {})[path.suffix] = stat
+        now = time.time()
+        to_evict = []
+        total_size = 0
+        for stem, entry_stats in entries.items():
+            paths = [stem.with_suffix(suffix) for suffix in entry_stats]
+            size = sum(stat.st_size for stat in entry_stats.values())
+            if entry_stats.keys() == {METADATA_SUFFIX, DATA_SUFFIX}:
+                to_evict.append((entry_stats[METADATA_SUFFIX].st_mtime,
+                                 size, paths))
+            elif now - max(stat.st_mtime for stat in entry_stats.values()) \
+                    >= ORPHAN_MIN_AGE:
+                _unlink_entry(paths)
+                continue
+            total_size += size
+
+        for _, size, paths in sorted(to_evict):
+            if total_size <= self.max_size:
+                break
+            _unlink_entry(paths)
+            total_size -= size
+
+    def clear(self):
+        """Remove all entries from the cache (and interrupted writes)."""
+        for suffix in [METADATA_SUFFIX, DATA_SUFFIX, TMP_SUFFIX]:
+            for path in self.directory.glob('*' + suffix):
+                path.unlink(missing_ok=True)
+
+    def _get_path(self, key: str, suffix: str) -> Path:
+        return self.directory / (key + suffix)
+
+    def _write_atomic(self, key: str, suffix: str, write_func):
+        """Write to a temporary file, renamed to the entry path when done."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory,
+                                        suffix=TMP_SUFFIX)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write_func(f)
+            os.replace(tmp_path, self._get_path(key, suffix))
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+
+def _unlink_entry(paths: list[Path]):
+    """Remove the files of an entry."""
+    # Metadata first: the entry stops being visible before its data
+    # disappears.
+    for path in sorted(paths, key=lambda path: path.suffix
+                       != METADATA_SUFFIX):
+        path.unlink(missing_ok=True)
+
+
+def _hash_file_contents(path: Path) -> str:
+    file_hash = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(HASH_READ_SIZE):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
@@ -0,0 +1,299 @@
+"""Incremental SQLite catalog of gxsm scan files.
+
+Finding a subset of scans in a large archive (e.g. "all Topo scans from last
+week with a bias < 0.5 V") would require opening every file. This file
+contains a catalog of gxsm .nc files, stored in an SQLite database, which can
+be queried instead.
+
+The catalog holds one row per .nc file, containing:
+    - its path, size and modification time;
+    - its filename attributes (see filename.parse_gxsm_filename());
+    - its scan dimensions (dimx, dimy);
+    - some key metadata values (see KEY_METADATA_COLUMNS and bias);
+    - all its scalar metadata values, as a JSON object (queryable with
+        SQLite's json_extract()).
+
+The metadata is read directly from the file headers (see netcdf3.py), which
+is much faster than opening the files with xarray. Re-scanning a directory
+only re-reads the files whose size or modification time changed (and drops
+the files that were removed).
+
+Basic usage:
+    catalog = Catalog('/path/to/catalog.sqlite')
+    errors = catalog.scan('/path/to/archive')
+    errors = catalog.update(['/path/to/archive/new_scan-M-Xp-Topo.nc'])
+    paths = catalog.query('bias < ? AND t_start > ?', (0.5, last_week),
+                          channel='Topo')
+    ds = catalog.open_mfdataset(filters={'file_base': 'chigwell009'})
+"""
+
+from pathlib import Path
+from typing import Any, Sequence
+import json
+import math
+import os
+import sqlite3
+import numpy as np
+import xarray
+from . import filename as fn
+from . import netcdf3
+from . import read
+from . import utils
+
+TABLE_NAME = 'files'
+DEFAULT_PATTERN = '*.nc'
+
+# gxsm variables stored as their own column
+KEY_METADATA_COLUMNS = ['t_start', 't_end', 'rangex', 'rangey', 'rangez',
+                        'dx', 'dy', 'dz']
+# The bias is stored by the hardware interface, e.g. 'sranger_mk2_hwi_bias'.
+BIAS_COLUMN = 'bias'
+BIAS_VARIABLE_SUFFIX = '_hwi_bias'
+METADATA_COLUMN = 'metadata'
+
+COLUMNS = {'path': 'TEXT PRIMARY KEY',
+           'size': 'INTEGER',
+           'mtime_ns': 'INTEGER',
+           'file_base': 'TEXT',
+           'channel': 'TEXT',
+           'scan_direction': 'TEXT',
+           'is_main_file': 'INTEGER',
+           'dimx': 'INTEGER',
+           'dimy': 'INTEGER',
+           **{col: 'REAL' for col in KEY_METADATA_COLUMNS},
+           BIAS_COLUMN: 'REAL',
+           METADATA_COLUMN: 'TEXT'}
+
+
+class Catalog:
+    """SQLite catalog of gxsm scan files.
+
+    Can be used as a context manager, closing its database on exit.
+
+    Attributes:
+        path: the path of the SQLite database file.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._connection = sqlite3.connect(self.path)
+        columns = ', '.join(f'{col} {col_type}' for col, col_type
+                            in COLUMNS.items())
+        with self._connection:
+            self._connection.execute(
+                f'CREATE TABLE IF NOT EXISTS {TABLE_NAME} ({columns})')
+            self._connection.execute(
+                f'CREATE INDEX IF NOT EXISTS {TABLE_NAME}_file_base '
+                f'ON {TABLE_NAME} (file_base)')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Close the catalog database."""
+        self._connection.close()
+
+    def scan(self, directory: str | Path, pattern: str = DEFAULT_PATTERN,
+             recursive: bool = True, workers: int | None = 1
+             ) -> dict[str, Exception]:
+        """Add the gxsm files in a directory to the catalog.
+
+        Only new files, and files whose size or modification time changed
+        since they were last cataloged, are read. Cataloged files within the
+        directory that no longer exist are removed from the catalog.
+
+        A file failing to be read does not stop the others from being
+        cataloged: it is simply not added (and will be retried on the next
+        scan).
+
+        Args:
+            directory: the directory to scan.
+            pattern: glob pattern of the files to catalog.
+            recursive: whether to also scan sub-directories.
+            workers: the number of worker processes reading the files. If
+                None, we use the number of CPUs.
+
+        Returns:
+            A dict containing FILE:EXCEPTION pairs, for the files that could
+            not be read.
+        """
+        directory = Path(directory).resolve()
+        glob_func = directory.rglob if recursive else directory.glob
+        stats = {}
+        for path in glob_func(pattern):
+            if path.is_file():
+                stat = path.stat()
+                stats[str(path)] = (stat.st_size, stat.st_mtime_ns)
+
+        prefix = str(directory) + os.sep
+        cataloged = {row[0]: (row[1], row[2]) for row in
+                     self._connection.execute(
+                         f'SELECT path, size, mtime_ns FROM {TABLE_NAME} '
+                         'WHERE substr(path, 1, ?) = ?',
+                         (len(prefix), prefix))}
+        if not recursive:
+            cataloged = {path: stat for path, stat in cataloged.items()
+                         if os.path.dirname(path) == str(directory)}
+
+        return self._update(stats, cataloged, workers)
+
+    def update(self, paths: list[str | Path], workers: int | None = 1
+               ) -> dict[str, Exception]:
+        """Add (or refresh) the given gxsm files in the catalog.
+
+        As with scan(), only files that are new to the catalog, or whose size
+        or modification time changed, are read. Given files that no longer
+        exist are removed from the catalog.
+
+        Args:
+            paths: the paths of the files.
+            workers: see scan().
+
+        Returns:
+            See scan().
+        """
+        stats = {}
+        cataloged = {}
+        for path in paths:
+            path = str(Path(path).resolve())
+            try:
+                stat = os.stat(path)
+                stats[path] = (stat.st_size, stat.st_mtime_ns)
+            except FileNotFoundError:
+                pass
+            for row in self._connection.execute(
+                    f'SELECT size, mtime_ns FROM {TABLE_NAME} WHERE path = ?',
+                    (path,)):
+                cataloged[path] = tuple(row)
+        return self._update(stats, cataloged, workers)
+
+    def query(self, where: str | None = None, params: Sequence = (),
+              **filters) -> list[str]:
+        """Get the paths of the cataloged files matching a query.
+
+        Args:
+            where: an optional SQL condition on the catalog columns (see
+                COLUMNS), e.g. 'bias < ? AND t_start > ?'. Metadata values
+                without a column can be accessed with json_extract(), e.g.
+                "json_extract(metadata, '$.sranger_mk2_hwi_z_setpoint')".
+            params: the values of the '?' placeholders in where.
+            **filters: COLUMN=VALUE equality conditions, e.g.
+                file_base='chigwell009' or channel='Topo'.
+
+        Returns:
+            The list of matching paths, sorted.
+        """
+        conditions = [f'({where})'] if where else []
+        params = list(params)
+        for col, val in filters.items():
+            if col not in COLUMNS:
+                raise ValueError(f'Unknown catalog column: {col}.')
+            conditions.append(f'{col} = ?')
+            params.append(val)
+
+        sql = f'SELECT path FROM {TABLE_NAME}'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY path'
+        return [row[0] for row in self._connection.execute(sql, params)]
+
+    def open_mfdataset(self, where: str | None = None,
+                       params: Sequence = (),
+                       filters: dict[str, Any] | None = None,
+                       **kwargs) -> xarray.Dataset:
+        """Open the cataloged files matching a query, as a single dataset.
+
+        The matching paths (see query()) are passed to read.open_mfdataset().
+        Thus, the query should select the channel files of a single scan,
+        e.g. by filtering on file_base.
+
+        Args:
+            where: see query().
+            params: see query().
+            filters: dict of COLUMN:VALUE equality conditions (see query()).
+            **kwargs: arguments passed to read.open_mfdataset().
+
+        Returns:
+            An xarray.Dataset instance (see read.open_mfdataset()).
+        """
+        paths = self.query(where, params, **(filters if filters else {}))
+        return read.open_mfdataset(paths, **kwargs)
+
+    def _update(self, stats: dict[str, tuple[int, int]],
+                cataloged: dict[str, tuple[int, int]], workers: int | None
+                ) -> dict[str, Exception]:
+        """Update the catalog rows of files, given their current stats.
+
+        Args:
+            stats: PATH:(SIZE, MTIME_NS) of the existing files.
+            cataloged: PATH:(SIZE, MTIME_NS) of the cataloged files (among
+                those being updated).
+            workers: see scan().
+
+        Returns:
+            See scan().
+        """
+        removed = [(path,) for path in cataloged if path not in stats]
+        changed = [(path, *stat) for path, stat in stats.items()
+                   if cataloged.get(path) != stat]
+
+        rows = []
+        errors = {}
+        for (path, *_), result in zip(changed, utils.map_parallel(
+                _read_catalog_row, changed, workers)):
+            if isinstance(result, Exception):
+                errors[path] = result
+            else:
+                rows.append(result)
+
+        with self._connection:
+            self._connection.executemany(
+                f'DELETE FROM {TABLE_NAME} WHERE path = ?', removed)
+            self._connection.executemany(
+                f'INSERT OR REPLACE INTO {TABLE_NAME} ({", ".join(COLUMNS)}) '
+                f'VALUES ({", ".join("?" * len(COLUMNS))})', rows)
+        return errors
+
+
+def _read_catalog_row(file_stat: tuple[str, int, int]) -> tuple | Exception:
+    """Read the catalog row of a (path, size, mtime_ns) file, in COLUMNS order.
+
+    Used as a worker process task, so any exception is returned (rather
+    than raised) for the caller to collect.
+    """
+    path, size, mtime_ns = file_stat
+    try:
+        attribs = fn.parse_gxsm_filename(path)
+        metadata = netcdf3.read_metadata(path)
+        dims = metadata[netcdf3.KEY_DIMENSIONS]
+        variables = {name: _to_json_value(val) for name, val
+                     in metadata[netcdf3.KEY_VARIABLES].items()}
+        variables = {name: val for name, val in variables.items()
+                     if val is not None}
+        bias = next((val for name, val in variables.items()
+                     if name.endswith(BIAS_VARIABLE_SUFFIX)), None)
+        return (path, size, mtime_ns, attribs.file_base, attribs.channel,
+                attribs.scan_direction, attribs.is_main_file,
+                dims.get('dimx'), dims.get('dimy'),
+                *[variables.get(col) for col in KEY_METADATA_COLUMNS], bias,
+                json.dumps(variables))
+    except Exception as e:
+        return e
+
+
+def _to_json_value(val: Any) -> float | int | str | None:
+    """Convert a scalar metadata value to a JSON-compatible one.
+
+    Strings are decoded; non-scalar and non-finite values are dropped
+    (returning None).
+    """
+    if isinstance(val, bytes):
+        return val.rstrip(b'\x00').decode('utf-8', errors='replace')
+    if isinstance(val, np.generic):
+        val = val.item()
+    if isinstance(val, int) or (isinstance(val, float) and math.isfinite(val)):
+        return val
+    return None
@@ -0,0 +1,339 @@
+"""Batch conversion of gxsm scans to Zarr or NetCDF4 stores.
+
+Re-reading the raw gxsm NetCDF3 files (and converting them) every time they
+are analyzed is wasteful. This file contains the logic to convert each scan
+set (i.e. the channel files sharing a file_base) into a single chunked,
+compressed store, once:
+    - a (consolidated) Zarr store: $output_dir$/$scan_set$.zarr (this
+        requires the 'zarr' optional dependencies);
+    - or a NetCDF4 file: $output_dir$/$scan_set$.nc.
+
+where $scan_set$ is the file_base, prefixed with the scan set's directory
+relative to the common directory of all the scan sets converted (e.g.
+'day1/my_scan' when converting day1/ and day2/, or 'my_scan' when converting
+a single directory). Thus, scans sharing a file_base in different
+directories are kept apart.
+
+Each scan set is opened as with read.open_mfdataset() (i.e. converted to
+physical units and with simplified metadata), in a separate worker process.
+
+Conversions are incremental: each store records (in its KEY_CONVERSION
+attribute) the size and modification time of its source files, and the
+conversion options (including a hash of the channels config contents). A
+scan set whose store matches is skipped.
+
+Basic usage:
+    statuses = convert('/path/to/scans', '/path/to/output',
+                       channels_config_path=...)
+
+or, from the command line (see __main__.py):
+    gxsmread convert /path/to/scans -o /path/to/output
+"""
+
+from pathlib import Path
+from functools import partial
+from typing import Any, Iterable
+import glob
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import xarray
+from . import filename as fn
+from . import preprocess as pp
+from . import read
+from . import utils
+
+FORMAT_ZARR = 'zarr'
+FORMAT_NETCDF = 'netcdf'
+FORMAT_SUFFIXES = {FORMAT_ZARR: '.zarr', FORMAT_NETCDF: '.nc'}
+TMP_SUFFIX = '.tmp'
+
+# Chunk shape of the channel data (dimy, dimx), clipped to the scan size.
+DEFAULT_CHUNKS = (256, 256)
+DEFAULT_COMPRESSION_LEVEL = 5
+
+# Store attribute recording the conversion (sources and options).
+KEY_CONVERSION = 'gxsmread_conversion'
+KEY_SOURCES = 'sources'
+KEY_OPTIONS = 'options'
+
+STATUS_CONVERTED = 'converted'
+STATUS_UP_TO_DATE = 'up to date'
+
+STRING_ENCODING = 'utf-8'
+
+
+def convert(paths: str | Path | list[str | Path], output_dir: str | Path,
+            output_format: str = FORMAT_ZARR, workers: int | None = None,
+            channels_config_path: str | Path | None = None,
+            use_physical_units: bool = True,
+            allow_convert_from_metadata: bool = False,
+            dtype: np.dtype = pp.DEFAULT_DTYPE,
+            chunks: tuple[int, int] = DEFAULT_CHUNKS,
+            compression_level: int = DEFAULT_COMPRESSION_LEVEL,
+            overwrite: bool = False) -> dict[str, str | Exception]:
+    """Convert gxsm scan sets to one Zarr or NetCDF4 store each.
+
+    A scan set failing to convert does not stop the others: the exception
+    raised for it is returned as its status.
+
+    Args:
+        paths: a directory containing gxsm files (see
+            read.find_scan_sets()), a string glob in the form
+            "path/to/my/files/*.nc", or an explicit list of files. Files are
+            grouped by directory and file_base into scan sets.
+        output_dir: the directory to write the stores to (created if
+            needed).
+        output_format: FORMAT_ZARR or FORMAT_NETCDF.
+        workers: the number of worker processes to use. If None, we use the
+            number of CPUs. If 1, scan sets are converted in the calling
+            process.
+        channels_config_path: see read.open_mfdataset().
+        use_physical_units: see read.open_mfdataset().
+        allow_convert_from_metadata: see read.open_mfdataset().
+        dtype: the numpy dtype of the converted channel data.
+        chunks: the (dimy, dimx) chunk shape of the channel data.
+        compression_level: the compression level (zstd for Zarr, zlib for
+            NetCDF4).
+        overwrite: whether to convert scan sets even if their store is up to
+            date.
+
+    Returns:
+        A dict of SCAN_SET:status, where SCAN_SET is the key of the scan
+        set (see group_scan_sets()), and status is
+        STATUS_CONVERTED, STATUS_UP_TO_DATE or the exception raised
+        converting it.
+
+    Raises:
+        ValueError if output_format is unknown.
+        ImportError if output_format is FORMAT_ZARR, and the 'zarr' optional
+            dependencies are not installed.
+    """
+    check_output_format(output_format)
+    if isinstance(paths, (str, Path)) and os.path.isdir(paths):
+        paths = [path for scan_set_paths in
+                 read.find_scan_sets(paths).values()
+                 for path in scan_set_paths]
+    elif isinstance(paths, str):
+        paths = glob.glob(paths)
+    scan_sets = group_scan_sets(str(path) for path in paths)
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    options = {'use_physical_units': use_physical_units,
+               'allow_convert_from_metadata': allow_convert_from_metadata,
+               'channels_config_path': (str(channels_config_path)
+                                        if channels_config_path else None),
+               # Editing the config must trigger a re-conversion.
+               'channels_config_sha256': _hash_file(channels_config_path),
+               'dtype': np.dtype(dtype).str, 'chunks': list(chunks),
+               'compression_level': compression_level}
+    func = partial(_convert_scan_set, output_dir=output_dir,
+                   output_format=output_format, options=options,
+                   overwrite=overwrite)
+    statuses = utils.map_parallel(func, list(scan_sets.items()), workers)
+    return dict(zip(scan_sets, statuses))
+
+
+def check_output_format(output_format: str):
+    """Check that we can convert to output_format.
+
+    Raises:
+        ValueError if output_format is unknown.
+        ImportError if output_format is FORMAT_ZARR, and the 'zarr' optional
+            dependencies are not installed.
+    """
+    if output_format not in FORMAT_SUFFIXES:
+        raise ValueError(f'Unknown output format {output_format}, expected '
+                         f'one of {list(FORMAT_SUFFIXES)}.')
+    if output_format == FORMAT_ZARR:
+        _check_zarr_installed()
+
+
+def group_scan_sets(paths: Iterable[str],
+                    errors: dict[str, Exception] | None = None
+                    ) -> dict[str, list[str]]:
+    """Group gxsm files into scan sets, by directory and file_base.
+
+    Args:
+        paths: the paths of the files to group.
+        errors: optional dict, to which PATH:EXCEPTION pairs are added for
+            the files skipped as not being gxsm filenames.
+
+    Returns:
+        A dict of SCAN_SET:paths, both sorted, SCAN_SET being the file_base
+        prefixed with the directory of the scan set relative to the common
+        directory of all scan sets (e.g. 'day1/my_scan', or 'my_scan' if all
+        files are in the same directory).
+    """
+    groups = {}
+    for directory_path, file_base_paths in _group_by_directory(paths).items():
+        for file_base, group_paths in fn.group_by_file_base(
+                file_base_paths, errors).items():
+            groups[(directory_path, file_base)] = group_paths
+    if not groups:
+        return {}
+
+    common_path = os.path.commonpath([directory_path for directory_path, _
+                                      in groups])
+    scan_sets = {}
+    for (directory_path, file_base), group_paths in groups.items():
+        relative_path = os.path.relpath(directory_path, common_path)
+        scan_set = os.path.normpath(os.path.join(relative_path, file_base))
+        scan_sets[scan_set] = group_paths
+    return dict(sorted(scan_sets.items()))
+
+
+def get_store_path(output_dir: str | Path, scan_set: str,
+                   output_format: str = FORMAT_ZARR) -> Path:
+    """Get the path of the store of a scan set (see group_scan_sets())."""
+    return Path(output_dir) / (scan_set + FORMAT_SUFFIXES[output_format])
+
+
+def sanitize_attrs(attrs: dict[str, Any]) -> dict[str, Any]:
+    """Make (simplified gxsm) attributes writable to Zarr and NetCDF4.
+
+    gxsm char-array metadata is stored as (NUL-padded) bytes, which is
+    decoded to str. Multi-dimensional values, which NetCDF attributes do not
+    support, are stored as JSON strings. Booleans are stored as ints.
+
+    Args:
+        attrs: the attributes to sanitize.
+
+    Returns:
+        The sanitized attributes.
+    """
+    sanitized = {}
+    for key, val in attrs.items():
+        if isinstance(val, bytes):
+            val = val.rstrip(b'\x00').decode(STRING_ENCODING,
+                                             errors='replace')
+        elif isinstance(val, (bool, np.bool_)):
+            val = int(val)
+        elif isinstance(val, (list, np.ndarray)) and np.ndim(val) > 1:
+            val = json.dumps(np.asarray(val).tolist())
+        sanitized[key] = val
+    return sanitized
+
+
+def _convert_scan_set(scan_set: tuple[str, list[str]], output_dir: Path,
+                      output_format: str, options: dict, overwrite: bool
+                      ) -> str | Exception:
+    """Convert a (scan set, paths) scan set to its store.
+
+    Used as a worker process task, so any exception is returned (rather
+    than raised) for the caller to collect.
+    """
+    name, paths = scan_set
+    try:
+        store_path = get_store_path(output_dir, name, output_format)
+        conversion = json.dumps({KEY_SOURCES: _get_sources(paths),
+                                 KEY_OPTIONS: options})
+        if not overwrite and \
+                _read_conversion(store_path, output_format) == conversion:
+            return STATUS_UP_TO_DATE
+
+        with read.open_mfdataset(
+                paths, channels_config_path=options['channels_config_path'],
+                use_physical_units=options['use_physical_units'],
+                allow_convert_from_metadata=options[
+                    'allow_convert_from_metadata'],
+                dtype=np.dtype(options['dtype']), fast_merge=True) as ds:
+            ds.attrs = sanitize_attrs(ds.attrs)
+            ds.attrs[KEY_CONVERSION] = conversion
+            _write_store(ds, store_path, output_format, options)
+        return STATUS_CONVERTED
+    except Exception as e:
+        return e
+
+
+def _check_zarr_installed():
+    """Raise an ImportError naming the 'zarr' extra if it is missing."""
+    try:
+        import numcodecs
+        import zarr
+    except ImportError as e:
+        raise ImportError("Converting to Zarr requires the 'zarr' optional "
+                          "dependencies (pip install gxsmread[zarr]).") from e
+
+
+def _group_by_directory(paths: Iterable[str]) -> dict[str, list[str]]:
+    """Group paths by their (absolute) directory."""
+    groups = {}
+    for path in paths:
+        directory_path = os.path.dirname(os.path.abspath(path))
+        groups.setdefault(directory_path, []).append(path)
+    return groups
+
+
+def _get_sources(paths: list[str]) -> list:
+    """Get the [name, size, mtime_ns] of each source file."""
+    sources = []
+    for path in sorted(paths):
+        stat = os.stat(path)
+        sources.append([os.path.basename(path), stat.st_size,
+                        stat.st_mtime_ns])
+    return sources
+
+
+def _hash_file(path: str | Path | None) -> str | None:
+    """Get the SHA-256 hex digest of a file's contents (None if no path)."""
+    if not path:
+        return None
+    with open(path, 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def _read_conversion(store_path: Path, output_format: str) -> str | None:
+    """Read the KEY_CONVERSION attribute of a store (None if missing)."""
+    if not store_path.exists():
+        return None
+    try:
+        engine = FORMAT_ZARR if output_format == FORMAT_ZARR else None
+        with xarray.open_dataset(store_path, engine=engine) as ds:
+            return ds.attrs.get(KEY_CONVERSION)
+    except Exception:
+        return None  # e.g. a corrupted store: re-convert it
+
+
+def _write_store(ds: xarray.Dataset, store_path: Path, output_format: str,
+                 options: dict):
+    """Write a dataset to a temporary store, renamed to store_path when done.
+
+    Thus, an interrupted conversion never leaves a partial store behind.
+    """
+    chunks = {dim: min(size, ds.sizes[dim]) for dim, size
+              in zip(['dimy', 'dimx'], options['chunks'])}
+    ds = ds.chunk(chunks)
+    channel_names = pp.get_channel_names(ds)
+
+    tmp_path = store_path.with_name(store_path.name + TMP_SUFFIX)
+    tmp_path.parent.mkdir(parents=True, exist_ok=True)
+    _remove_store(tmp_path)
+    if output_format == FORMAT_ZARR:
+        from numcodecs import Blosc
+        compressor = Blosc(cname='zstd', clevel=options['compression_level'],
+                           shuffle=Blosc.BITSHUFFLE)
+        encoding = {name: {'compressor': compressor}
+                    for name in channel_names}
+        ds.to_zarr(tmp_path, encoding=encoding, consolidated=True)
+    else:
+        encoding = {name: {'zlib': True,
+                           'complevel': options['compression_level'],
+                           'chunksizes': tuple(chunks[dim] for dim
+                                               in ds[name].dims)}
+                    for name in channel_names}
+        ds.to_netcdf(tmp_path, format='NETCDF4', engine='netcdf4',
+                     encoding=encoding)
+
+    _remove_store(store_path)
+    os.replace(tmp_path, store_path)
+
+
+def _remove_store(store_path: Path):
+    if store_path.is_dir():
+        shutil.rmtree(store_path)
+    elif store_path.exists():
+        store_path.unlink()
@@ -6,11 +6,14 @@ class documentation).
 """
 
 from dataclasses import dataclass
+from typing import Iterable
 import os
 
 GXSM_FILENAME_ATTRIB_SEPARATOR = '-'
 GXSM_FORWARD_SCAN_DIR = 'Xp'
 GXSM_BACKWARD_SCAN_DIR = 'Xm'
+GXSM_MAIN_FILE_MARKER = 'M'
+GXSM_SCAN_FILE_EXTENSION = '.nc'
 
 @dataclass
 class GxsmFileAttribs:
@@ -57,11 +60,65 @@ def parse_gxsm_filename(filename: str) -> GxsmFileAttribs:
 
     Returns:
         A GxsmFilename instance, indicating the filename attributes.
+
+    Raises:
+        ValueError if filename is not of the gxsm form (see GxsmFileAttribs).
     """
     basename = os.path.basename(os.path.splitext(filename)[0])
     substrs = basename.split(GXSM_FILENAME_ATTRIB_SEPARATOR)
     is_main_file = len(substrs) == 4
+    if len(substrs) not in (3, 4) or (
+            is_main_file and substrs[1] != GXSM_MAIN_FILE_MARKER):
+        raise ValueError(f'{filename} is not a gxsm filename.')
     if is_main_file:
         del substrs[1]  # Remove "-M-" from substrs
     return GxsmFileAttribs(substrs[0], substrs[2], substrs[1],
                            is_main_file)
+
+
+def format_gxsm_filename(gxsm_file_attribs: GxsmFileAttribs) -> str:
+    """Format filename attributes into a gxsm filename.
+
+    The inverse of parse_gxsm_filename(), e.g. to provide the filename of
+    data that was not read from a file.
+
+    Args:
+        gxsm_file_attribs: the filename attributes.
+
+    Returns:
+        The gxsm filename (without directory).
+    """
+    substrs = [gxsm_file_attribs.file_base, gxsm_file_attribs.scan_direction,
+               gxsm_file_attribs.channel]
+    if gxsm_file_attribs.is_main_file:
+        substrs.insert(1, GXSM_MAIN_FILE_MARKER)
+    return GXSM_FILENAME_ATTRIB_SEPARATOR.join(substrs) + \
+        GXSM_SCAN_FILE_EXTENSION
+
+
+def group_by_file_base(filenames: Iterable[str],
+                       errors: dict[str, Exception] | None = None
+                       ) -> dict[str, list[str]]:
+    """Group gxsm filenames by their file_base (i.e. by scan).
+
+    Filenames which are not gxsm filenames (e.g. another .nc file in the
+    same directory) are skipped.
+
+    Args:
+        filenames: the filenames to group.
+        errors: optional dict, to which FILENAME:EXCEPTION pairs are added
+            for the skipped filenames.
+
+    Returns:
+        A dict of file_base:filenames, both sorted.
+    """
+    groups = {}
+    for filename in sorted(filenames):
+        try:
+            file_base = parse_gxsm_filename(filename).file_base
+        except ValueError as e:
+            if errors is not None:
+                errors[filename] = e
+            continue
+        groups.setdefault(file_base, []).append(filename)
+    return dict(sorted(groups.items()))
@@ -0,0 +1,286 @@
+"""Opt-in, per-stage instrumentation of the read and preprocess pipelines.
+
+When opening files is slow, this tells where the time goes. The read and
+preprocess methods wrap each of their stages (e.g. decoding the netCDF file,
+clean_floatfield(), the merge of a scan set, or parsing the data table of a
+spec file) in stage(). While a Profiler is active (see profile()), each stage
+is recorded per file, with:
+    - its wall time;
+    - the bytes read from files (read system calls of its thread, as counted
+        by the OS in /proc/thread-self/io, so only available on Linux;
+        memory-mapped reads are not counted);
+    - its peak allocated memory (above that allocated when it started), as
+        traced by tracemalloc (if trace_memory).
+
+Stages can be nested (e.g. clean_floatfield within preprocess): the time,
+bytes and memory of a stage include those of its sub-stages.
+
+When no Profiler is active, stage() returns a shared no-op context manager,
+so the instrumentation costs (next to) nothing.
+
+Note that traced memory is process-wide: stages running concurrently in
+threads (e.g. with dask) inflate each other's peak memory. Stages running
+in worker processes (e.g. read.open_spec_many() with workers) are not
+recorded.
+
+Basic usage:
+    with profile() as profiler:
+        ds = read.open_mfdataset(...)
+    print(profiler.report())
+"""
+
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Callable, Iterator
+import os
+import threading
+import time
+import tracemalloc
+import pandas as pd
+
+PROC_IO_PATH = '/proc/thread-self/io'
+PROC_IO_READ_KEY = b'rchar:'
+PROC_IO_MAX_SIZE = 4096
+
+# Stage names
+STAGE_OPEN = 'open'
+STAGE_PREPROCESS = 'preprocess'
+STAGE_LOAD_METADATA = 'load_metadata'
+STAGE_CLEAN_FLOATFIELD = 'clean_floatfield'
+STAGE_CLEAN_KEPT_COORDS = 'clean_kept_coords'
+STAGE_CONVERT_FLOATFIELD = 'convert_floatfield'
+STAGE_CLEAN_UP_METADATA = 'clean_up_metadata'
+STAGE_OPEN_MFDATASET = 'open_mfdataset'
+STAGE_MERGE = 'merge'
+STAGE_SPEC_CACHE = 'spec_cache'
+STAGE_SPEC_HEADER = 'spec_header'
+STAGE_SPEC_DATA = 'spec_data'
+STAGE_SPEC_DATAFRAME = 'spec_dataframe'
+
+_profiler = None
+# Per-thread count of the bytes read from PROC_IO_PATH (by _read_io_bytes()),
+# which are not counted as read by stages.
+_io_local = threading.local()
+
+
+@dataclass
+class StageRecord:
+    """The measurements of a stage run.
+
+    Attributes:
+        stage: the stage name.
+        filename: the (absolute) path of the file the stage ran on (None if
+            not file-specific).
+        depth: the nesting depth of the stage (0 for top-level stages).
+        wall_time: the wall time, in seconds.
+        bytes_read: the bytes read from files (None if unavailable).
+        peak_memory: the peak allocated memory, in bytes, above that
+            allocated when the stage started (None if not traced).
+    """
+
+    stage: str
+    filename: str | None
+    depth: int
+    wall_time: float = 0.0
+    bytes_read: int | None = None
+    peak_memory: int | None = None
+
+
+class Profiler:
+    """Recorder of the stages run while it is active.
+
+    Use profile() to create and activate one.
+
+    Attributes:
+        records: list of StageRecord, in the order the stages completed.
+        trace_memory: whether the peak memory of stages is traced.
+        callback: optional callable, called with each StageRecord as its
+            stage completes.
+    """
+
+    def __init__(self, trace_memory: bool = True,
+                 callback: Callable[[StageRecord], None] | None = None):
+        self.records = []
+        self.trace_memory = trace_memory
+        self.callback = callback
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Get the records as a DataFrame (one row per stage run)."""
+        return pd.DataFrame(self.records,
+                            columns=[field.name for field
+                                     in fields(StageRecord)])
+
+    def report(self) -> pd.DataFrame:
+        """Aggregate the records per stage.
+
+        Returns:
+            A DataFrame indexed by stage (in order of first completion),
+            with columns: calls, files (number of distinct files),
+            total_time, mean_time and max_time (in seconds), bytes_read
+            (total) and peak_memory (max).
+        """
+        df = self.to_dataframe()
+        report = df.groupby('stage', sort=False).agg(
+            calls=('stage', 'size'), files=('filename', 'nunique'),
+            total_time=('wall_time', 'sum'), mean_time=('wall_time', 'mean'),
+            max_time=('wall_time', 'max'),
+            bytes_read=('bytes_read', 'sum'),
+            peak_memory=('peak_memory', 'max'))
+        return report
+
+    def _get_stack(self) -> list:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _add_record(self, record: StageRecord):
+        with self._lock:
+            self.records.append(record)
+        if self.callback is not None:
+            self.callback(record)
+
+
+class _Stage:
+    """Context manager measuring a stage, for the active Profiler."""
+
+    def __init__(self, profiler: Profiler, name: str,
+                 filename: str | Path | None):
+        self._profiler = profiler
+        self._name = name
+        self._filename = (None if filename is None
+                          else os.path.abspath(filename))
+
+    def __enter__(self):
+        stack = self._profiler._get_stack()
+        self.record = StageRecord(self._name, self._filename, len(stack))
+        # Peak memory since the enclosing stage started (before we reset the
+        # peak for this stage).
+        self._peak_memory = 0
+        if self._profiler.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]._update_peak_memory(peak)
+            tracemalloc.reset_peak()
+            self._start_memory = current
+        stack.append(self)
+        self._start_overhead = _get_io_overhead()
+        self._start_bytes = _read_io_bytes()
+        self._start_time = time.perf_counter()
+        return self.record
+
+    def __exit__(self, *exc_info):
+        self.record.wall_time = time.perf_counter() - self._start_time
+        end_overhead = _get_io_overhead()
+        end_bytes = _read_io_bytes()
+        if end_bytes is not None and self._start_bytes is not None:
+            self.record.bytes_read = (end_bytes - self._start_bytes -
+                                      (end_overhead - self._start_overhead))
+        stack = self._profiler._get_stack()
+        stack.pop()
+        if self._profiler.trace_memory:
+            self._update_peak_memory(tracemalloc.get_traced_memory()[1])
+            self.record.peak_memory = self._peak_memory
+            if stack:
+                stack[-1]._update_peak_memory(self._peak_memory +
+                                              self._start_memory)
+        self._profiler._add_record(self.record)
+        return False
+
+    def _update_peak_memory(self, peak: int):
+        self._peak_memory = max(self._peak_memory, peak - self._start_memory)
+
+
+class _NullStage:
+    """No-op context manager, used when no Profiler is active."""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+@contextmanager
+def profile(trace_memory: bool = True,
+            callback: Callable[[StageRecord], None] | None = None
+            ) -> Iterator[Profiler]:
+    """Activate a Profiler, recording the stages run within the context.
+
+    Only one Profiler can be active at a time. If trace_memory and
+    tracemalloc is not already tracing, it is started (and stopped on exit).
+    Note that tracemalloc slows down allocations significantly.
+
+    Args:
+        trace_memory: whether to trace the peak memory of stages.
+        callback: optional callable, called with each StageRecord as its
+            stage completes.
+
+    Yields:
+        The active Profiler.
+    """
+    global _profiler
+    if _profiler is not None:
+        raise RuntimeError('A profiler is already active.')
+    start_tracemalloc = trace_memory and not tracemalloc.is_tracing()
+    if start_tracemalloc:
+        tracemalloc.start()
+    _profiler = Profiler(trace_memory, callback)
+    try:
+        yield _profiler
+    finally:
+        _profiler = None
+        if start_tracemalloc:
+            tracemalloc.stop()
+
+
+def stage(name: str, filename: str | Path | None = None):
+    """Get a context manager measuring a stage (if a Profiler is active).
+
+    Args:
+        name: the stage name (e.g. one of the STAGE_* constants).
+        filename: the file the stage runs on, if any.
+
+    Returns:
+        A context manager, yielding the StageRecord of the stage (or None if
+        no Profiler is active).
+    """
+    if _profiler is None:
+        return _NULL_STAGE
+    return _Stage(_profiler, name, filename)
+
+
+def is_active() -> bool:
+    """Whether a Profiler is active."""
+    return _profiler is not None
+
+
+def _read_io_bytes() -> int | None:
+    """Read the bytes read by this thread so far (None if unavailable).
+
+    The count excludes this read of PROC_IO_PATH (but includes previous
+    ones, see _get_io_overhead()).
+    """
+    try:
+        fd = os.open(PROC_IO_PATH, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        content = os.read(fd, PROC_IO_MAX_SIZE)
+    finally:
+        os.close(fd)
+    _io_local.overhead = _get_io_overhead() + len(content)
+    for line in content.splitlines():
+        if line.startswith(PROC_IO_READ_KEY):
+            return int(line.split()[1])
+    return None
+
+
+def _get_io_overhead() -> int:
+    return getattr(_io_local, 'overhead', 0)
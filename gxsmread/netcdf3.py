@@ -0,0 +1,535 @@
+"""Lightweight reader of NetCDF3 (classic) file headers and metadata.
+
+gxsm scan files are stored in the NetCDF3 'classic' format. Its header
+(dimensions, attributes, and the type, shape and byte offset of each
+variable) is a simple big-endian binary structure at the start of the file:
+
+    header = magic numrecs dim_list gatt_list var_list
+    magic = 'C' 'D' 'F' VERSION
+    dim_list = ABSENT | NC_DIMENSION nelems [name dim_length ...]
+    gatt_list = ABSENT | NC_ATTRIBUTE nelems [name nc_type nelems values ...]
+    var_list = ABSENT | NC_VARIABLE nelems [name nelems [dimid ...]
+                                            vatt_list nc_type vsize begin ...]
+
+(see the NetCDF 'Classic Format Specification' for the details).
+
+This file parses this header with struct, and reads the (small) metadata
+variables directly from their byte offsets. This is much faster than a full
+netCDF4 + xarray open, when we only want to look at a file's metadata (e.g.
+to catalogue or validate files).
+
+Note: only the header and the requested variables are read; we do not apply
+any CF decoding (e.g. _FillValue masking or scale_factor), which gxsm does
+not use for its metadata.
+
+Basic usage:
+    header = read_header(filename)
+    metadata = read_metadata(filename)
+    data = memmap_variable(filename, header.variables[name])
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator
+import io
+import functools
+import math
+import struct
+import numpy as np
+from . import utils
+
+MAGIC = b'CDF'
+VERSION_CLASSIC = 1
+VERSION_64BIT_OFFSET = 2
+VERSION_64BIT_DATA = 5
+
+ABSENT = 0
+NC_DIMENSION = 10
+NC_VARIABLE = 11
+NC_ATTRIBUTE = 12
+
+NC_CHAR = 2
+NC_TYPES = {1: np.dtype('>i1'), NC_CHAR: np.dtype('S1'),
+            3: np.dtype('>i2'), 4: np.dtype('>i4'), 5: np.dtype('>f4'),
+            6: np.dtype('>f8'), 7: np.dtype('>u1'), 8: np.dtype('>u2'),
+            9: np.dtype('>u4'), 10: np.dtype('>i8'), 11: np.dtype('>u8')}
+# The struct formats of single values of the (non-char) dtypes.
+_SCALAR_FORMATS = {NC_TYPES[nc_type]: struct.Struct('>' + char)
+                   for nc_type, char in zip([1, 3, 4, 5, 6, 7, 8, 9, 10, 11],
+                                            'bhifdBHIqQ')}
+
+ALIGNMENT = 4
+HEADER_READ_SIZE = 2**16
+CHAR_ENCODING = 'utf-8'
+
+# Variables up to this size (in bytes) are considered metadata.
+METADATA_MAX_SIZE = 2**16
+# Variables never considered metadata: the gxsm scan data (see
+# preprocess.GXSM_DATA_VAR).
+DEFAULT_DROP_VARIABLES = ('FloatField',)
+# Gap (in bytes) between metadata variables below which we read them in a
+# single read, rather than seeking to each.
+METADATA_MAX_GAP = 2**16
+
+# Keys of read_metadata() output
+KEY_DIMENSIONS = 'dimensions'
+KEY_ATTRIBUTES = 'attributes'
+KEY_VARIABLES = 'variables'
+
+
+@dataclass
+class NetCDF3Variable:
+    """Class holding the header info of a NetCDF3 variable.
+
+    Attributes:
+        name: the variable name.
+        dimensions: the names of the variable dimensions.
+        shape: the variable shape (with the number of records as the size
+            of the unlimited dimension, for record variables).
+        dtype: the (big-endian) numpy dtype of the variable.
+        attributes: the variable attributes.
+        begin: the byte offset of the variable data (of its first record,
+            for record variables).
+        vsize: the size in bytes of the variable (of a single record, for
+            record variables), including padding.
+        is_record: whether the variable is a record variable (i.e. its first
+            dimension is the unlimited dimension).
+    """
+
+    name: str
+    dimensions: tuple[str, ...]
+    shape: tuple[int, ...]
+    dtype: np.dtype
+    attributes: dict[str, Any]
+    begin: int
+    vsize: int
+    is_record: bool
+
+    @functools.cached_property
+    def nbytes(self) -> int:
+        """The size in bytes of the variable data (without padding)."""
+        return math.prod(self.shape) * self.dtype.itemsize
+
+
+@dataclass
+class NetCDF3Header:
+    """Class holding the header of a NetCDF3 file.
+
+    Attributes:
+        version: the format version (VERSION_CLASSIC, VERSION_64BIT_OFFSET
+            or VERSION_64BIT_DATA).
+        numrecs: the number of records.
+        dimensions: the dimension name:size dict (the unlimited dimension
+            size being numrecs).
+        attributes: the global attributes.
+        variables: the variable name:NetCDF3Variable dict.
+        record_size: the size in bytes of a record (i.e. of one record of
+            each record variable).
+    """
+
+    version: int
+    numrecs: int
+    dimensions: dict[str, int]
+    attributes: dict[str, Any]
+    variables: dict[str, NetCDF3Variable]
+    record_size: int
+
+
+def read_header(filename_or_obj: str | Path | bytes | BinaryIO
+                ) -> NetCDF3Header:
+    """Read the header of a NetCDF3 file.
+
+    Args:
+        filename_or_obj: path of the file to read, its contents (bytes), or a
+            binary file object positioned at the start of the file.
+
+    Returns:
+        A NetCDF3Header instance.
+
+    Raises:
+        ValueError if this is not a NetCDF3 file.
+    """
+    if isinstance(filename_or_obj, (str, Path)):
+        with open(filename_or_obj, 'rb') as file:
+            return _HeaderParser(file).parse()
+    if isinstance(filename_or_obj, (bytes, bytearray, memoryview)):
+        filename_or_obj = io.BytesIO(filename_or_obj)
+    return _HeaderParser(filename_or_obj).parse()
+
+
+def read_variable(filename_or_obj: str | Path | BinaryIO,
+                  variable: NetCDF3Variable, numrecs: int = 1,
+                  record_size: int = 0) -> np.ndarray:
+    """Read the data of a variable, given its header info.
+
+    Args:
+        filename_or_obj: path of the file to read, or a seekable binary file
+            object.
+        variable: the variable header info.
+        numrecs: the number of records (for record variables).
+        record_size: the size in bytes of a record (for record variables).
+
+    Returns:
+        The variable data, as a numpy array of shape variable.shape.
+    """
+    if isinstance(filename_or_obj, (str, Path)):
+        with open(filename_or_obj, 'rb') as file:
+            return read_variable(file, variable, numrecs, record_size)
+
+    file = filename_or_obj
+    if not variable.is_record:
+        file.seek(variable.begin)
+        return _decode(file.read(variable.nbytes), variable)
+
+    record_nbytes = variable.nbytes // max(numrecs, 1)
+    records = []
+    for i in range(numrecs):
+        file.seek(variable.begin + i * record_size)
+        records.append(file.read(record_nbytes))
+    return _decode(b''.join(records), variable)
+
+
+def memmap_variable(filename: str | Path, variable: NetCDF3Variable
+                    ) -> np.memmap:
+    """Memory-map the data of a (non-record) variable, without reading it.
+
+    Non-record variables are stored contiguously, so they can be accessed
+    directly as a (read-only) numpy memmap. Its dtype is big-endian, as
+    stored on disk: numpy converts values to the native byte order only when
+    they are used in a computation (or cast with astype()). Thus, only the
+    pages of the file actually accessed are read into memory.
+
+    Args:
+        filename: path of the file.
+        variable: the variable header info.
+
+    Returns:
+        A read-only np.memmap of shape variable.shape.
+
+    Raises:
+        ValueError if the variable is a record variable (whose records are
+        interleaved with those of the other record variables).
+    """
+    if variable.is_record:
+        raise ValueError(f'Cannot memory-map record variable {variable.name}.')
+    return np.memmap(filename, dtype=variable.dtype, mode='r',
+                     offset=variable.begin, shape=variable.shape)
+
+
+def read_metadata(filename_or_obj: str | Path | bytes | BinaryIO,
+                  max_size: int = METADATA_MAX_SIZE,
+                  drop_variables: tuple[str, ...] = DEFAULT_DROP_VARIABLES
+                  ) -> dict[str, Any]:
+    """Read the metadata of a NetCDF3 file, as a plain dict.
+
+    The metadata consists of the dimensions, the global attributes, and the
+    values of all (non-record) variables of at most max_size bytes. gxsm
+    stores most of its metadata as such small variables (see
+    preprocess.clean_up_metadata()); the data variables (drop_variables, and
+    any variable larger than max_size) are skipped.
+
+    Variable values are simplified as in utils.extract_numpy_data(), i.e.:
+    char arrays to bytes, single values to python scalars, and other arrays
+    to lists.
+
+    Args:
+        filename_or_obj: path of the file to read, its contents (bytes), or a
+            seekable binary file object (read from its start).
+        max_size: the maximum size (in bytes) of the variables to read.
+        drop_variables: names of variables to skip.
+
+    Returns:
+        A dict of format:
+            {KEY_DIMENSIONS: {name: size},
+             KEY_ATTRIBUTES: {name: value},
+             KEY_VARIABLES: {name: value}}
+    """
+    if isinstance(filename_or_obj, (str, Path)):
+        with open(filename_or_obj, 'rb') as file:
+            return read_metadata(file, max_size, drop_variables)
+    if isinstance(filename_or_obj, (bytes, bytearray, memoryview)):
+        filename_or_obj = io.BytesIO(filename_or_obj)
+
+    file = filename_or_obj
+    file.seek(0)
+    # The variable attributes are not part of the metadata
+    header = _HeaderParser(file, variable_attributes=False).parse()
+    values = {}
+    for var, buffer, offset in _read_groups(
+            file, [var for var in header.variables.values()
+                   if not var.is_record and var.nbytes <= max_size
+                   and var.name not in drop_variables]):
+        if not var.shape and var.dtype in _SCALAR_FORMATS:
+            # As utils.extract_numpy_data(), without the array
+            values[var.name] = _SCALAR_FORMATS[var.dtype].unpack_from(
+                buffer, offset)[0]
+        else:
+            values[var.name] = utils.extract_numpy_data(
+                _decode(buffer[offset:offset + var.nbytes], var))
+
+    return {KEY_DIMENSIONS: header.dimensions,
+            KEY_ATTRIBUTES: header.attributes,
+            KEY_VARIABLES: {name: values[name] for name in header.variables
+                            if name in values}}
+
+
+def read_variables(file: BinaryIO, variables: list[NetCDF3Variable]
+                   ) -> dict[str, np.ndarray]:
+    """Read the data of several (non-record) variables, given their info.
+
+    Variables close to each other in the file (see METADATA_MAX_GAP) are
+    read together, so reading many small variables only takes a few reads.
+
+    Args:
+        file: a seekable binary file object.
+        variables: the header info of the variables to read.
+
+    Returns:
+        A dict of name:data, the data being numpy arrays of the variable
+        shapes (and big-endian dtypes).
+
+    Raises:
+        ValueError if one of the variables is a record variable.
+    """
+    return {var.name: _decode(buffer[offset:offset + var.nbytes], var)
+            for var, buffer, offset in _read_groups(file, variables)}
+
+
+def _read_groups(file: BinaryIO, variables: list[NetCDF3Variable]
+                 ) -> Iterator[tuple[NetCDF3Variable, bytes, int]]:
+    """Yield (variable, buffer, offset of its data in buffer), by group.
+
+    See read_variables().
+    """
+    for var in variables:
+        if var.is_record:
+            raise ValueError(f'Cannot read record variable {var.name} with '
+                             f'other variables.')
+    for group in _group_contiguous(sorted(variables,
+                                          key=lambda var: var.begin)):
+        start = group[0].begin
+        file.seek(start)
+        buffer = file.read(group[-1].begin + group[-1].nbytes - start)
+        for var in group:
+            yield var, buffer, var.begin - start
+
+
+def _group_contiguous(variables: list[NetCDF3Variable]
+                      ) -> list[list[NetCDF3Variable]]:
+    """Group (sorted) variables separated by less than METADATA_MAX_GAP."""
+    groups = []
+    for var in variables:
+        if groups and (var.begin - (groups[-1][-1].begin +
+                                    groups[-1][-1].nbytes) < METADATA_MAX_GAP):
+            groups[-1].append(var)
+        else:
+            groups.append([var])
+    return groups
+
+
+def _decode(data: bytes, variable: NetCDF3Variable) -> np.ndarray:
+    return np.frombuffer(data, variable.dtype).reshape(variable.shape)
+
+
+def _pad(size: int) -> int:
+    """Round size up to the NetCDF3 alignment."""
+    return -(-size // ALIGNMENT) * ALIGNMENT
+
+
+class _HeaderParser:
+    """Parser of a NetCDF3 header, read from the start of a file.
+
+    The header is parsed in place, from a single block of the file (only
+    read again, larger, if the header does not fit in it). As a header
+    holds hundreds of small fields, the per-field overhead dominates: fields
+    are unpacked at an offset (with struct.unpack_from(), rather than
+    slicing each out), several at a time where possible, in loops using
+    local variables only.
+
+    Args:
+        file: the (binary) file to read, positioned at its start.
+        variable_attributes: whether to read the variable attributes. If
+            False, they are skipped over (and left empty), which saves
+            about a quarter of the parsing time of gxsm files.
+    """
+
+    def __init__(self, file: BinaryIO, variable_attributes: bool = True):
+        self._file = file
+        self._variable_attributes = variable_attributes
+
+    def parse(self) -> NetCDF3Header:
+        buffer = self._file.read(HEADER_READ_SIZE)
+        while True:
+            try:
+                return self._parse(buffer)
+            except (_TruncatedHeader, struct.error):
+                # struct.error: a field past the end of the buffer. Names
+                # and values are sliced without checks, as a fixed-size field
+                # always follows them (and fails if they were cut short).
+                block = self._file.read(max(len(buffer), HEADER_READ_SIZE))
+                if not block:
+                    raise ValueError('Unexpected end of NetCDF3 header.')
+                buffer += block
+
+    def _parse(self, buffer: bytes) -> NetCDF3Header:
+        magic = buffer[:4]
+        if len(magic) < 4:
+            raise _TruncatedHeader()
+        if magic[:3] != MAGIC or magic[3] not in (VERSION_CLASSIC,
+                                                  VERSION_64BIT_OFFSET,
+                                                  VERSION_64BIT_DATA):
+            raise ValueError('Not a NetCDF3 file (bad magic number).')
+        version = magic[3]
+        # Size/count fields are 64-bit in CDF-5, 32-bit otherwise.
+        size_char = 'q' if version == VERSION_64BIT_DATA else 'i'
+        offset_char = 'i' if version == VERSION_CLASSIC else 'q'
+        self._buffer = buffer
+        self._size = struct.Struct('>' + size_char)
+        # (tag, nelems) of lists, (nc_type, nelems) of attributes
+        self._tag_size = struct.Struct('>i' + size_char)
+        # (nc_type, vsize, begin) of variables
+        self._variable_footer = struct.Struct('>i' + size_char + offset_char)
+
+        numrecs, = self._size.unpack_from(buffer, 4)
+        dimensions, pos = self._read_dimensions(4 + self._size.size)
+        dim_names = list(dimensions)
+        unlimited = [name for name, size in dimensions.items() if size == 0]
+        for name in unlimited:
+            dimensions[name] = numrecs
+        attributes, pos = self._read_attributes(pos)
+        variables = self._read_variables(pos, dim_names, dimensions,
+                                         unlimited)
+
+        record_vars = [var for var in variables.values() if var.is_record]
+        if len(record_vars) == 1:
+            # A single record variable is not padded
+            record_size = record_vars[0].nbytes // max(numrecs, 1)
+        else:
+            record_size = sum(var.vsize for var in record_vars)
+
+        return NetCDF3Header(version, numrecs, dimensions, attributes,
+                             variables, record_size)
+
+    def _read_list_header(self, pos: int, expected_tag: int
+                          ) -> tuple[int, int]:
+        """Read a list header at pos, returning (nelems, next pos)."""
+        tag, nelems = self._tag_size.unpack_from(self._buffer, pos)
+        if tag not in (ABSENT, expected_tag):
+            raise ValueError(f'Unexpected NetCDF3 header tag {tag}.')
+        return nelems, pos + self._tag_size.size
+
+    def _read_name(self, pos: int) -> tuple[str, int]:
+        """Read a name at pos, returning (name, next pos)."""
+        size, = self._size.unpack_from(self._buffer, pos)
+        pos += self._size.size
+        return (self._buffer[pos:pos + size].decode(CHAR_ENCODING),
+                pos + _pad(size))
+
+    def _read_dimensions(self, pos: int) -> tuple[dict[str, int], int]:
+        dimensions = {}
+        nelems, pos = self._read_list_header(pos, NC_DIMENSION)
+        for _ in range(nelems):
+            name, pos = self._read_name(pos)
+            dimensions[name], = self._size.unpack_from(self._buffer, pos)
+            pos += self._size.size
+        return dimensions, pos
+
+    def _read_attributes(self, pos: int) -> tuple[dict[str, Any], int]:
+        # The list header, name and value reads are inlined (see the class
+        # docstring).
+        buffer = self._buffer
+        unpack_size = self._size.unpack_from
+        size_size = self._size.size
+        unpack_tag_size = self._tag_size.unpack_from
+        tag_size_size = self._tag_size.size
+
+        attributes = {}
+        tag, nelems = unpack_tag_size(buffer, pos)
+        if tag != NC_ATTRIBUTE and tag != ABSENT:
+            raise ValueError(f'Unexpected NetCDF3 header tag {tag}.')
+        pos += tag_size_size
+        for _ in range(nelems):
+            size, = unpack_size(buffer, pos)
+            pos += size_size
+            name = buffer[pos:pos + size].decode(CHAR_ENCODING)
+            pos += -(-size // ALIGNMENT) * ALIGNMENT
+
+            nc_type, nelems = unpack_tag_size(buffer, pos)
+            pos += tag_size_size
+            dtype = NC_TYPES[nc_type]
+            size = nelems * dtype.itemsize
+            if nc_type == NC_CHAR:
+                attributes[name] = buffer[pos:pos + nelems].rstrip(
+                    b'\x00').decode(CHAR_ENCODING, errors='replace')
+            elif nelems == 1:
+                # Much faster than going through a numpy array
+                attributes[name] = dtype.type(
+                    _SCALAR_FORMATS[dtype].unpack_from(buffer, pos)[0])
+            elif pos + size > len(buffer):
+                raise _TruncatedHeader()
+            else:
+                attributes[name] = np.frombuffer(buffer, dtype, nelems, pos)
+            pos += -(-size // ALIGNMENT) * ALIGNMENT
+        return attributes, pos
+
+    def _skip_attributes(self, pos: int) -> int:
+        """Skip over an attribute list at pos, returning the next pos."""
+        buffer = self._buffer
+        unpack_size = self._size.unpack_from
+        size_size = self._size.size
+        unpack_tag_size = self._tag_size.unpack_from
+        tag_size_size = self._tag_size.size
+
+        tag, nelems = unpack_tag_size(buffer, pos)
+        if tag != NC_ATTRIBUTE and tag != ABSENT:
+            raise ValueError(f'Unexpected NetCDF3 header tag {tag}.')
+        pos += tag_size_size
+        for _ in range(nelems):
+            size, = unpack_size(buffer, pos)
+            pos += size_size + -(-size // ALIGNMENT) * ALIGNMENT
+            nc_type, nelems = unpack_tag_size(buffer, pos)
+            pos += (tag_size_size + -(-nelems * NC_TYPES[nc_type].itemsize
+                                      // ALIGNMENT) * ALIGNMENT)
+        return pos
+
+    def _read_variables(self, pos: int, dim_names: list[str],
+                        dimensions: dict[str, int], unlimited: list[str]
+                        ) -> dict[str, NetCDF3Variable]:
+        buffer = self._buffer
+        unpack_size = self._size.unpack_from
+        size_size = self._size.size
+        unpack_footer = self._variable_footer.unpack_from
+        footer_size = self._variable_footer.size
+        read_attributes = (self._read_attributes
+                           if self._variable_attributes else None)
+        skip_attributes = self._skip_attributes
+
+        variables = {}
+        nelems, pos = self._read_list_header(pos, NC_VARIABLE)
+        for _ in range(nelems):
+            size, = unpack_size(buffer, pos)
+            pos += size_size
+            name = buffer[pos:pos + size].decode(CHAR_ENCODING)
+            pos += -(-size // ALIGNMENT) * ALIGNMENT
+
+            ndims, = unpack_size(buffer, pos)
+            pos += size_size
+            dims = tuple([dim_names[unpack_size(buffer, dim_pos)[0]]
+                          for dim_pos in range(pos, pos + ndims * size_size,
+                                               size_size)])
+            pos += ndims * size_size
+            if read_attributes:
+                attributes, pos = read_attributes(pos)
+            else:
+                attributes, pos = {}, skip_attributes(pos)
+            nc_type, vsize, begin = unpack_footer(buffer, pos)
+            pos += footer_size
+            variables[name] = NetCDF3Variable(
+                name, dims, tuple([dimensions[dim] for dim in dims]),
+                NC_TYPES[nc_type], attributes, begin, vsize,
+                bool(dims) and dims[0] in unlimited)
+        return variables
+
+
+class _TruncatedHeader(Exception):
+    """Raised when the header extends past the block read so far."""
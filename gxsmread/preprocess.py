@@ -14,8 +14,14 @@ Note: these methods assume the provided dataset has been validated
 as corresponding to a gxsm file!
 """
 
+import hashlib
+import numpy as np
+from pathlib import Path
+from typing import BinaryIO
 import xarray
 from . import filename as fn
+from . import instrument
+from . import netcdf3
 from . import utils
 from . import channel_config  as cc
 
@@ -27,15 +33,26 @@ GXSM_DATA_DIFFERENTIAL = 'dz'
 GXSM_KEPT_COORDS = ['dimx', 'dimy']
 GXSM_KEPT_DATA_VARS = [GXSM_DATA_VAR, GXSM_DATA_DIFFERENTIAL]
 
+# Metadata that is the same for all channel files of a scan (unlike e.g. 'dz'
+# or 'basename'), used to check that files are from the same scan.
+GXSM_SCAN_METADATA = ['dateofscan', 't_start', 't_end', 'rangex', 'rangey',
+                      'dx', 'dy']
+
 # For it to be a proper gxsm file, we expect this attr key and val
 GXSM_FORMAT_CHECK = ('Creator', 'gxsm')
 
+# gxsm stores its data as float32: we keep it so after conversion by default.
+DEFAULT_DTYPE = np.float32
+
 
 def preprocess(ds: xarray.Dataset,
                use_physical_units: bool,
                allow_convert_from_metadata: bool,
                simplify_metadata: bool,
-               channels_config_dict: dict | None
+               channels_config_dict: dict | None,
+               dtype: np.dtype = DEFAULT_DTYPE,
+               filename: str | Path | None = None,
+               inplace: bool = False
                ) -> xarray.Dataset:
     """Convert floatfield and (optionally) simplify metadata.
 
@@ -57,26 +74,186 @@ def preprocess(ds: xarray.Dataset,
             to attributes.
         channels_config_dict: a dict containing gxsm channel configuration data
             (including the V-to-x unit conversion for each channel).
+        dtype: the numpy dtype of the converted data.
+        filename: the gxsm filename of the dataset, which its filename
+            attributes (see filename.parse_gxsm_filename()) are parsed from.
+            If None, the path the dataset was opened from is used (which is
+            thus required for datasets opened from buffers).
+        inplace: whether the FloatField array can be scaled in place (see
+            convert_floatfield()). Only safe if the caller owns the dataset's
+            data (e.g. it was just opened for this call): with a (shallow)
+            copy of another dataset, that dataset's data would be scaled too.
+    """
+    if not is_gxsm_file(ds):
+        raise TypeError('The provided file does not appear to be a gxsm file!')
+
+    filename = _get_filename(ds, filename)
+    with instrument.stage(instrument.STAGE_PREPROCESS, filename):
+        with instrument.stage(instrument.STAGE_LOAD_METADATA, filename):
+            ds = load_metadata(ds, ds.encoding.get('source'))
+        ds, channel_config = _convert_channel(ds, filename,
+                                              use_physical_units,
+                                              allow_convert_from_metadata,
+                                              channels_config_dict, dtype,
+                                              inplace)
+        if simplify_metadata:
+            with instrument.stage(instrument.STAGE_CLEAN_UP_METADATA,
+                                  filename):
+                ds = clean_up_metadata(ds, [channel_config.name])
+    return ds
+
+
+def preprocess_channel(ds: xarray.Dataset,
+                       use_physical_units: bool,
+                       allow_convert_from_metadata: bool,
+                       channels_config_dict: dict | None,
+                       dtype: np.dtype = DEFAULT_DTYPE,
+                       filename: str | Path | None = None,
+                       inplace: bool = False
+                       ) -> xarray.Dataset:
+    """Convert floatfield, dropping all metadata.
+
+    A lighter preprocess(), for when only the channel data of a file is
+    needed (e.g. the non-main files of a scan, when merging them with
+    read.open_mfdataset(fast_merge=True)): the metadata is neither loaded
+    nor simplified.
+
+    Args:
+        See preprocess().
+
+    Returns:
+        A Dataset containing only the converted channel data variable, and
+        the kept coords.
     """
     if not is_gxsm_file(ds):
         raise TypeError('The provided file does not appear to be a gxsm file!')
 
+    filename = _get_filename(ds, filename)
+    with instrument.stage(instrument.STAGE_PREPROCESS, filename):
+        ds, channel_config = _convert_channel(ds, filename,
+                                              use_physical_units,
+                                              allow_convert_from_metadata,
+                                              channels_config_dict, dtype,
+                                              inplace)
+    return xarray.Dataset(
+        data_vars={channel_config.name: ds[channel_config.name].variable},
+        coords={coord: ds[coord].variable for coord in GXSM_KEPT_COORDS})
+
+
+def _get_filename(ds: xarray.Dataset, filename: str | Path | None) -> str:
+    """Get the gxsm filename of a dataset (see preprocess())."""
     # Note: Could also use ds['basename'].data.tobytes() [gxsm-specific]
     # (but this is the filepath on the device it was first recorded).
-    filename = ds.encoding['source']
+    if filename is None:
+        filename = ds.encoding.get('source')
+    if filename is None:
+        raise ValueError('The gxsm filename of a dataset not opened from a '
+                         'file must be provided.')
+    return str(filename)
+
+
+def _convert_channel(ds: xarray.Dataset, filename: str,
+                     use_physical_units: bool,
+                     allow_convert_from_metadata: bool,
+                     channels_config_dict: dict | None, dtype: np.dtype,
+                     inplace: bool
+                     ) -> tuple[xarray.Dataset, cc.GxsmChannelConfig]:
+    """Convert floatfield and kept coords, returning the channel config."""
     gxsm_file_attribs = fn.parse_gxsm_filename(filename)
     channel_config = cc.CreateGxsmChannelConfig(channels_config_dict, ds,
                                                 gxsm_file_attribs,
                                                 use_physical_units,
                                                 allow_convert_from_metadata)
-    ds = clean_floatfield(ds)
-    ds = clean_kept_coords(ds)
-    ds = convert_floatfield(ds, channel_config)
-    if simplify_metadata:
-        ds = clean_up_metadata(ds, [channel_config.name])
+    with instrument.stage(instrument.STAGE_CLEAN_FLOATFIELD, filename):
+        ds = clean_floatfield(ds)
+    with instrument.stage(instrument.STAGE_CLEAN_KEPT_COORDS, filename):
+        ds = clean_kept_coords(ds)
+    with instrument.stage(instrument.STAGE_CONVERT_FLOATFIELD, filename):
+        ds = convert_floatfield(ds, channel_config, dtype, inplace=inplace)
+    return ds, channel_config
+
+
+def load_metadata(ds: xarray.Dataset, filename: str | Path | None
+                  ) -> xarray.Dataset:
+    """Load the lazy (dask) metadata variables, with a single read.
+
+    When a gxsm file is opened with dask chunks (as is always the case with
+    xarray.open_mfdataset()), its non-scalar metadata variables are dask
+    arrays as well. Accessing their values (to create the channel config,
+    convert the FloatField or simplify the metadata) would then trigger one
+    dask computation per variable (and per file).
+
+    Instead, we read all metadata variables eagerly from the file header
+    region (see netcdf3.read_variables()), decoding them as xarray would.
+    Only the FloatField (the actual data) remains lazy. For files which are
+    not NetCDF3 (classic) files, they are read with a single non-dask
+    xarray open that skips the FloatField. Without a file to read (e.g. for
+    datasets opened from buffers), or if the decoded values do not match
+    the dataset's variables (e.g. it was opened without CF decoding), they
+    are loaded in a single dask computation instead.
+
+    Args:
+        ds: the Dataset instance to load the metadata of, assumed to be from
+            a gxsm data file.
+        filename: the path of the gxsm data file (or None).
+
+    Returns:
+        The Dataset, with all variables except the FloatField loaded.
+    """
+    lazy_vars = [name for name, var in ds.variables.items()
+                 if name != GXSM_DATA_VAR and var.chunks is not None]
+    if not lazy_vars:
+        return ds
+
+    metadata = {}
+    if filename is not None:
+        metadata = _read_metadata_variables(filename, lazy_vars)
+
+    # A single update: each assignment would re-merge the whole dataset.
+    loaded = {}
+    for name in lazy_vars:
+        var = ds.variables[name]
+        values = metadata.get(name)
+        if (values is not None and values.shape == var.shape
+                and values.dtype.kind == var.dtype.kind):
+            loaded[name] = var.copy(data=values)
+    missing_vars = [name for name in lazy_vars if name not in loaded]
+    if missing_vars:
+        loaded |= xarray.Dataset(
+            {name: ds.variables[name] for name in missing_vars}
+        ).load().variables
+    ds.update({name: loaded[name] for name in lazy_vars})
     return ds
 
 
+def _read_metadata_variables(filename: str | Path, names: list[str]
+                             ) -> dict[str, np.ndarray]:
+    """Read (and decode) variables of a gxsm file, skipping the FloatField.
+
+    Returns:
+        A dict of name:values, as decoded by xarray (with its defaults).
+    """
+    try:
+        with open(filename, 'rb') as file:
+            header = netcdf3.read_header(file)
+            arrays = netcdf3.read_variables(
+                file, [header.variables[name] for name in names])
+    except (ValueError, KeyError):
+        # Not a NetCDF3 (classic) file, e.g. NetCDF4.
+        with xarray.open_dataset(filename, drop_variables=[GXSM_DATA_VAR]
+                                 ) as metadata_ds:
+            return {name: metadata_ds[name].values for name in names
+                    if name in metadata_ds.variables}
+
+    raw_ds = xarray.Dataset(
+        {name: xarray.Variable(header.variables[name].dimensions,
+                               arrays[name],
+                               header.variables[name].attributes)
+         for name in names})
+    metadata_ds = xarray.decode_cf(raw_ds)
+    return {name: metadata_ds[name].values for name in names}
+
+
 def clean_floatfield(ds: xarray.Dataset) -> xarray.Dataset:
     """Remove spurious dimensions from FloatField array.
 
@@ -103,7 +280,8 @@ def clean_floatfield(ds: xarray.Dataset) -> xarray.Dataset:
     return ds
 
 
-def convert_floatfield(ds: xarray.Dataset, channel_config: cc.GxsmChannelConfig
+def convert_floatfield(ds: xarray.Dataset, channel_config: cc.GxsmChannelConfig,
+                       dtype: np.dtype = DEFAULT_DTYPE, inplace: bool = False
                        ) -> xarray.Dataset:
     """Convert gxsm file 'FloatField' variable to 'raw' or 'physical' data.
 
@@ -128,11 +306,21 @@ def convert_floatfield(ds: xarray.Dataset, channel_config: cc.GxsmChannelConfig
         considers V_to_x_conversion to be 1-to-1, and this is a correction of
         that (for the cases where the conversion is *not* 1-to-1).
 
+    Since data['dz'] and V_to_x_conversion are scalars, we fold them into a
+    single scale factor, applied to 'FloatField' in one operation. Thus, at
+    most one full-size array is allocated (none if inplace). If 'FloatField'
+    is a dask array, the scaling is lazy.
+
     Args:
         ds: the Dataset instance we are to convert, assumed to be from a gxsm
             data file.
         channel_config: a GxsmChannelConfig instance, holding the necessary
             info to convert and name our new data variable.
+        dtype: the numpy dtype of the converted data. Note that the scale
+            factor is cast to it before being applied.
+        inplace: whether to scale the 'FloatField' array in place (when
+            possible, i.e. it is a writeable numpy array of dtype dtype),
+            rather than allocating a new array.
 
     Returns:
         A modified Dataset, where the 'FloatField' variable has been replaced
@@ -145,10 +333,20 @@ def convert_floatfield(ds: xarray.Dataset, channel_config: cc.GxsmChannelConfig
     Raises:
         None.
     """
-    converted_data = (ds[GXSM_DATA_VAR] * ds[GXSM_DATA_DIFFERENTIAL]
-                      * channel_config.conversion_factor)
-
-    converted_data.attrs['units'] = channel_config.units
+    dtype = np.dtype(dtype)
+    scale = (ds[GXSM_DATA_DIFFERENTIAL].item() *
+             channel_config.conversion_factor)
+
+    da = ds[GXSM_DATA_VAR]
+    if da.chunks is not None:  # dask array, keep lazy
+        data = da.data.astype(dtype) * dtype.type(scale)
+    elif inplace and da.dtype == dtype and da.values.flags.writeable:
+        data = np.multiply(da.values, scale, out=da.values, dtype=dtype)
+    else:
+        data = np.multiply(da.values, scale, dtype=dtype)
+
+    converted_data = da.copy(data=data)
+    converted_data.attrs = {'units': channel_config.units}
     ds[channel_config.name] = converted_data
 
     # Delete the original data variables
@@ -243,6 +441,42 @@ def clean_up_metadata(ds: xarray.Dataset, saved_vars_list: list = []
     return new_ds
 
 
+def get_channel_names(ds: xarray.Dataset) -> list[str]:
+    """Get the names of the (pre-processed) channel data variables.
+
+    These are the data variables spanning the kept coords, i.e. of
+    dimensions ('dimy', 'dimx').
+    """
+    return [name for name, var in ds.data_vars.items()
+            if set(var.dims) == set(GXSM_KEPT_COORDS)]
+
+
+def get_scan_fingerprint(filename_or_obj: str | Path | bytes | BinaryIO
+                         ) -> str:
+    """Compute a fingerprint of the scan a gxsm file is from.
+
+    The channel files of a scan share the same fingerprint. It is a hash of
+    the file's GXSM_SCAN_METADATA values and of the set of kept coordinate
+    values (backward scans having a flipped 'dimx'). These are read directly
+    from the file header (see netcdf3.read_metadata()), so this is cheap.
+
+    Args:
+        filename_or_obj: path of the gxsm file, its contents (bytes), or a
+            seekable binary file object.
+
+    Returns:
+        The fingerprint, as a hex string.
+    """
+    variables = netcdf3.read_metadata(filename_or_obj)[
+        netcdf3.KEY_VARIABLES]
+    fingerprint = hashlib.sha256()
+    for key in GXSM_SCAN_METADATA:
+        fingerprint.update(repr((key, variables.get(key))).encode())
+    for coord in GXSM_KEPT_COORDS:
+        fingerprint.update(np.sort(variables.get(coord, [])).tobytes())
+    return fingerprint.hexdigest()
+
+
 def is_gxsm_file(ds: xarray.Dataset) -> bool:
     """Check if the provided file is a supported gxsm file."""
     try:
@@ -1,7 +1,8 @@
 """Contains read methods for a gxsm file.
 
 This file contains the main methods to read from gxsm files and
-convert to a NETCDF4 / HDF5 file.
+convert to a NETCDF4 / HDF5 file (see convert.py to convert whole scan sets
+to NetCDF4 or Zarr stores).
 
 For simplicity, we simply override the two main dataset accessor files
 from xarray: open_dataset() and open_mfdataset() (allowing usage of
@@ -12,22 +13,79 @@ Read the description of each method for more info.
 Basic usage:
     ds = open_dataset(...)
     multifile_ds = open_mfdataset(...)
+    scan_sets = open_directory(...)
+    series_ds = open_series(...)
+    spec_df = open_spec(...)
+    spec_array, spec_metadata = open_spec(..., output=SPEC_OUTPUT_STRUCTURED)
+    spec_metadata = open_spec_metadata(...)
+    multifile_spec_df = open_spec_many(...)
+    grid_spec_ds = open_spec_grid(...)
+    for spec_df_chunk in iter_spec(...):
+        [...]
 """
 
+import fnmatch
+import glob
+import io
+import os
+import re
+import tempfile
 import xarray
+import numpy as np
 import pandas as pd
+from collections.abc import Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 from functools import partial
+from typing import BinaryIO, Iterator, TextIO
+from . import cache as spec_cache
 from . import channel_config as cc
+from . import filename as fn
+from . import instrument
+from . import netcdf3
 from . import preprocess as pp
 from . import spec
+from . import utils
 
+GXSM_FILE_PATTERN = '*.nc'
+# The xarray.open_mfdataset() arguments (merging options) which
+# xarray.open_dataset() does not take: ignored by fast_merge.
+MFDATASET_ONLY_KWARGS = ['combine', 'compat', 'join', 'data_vars', 'coords',
+                         'combine_attrs', 'parallel', 'attrs_file']
+# Approximate size (in bytes) of the chunks of memory-mapped FloatFields.
+MEMMAP_CHUNK_SIZE = 2**22
 
-def open_mfdataset(paths: str | list[str | Path],
+# Time series of scans (see open_series())
+SERIES_DIM_FRAME = 'frame'
+SERIES_COORD_FILE_BASE = 'file_base'
+SERIES_ORDER_NUMBER = 'number'
+SERIES_ORDER_TIME = 'time'
+SERIES_NUMBER_REGEX = re.compile(r'(\d+)$')
+SERIES_TIME_KEY = 't_start'
+
+# Output types of open_spec()
+SPEC_OUTPUT_DATAFRAME = 'dataframe'
+SPEC_OUTPUT_STRUCTURED = 'structured'
+SPEC_OUTPUT_XARRAY = 'xarray'
+SPEC_OUTPUTS = [SPEC_OUTPUT_DATAFRAME, SPEC_OUTPUT_STRUCTURED,
+                SPEC_OUTPUT_XARRAY]
+# The row dimension of open_spec() Datasets
+SPEC_DIM_ROW = spec.VP_HEADER_INDEX_NAME
+
+# By default, probe positions closer than this fraction of the largest gap
+# between distinct positions are considered the same grid position.
+GRID_POSITION_TOLERANCE = 0.25
+
+
+def open_mfdataset(paths: str | list[str | Path]
+                   | Mapping[str, bytes | BinaryIO],
                    channels_config_path: str | Path | None = None,
                    use_physical_units: bool = True,
                    allow_convert_from_metadata: bool = False,
-                   simplify_metadata: bool = True, **kwargs
+                   simplify_metadata: bool = True,
+                   dtype: np.dtype = pp.DEFAULT_DTYPE,
+                   fast_merge: bool = False, **kwargs
                    ) -> xarray.Dataset:
     """Open multiple files as a single dataset.
 
@@ -50,11 +108,19 @@ def open_mfdataset(paths: str | list[str | Path],
         - compat='identical': to enforce that we expect all same-named
             variables to be identical.
 
+    Since this compares all (100+) metadata variables of all files, it can
+    dominate the time to open a scan. Alternatively, with fast_merge, the
+    files are merged with gxsm-specific logic (see _merge_scan_datasets()).
+
     Args:
         paths: either a string glob in the form "path/to/my/files/*.nc" or an
             explicit list of files to open. Paths can be given as strings or
             as pathlib Paths. Note that the xarray option of nested
-            list-of-lists is not supported here.
+            list-of-lists is not supported here. Alternatively, a dict of
+            FILENAME:BUFFER, holding the contents (as bytes or binary file
+            objects) of the gxsm files named FILENAME (see
+            filename.parse_gxsm_filename()). Buffers are always merged with
+            fast_merge, as xarray.open_mfdataset() only opens paths.
         channels_config_path: either a string or Path to a 'channels config'
             toml file, containing the channel information for raw-to-physical
             conversion. See examples/channels_config.toml for an example.
@@ -68,6 +134,14 @@ def open_mfdataset(paths: str | list[str | Path],
             as a fallback (i.e. if the config does not contain it).
         simplify_metadata: whether or not to convert all metadata variables
             to attributes.
+        dtype: the numpy dtype of the converted channel data.
+        fast_merge: whether to merge the files with gxsm-specific logic,
+            rather than with xarray.open_mfdataset(). In this case, kwargs
+            are passed to xarray.open_dataset() for each file, except the
+            merging options of xarray.open_mfdataset() (see
+            MFDATASET_ONLY_KWARGS), which are ignored.
+        **kwargs: arguments passed to xarray.open_mfdataset() (or to
+            xarray.open_dataset(), with fast_merge).
 
     Returns:
         An xarray.Dataset instance, with each file's data being stored as a data
@@ -77,32 +151,69 @@ def open_mfdataset(paths: str | list[str | Path],
     # Getting open_mfdataset() args from kwargs if user provided (and setting
     # our known default, for it to work). Basically, we trust the user to
     # know what they are doing.
-    combine = kwargs.get('combine', 'nested')
-    compat = kwargs.get('compat', 'identical')
-    join = kwargs.get('join', 'outer')
+    combine = kwargs.pop('combine', 'nested')
+    compat = kwargs.pop('compat', 'identical')
+    join = kwargs.pop('join', 'outer')
 
     channels_config_dict = cc.load_channels_config_dict(channels_config_path)
     partial_func = partial(pp.preprocess,
                            use_physical_units=use_physical_units,
                            allow_convert_from_metadata=allow_convert_from_metadata,
                            simplify_metadata=simplify_metadata,
-                           channels_config_dict=channels_config_dict)
+                           channels_config_dict=channels_config_dict,
+                           dtype=dtype, inplace=True)
+    if isinstance(paths, Mapping):
+        fast_merge = True
+    if fast_merge:
+        kwargs = {key: val for key, val in kwargs.items()
+                  if key not in MFDATASET_ONLY_KWARGS}
+        # Lazy by default, as with xarray.open_mfdataset()
+        kwargs.setdefault('chunks', {})
+        if isinstance(paths, Mapping):
+            sources = [_as_binary_file(obj) for obj in paths.values()]
+            paths = [str(path) for path in paths]
+        else:
+            paths = sources = _expand_paths(paths)
+        main_path = _get_main_path(paths)
+        # Only the main file's metadata is kept: we only need the channel
+        # data of the others.
+        channel_func = partial(pp.preprocess_channel,
+                               use_physical_units=use_physical_units,
+                               allow_convert_from_metadata=allow_convert_from_metadata,
+                               channels_config_dict=channels_config_dict,
+                               dtype=dtype, inplace=True)
+        with instrument.stage(instrument.STAGE_OPEN_MFDATASET):
+            datasets = []
+            for path, source in zip(paths, sources):
+                with instrument.stage(instrument.STAGE_OPEN, path):
+                    ds = xarray.open_dataset(source, **kwargs)
+                func = partial_func if path == main_path else channel_func
+                datasets.append(func(ds, filename=path))
+            with instrument.stage(instrument.STAGE_MERGE):
+                return _merge_scan_datasets(paths, datasets, main_path,
+                                            sources)
+
     # Note: in principle, we could use combine='by_coords'. For some reason,
     # it appears that using this (instead of 'nested') causes the combination
     # of attributes (metadata) to miss some (presumably, because they only
     # exist in the main file). For now, sticking with nested. In the future,
     # we could try both.
-    return xarray.open_mfdataset(paths, preprocess=partial_func,
-                                 concat_dim=None, combine=combine,
-                                 compat=compat, join=join, **kwargs)
+    # Note: the opening and merging of files is done within xarray, so only
+    # the (per-file) preprocess stages are instrumented separately.
+    with instrument.stage(instrument.STAGE_OPEN_MFDATASET):
+        return xarray.open_mfdataset(paths, preprocess=partial_func,
+                                     concat_dim=None, combine=combine,
+                                     compat=compat, join=join, **kwargs)
 
 
-def open_dataset(filename_or_obj: str | Path,
+def open_dataset(filename_or_obj: str | Path | bytes | BinaryIO,
                  channels_config_path: str | Path | None = None,
                  use_physical_units: bool = True,
                  allow_convert_from_metadata: bool = False,
-                 simplify_metadata: bool = True, **kwargs
-                 ) -> xarray.Dataset:
+                 simplify_metadata: bool = True,
+                 dtype: np.dtype = pp.DEFAULT_DTYPE, memmap: bool = False,
+                 filename: str | Path | fn.GxsmFileAttribs | None = None,
+                 **kwargs) -> xarray.Dataset:
     """Open and decode a dataset from a file or file object.
 
     Wrapper on top of xarray.open_dataset(), for handling gxsm nc
@@ -118,8 +229,10 @@ def open_dataset(filename_or_obj: str | Path,
 
     Args:
         filename_or_obj: path of the file to open, can be given as a string
-            or a pathlib Path. Note that other xarray type options are not
-            supported here.
+            or a pathlib Path. Alternatively, the file contents, as bytes or
+            a binary file object: these are read in memory (with xarray's
+            scipy engine), without touching disk. Note that other xarray
+            type options are not supported here.
         channels_config_path: either a string or Path to a 'channels config'
             toml file, containing the channel information for raw-to-physical
             conversion. See examples/channels_config.toml for an example.
@@ -133,21 +246,284 @@ def open_dataset(filename_or_obj: str | Path,
             as a fallback (i.e. if the config does not contain it).
         simplify_metadata: whether or not to convert all metadata variables
             to attributes.
+        dtype: the numpy dtype of the converted channel data.
+        memmap: whether to memory-map the FloatField from the file, rather
+            than reading it (see _open_dataset_memmap()). The channel data is
+            then a (lazy) dask array, only read when accessed. Only
+            supported for paths.
+        filename: the gxsm filename of the file (or its filename attributes,
+            see filename.parse_gxsm_filename()), used to determine its
+            channel. Required for buffers; if None, the path is used.
 
     Returns:
         An xarray.Dataset instance, with the file's data being stored as a data
         variable named $channel$, where $channel$ is the channel name for the
         file in the file structure.
+
+    Raises:
+        ValueError if a buffer is given without its filename, or with memmap.
     """
     channels_config_dict = cc.load_channels_config_dict(channels_config_path)
-    ds = xarray.open_dataset(filename_or_obj, **kwargs)
+    if isinstance(filename, fn.GxsmFileAttribs):
+        filename = fn.format_gxsm_filename(filename)
+    if not _is_path(filename_or_obj):
+        if filename is None:
+            raise ValueError('The gxsm filename of a buffer must be '
+                             'provided.')
+        if memmap:
+            raise ValueError('Only files (not buffers) can be '
+                             'memory-mapped.')
+        filename_or_obj = _as_binary_file(filename_or_obj)
+    elif filename is None:
+        filename = filename_or_obj
+
+    with instrument.stage(instrument.STAGE_OPEN, filename):
+        if memmap:
+            ds = _open_dataset_memmap(filename_or_obj, **kwargs)
+        else:
+            ds = xarray.open_dataset(filename_or_obj, **kwargs)
     return pp.preprocess(ds, use_physical_units=use_physical_units,
                          allow_convert_from_metadata=allow_convert_from_metadata,
                          simplify_metadata=simplify_metadata,
-                         channels_config_dict=channels_config_dict)
+                         channels_config_dict=channels_config_dict,
+                         dtype=dtype, filename=filename, inplace=True)
+
+
+class ScanSets(Mapping):
+    """Lazy mapping of file_base:xarray.Dataset, one per scan set.
+
+    A scan set (i.e. the channel files sharing a file_base) is only opened
+    (with open_mfdataset()) when first accessed, in a worker thread. The
+    opened datasets are kept, so later accesses are free. To open several
+    scan sets concurrently, prefetch() them before accessing them.
+
+    Can be used as a context manager, shutting down its workers on exit.
+
+    Attributes:
+        groups: dict of file_base:paths, for each scan set.
+        errors: dict of PATH:EXCEPTION for the files that could not be
+            grouped into a scan set (i.e. not gxsm filenames).
+    """
+
+    def __init__(self, groups: dict[str, list[str]], workers: int | None,
+                 errors: dict[str, Exception] | None = None, **kwargs):
+        self.groups = groups
+        self.errors = errors if errors is not None else {}
+        self._kwargs = kwargs
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._futures = {}
+
+    def __getitem__(self, file_base: str) -> xarray.Dataset:
+        return self._submit(file_base).result()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.groups)
+
+    def __len__(self) -> int:
+        return len(self.groups)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def prefetch(self, file_bases: list[str] | None = None) -> 'ScanSets':
+        """Start opening scan sets in the background.
+
+        Args:
+            file_bases: the scan sets to open. If None, all are opened.
+
+        Returns:
+            This instance (for chaining).
+        """
+        for file_base in (file_bases if file_bases is not None
+                          else self.groups):
+            self._submit(file_base)
+        return self
+
+    def close(self):
+        """Shut down the worker threads (waiting for pending opens)."""
+        self._executor.shutdown()
+
+    def _submit(self, file_base: str) -> Future:
+        if file_base not in self.groups:
+            raise KeyError(file_base)
+        if file_base not in self._futures:
+            self._futures[file_base] = self._executor.submit(
+                open_mfdataset, self.groups[file_base], **self._kwargs)
+        return self._futures[file_base]
+
+
+def open_directory(directory: str | Path,
+                   pattern: str = GXSM_FILE_PATTERN,
+                   workers: int | None = None, **kwargs) -> ScanSets:
+    """Open all the scan sets in a directory, as a lazy mapping.
+
+    The files in the directory matching pattern are grouped by their
+    file_base (see find_scan_sets()), each group corresponding to a scan
+    set. Each scan set is opened with open_mfdataset() when accessed (see
+    ScanSets). Files which are not gxsm filenames are skipped, and reported
+    in the errors of the ScanSets.
+
+    Note: xarray.DataTree would be the natural container here, but is not
+    available in the supported xarray versions.
+
+    Args:
+        directory: the directory containing the gxsm files (sub-directories
+            are not searched).
+        pattern: glob pattern of the files to open.
+        workers: the maximum number of scan sets opened concurrently. If
+            None, we use the ThreadPoolExecutor default.
+        **kwargs: arguments passed to open_mfdataset() (e.g.
+            channels_config_path).
+
+    Returns:
+        A ScanSets instance, mapping each file_base to its xarray.Dataset.
+
+    Raises:
+        ValueError if directory is not a path (see find_scan_sets()).
+    """
+    errors = {}
+    groups = find_scan_sets(directory, pattern, errors)
+    return ScanSets(groups, workers, errors, **kwargs)
+
+
+def find_scan_sets(directory: str | Path, pattern: str = GXSM_FILE_PATTERN,
+                   errors: dict[str, Exception] | None = None
+                   ) -> dict[str, list[str]]:
+    """Find the scan sets in a directory.
+
+    Args:
+        directory: the directory containing the gxsm files (sub-directories
+            are not searched).
+        pattern: glob pattern of the files to consider.
+        errors: optional dict, to which PATH:EXCEPTION pairs are added for
+            the files skipped as not being gxsm filenames.
+
+    Returns:
+        A dict of file_base:paths (see filename.group_by_file_base()).
+
+    Raises:
+        ValueError if directory is not a path (e.g. a buffer): the files of
+        a scan set held in memory can be opened with open_mfdataset().
+    """
+    if not _is_path(directory):
+        raise ValueError(f'A directory path is expected, got '
+                         f'{type(directory).__name__}: use open_mfdataset() '
+                         f'to open buffers.')
+    with os.scandir(directory) as entries:
+        paths = [entry.path for entry in entries
+                 if entry.is_file() and fnmatch.fnmatch(entry.name, pattern)]
+    return fn.group_by_file_base(paths, errors)
+
+
+def open_series(paths: str | list[str | Path]
+                | Mapping[str, bytes | BinaryIO],
+                order_by: str = SERIES_ORDER_NUMBER,
+                frame_attrs: list[str] | None = None,
+                **kwargs) -> xarray.Dataset:
+    """Open a time series of scan sets as a single dataset, frame by frame.
+
+    Sequential scans of the same area (e.g. file_bases 'chigwell009',
+    'chigwell010', ...) are stacked along a new SERIES_DIM_FRAME dimension.
+    Each scan set is opened lazily (with open_mfdataset(fast_merge=True)),
+    so the channel data is a dask array with one chunk per frame and
+    channel: it is only read when computed, and memory does not grow with
+    the length of the series.
 
+    The frames are ordered by:
+        - SERIES_ORDER_NUMBER: the number at the end of their file_base;
+        - SERIES_ORDER_TIME: their acquisition time (SERIES_TIME_KEY, read
+            from the header of their main file, see netcdf3.read_metadata()).
 
-def open_spec(filename: str | Path) -> pd.DataFrame:
+    The file_base of each frame is stored in the SERIES_COORD_FILE_BASE
+    coord. The metadata (attrs) differing between frames are stored as
+    coords along SERIES_DIM_FRAME (see frame_attrs), while those common to
+    all frames are kept as attrs. Note that the spatial coords are those of
+    the first frame: all frames must have the same dimensions.
+
+    Args:
+        paths: either a string glob in the form "path/to/my/files/*.nc" or an
+            explicit list of files to open, from one or more scan sets (see
+            filename.group_by_file_base()). Alternatively, a dict of
+            FILENAME:BUFFER, holding the contents (as bytes or binary file
+            objects) of the gxsm files named FILENAME (see
+            open_mfdataset()). File objects are read (from their current
+            position) when called.
+        order_by: SERIES_ORDER_NUMBER or SERIES_ORDER_TIME.
+        frame_attrs: the attrs to store as per-frame coords. If None, all
+            scalar attrs differing between frames are (the other differing
+            attrs being dropped).
+        **kwargs: arguments passed to open_mfdataset() (e.g.
+            channels_config_path). simplify_metadata must be left True.
+
+    Returns:
+        An xarray.Dataset instance, with each channel's data of dims
+        (SERIES_DIM_FRAME, dimy, dimx).
+
+    Raises:
+        ValueError if order_by is unknown, or a file_base has no number
+        (with SERIES_ORDER_NUMBER).
+    """
+    is_buffers = isinstance(paths, Mapping)
+    paths, sources = _get_sources(paths)
+    sources = dict(zip(paths, sources))
+    groups = fn.group_by_file_base(paths)
+    if order_by == SERIES_ORDER_NUMBER:
+        def sort_key(file_base):
+            match = SERIES_NUMBER_REGEX.search(file_base)
+            if match is None:
+                raise ValueError(f'file_base {file_base} does not end with '
+                                 f'a number.')
+            return int(match.group(1))
+    elif order_by == SERIES_ORDER_TIME:
+        def sort_key(file_base):
+            metadata = netcdf3.read_metadata(
+                sources[_get_main_path(groups[file_base])])
+            return metadata[netcdf3.KEY_VARIABLES][SERIES_TIME_KEY]
+    else:
+        raise ValueError(f'Unknown order_by {order_by}, expected '
+                         f'{SERIES_ORDER_NUMBER} or {SERIES_ORDER_TIME}.')
+    file_bases = sorted(groups, key=sort_key)
+
+    kwargs.setdefault('chunks', {})
+    if is_buffers:
+        groups = {file_base: {path: sources[path] for path in group}
+                  for file_base, group in groups.items()}
+    datasets = [open_mfdataset(groups[file_base], fast_merge=True, **kwargs)
+                for file_base in file_bases]
+    if frame_attrs is None:
+        frame_attrs = _get_differing_scalar_attrs(datasets)
+    frame_coords = {name: (SERIES_DIM_FRAME,
+                           [ds.attrs.get(name) for ds in datasets])
+                    for name in frame_attrs}
+
+    # Only the channel data is concatenated: the other variables and coords
+    # (and the indexes) are taken from the first frame, without comparing
+    # (i.e. loading) them.
+    series_ds = xarray.concat(datasets, dim=SERIES_DIM_FRAME,
+                              data_vars=pp.get_channel_names(datasets[0]),
+                              coords='minimal',
+                              compat='override', join='override',
+                              combine_attrs='drop_conflicts')
+    series_ds = series_ds.assign_coords(
+        {SERIES_DIM_FRAME: np.arange(len(datasets)),
+         SERIES_COORD_FILE_BASE: (SERIES_DIM_FRAME, file_bases),
+         **frame_coords})
+    for name in frame_attrs:
+        series_ds.attrs.pop(name, None)
+    series_ds.set_close(partial(_close_datasets, datasets))
+    return series_ds
+
+
+def open_spec(filename: str | Path | bytes | BinaryIO | TextIO,
+              usecols: list[int | str] | None = None,
+              dtype: np.dtype = np.float32,
+              cache: spec_cache.SpecCache | str | Path | None = None,
+              output: str = SPEC_OUTPUT_DATAFRAME
+              ) -> pd.DataFrame | tuple[np.ndarray | xarray.Dataset,
+                                        spec.SpecMetadata]:
     """Open and decode spec data from a file or file object.
 
     Reads gxsm 'VP' style spectroscopy files (Vector Probe), converting them to
@@ -167,25 +543,728 @@ def open_spec(filename: str | Path) -> pd.DataFrame:
 
     Args:
         filename: path of the file to open, can be given as a string
-            or a pathlib Path.
+            or a pathlib Path. Alternatively, the file contents, as bytes or
+            a (text or binary) file object.
+        usecols: optional list of data columns to read, given either as
+            column indices or channel names. If None, all columns are read.
+        dtype: the numpy dtype to store the data in (e.g. np.float32 or
+            np.float64).
+        cache: optional cache.SpecCache instance (or the directory of one)
+            to store the parsed file in. If the file was already parsed
+            into it, its data is memory-mapped from the cache rather than
+            parsed again (and is thus read-only). Only supported for
+            paths. Storing into it is best-effort: if it fails (e.g. a
+            full or read-only cache), the parsed file is still returned.
+        output: the type of the returned data:
+            - SPEC_OUTPUT_DATAFRAME: a pandas.DataFrame, holding the metadata
+                and units in its attrs.
+            - SPEC_OUTPUT_STRUCTURED: a numpy structured array, with a field
+                per channel, viewing the parsed data (no copy).
+            - SPEC_OUTPUT_XARRAY: an xarray.Dataset, with a data variable
+                per channel (viewing the parsed data) along the
+                SPEC_DIM_ROW dimension, the 'Index' column (if read) being
+                its coord.
+            The latter two avoid the overhead of building a DataFrame (and
+            of copying its attrs), returning the metadata and units in a
+            separate spec.SpecMetadata. Their channel names are made unique
+            (see spec.get_unique_names()).
+
+    Returns:
+        If output is SPEC_OUTPUT_DATAFRAME, a pandas.DataFrame instance, with
+        the file's data stored with channels explicited and units as an attr
+        in each Series' attr instance. Otherwise, a tuple of the structured
+        array (or xarray.Dataset) and its spec.SpecMetadata.
+
+    Raises:
+        ValueError if output is unknown, or a buffer is given with a cache.
+    """
+    if output not in SPEC_OUTPUTS:
+        raise ValueError(f'Unknown output {output}, expected one of '
+                         f'{SPEC_OUTPUTS}.')
+
+    if cache is not None:
+        if not _is_path(filename):
+            raise ValueError('Only files (not buffers) can be cached.')
+        if not isinstance(cache, spec_cache.SpecCache):
+            cache = spec_cache.SpecCache(cache)
+        with instrument.stage(instrument.STAGE_SPEC_CACHE, filename):
+            cached_spec = cache.get(filename, usecols, dtype)
+        if cached_spec is not None:
+            return _create_spec_output(filename, cached_spec.data,
+                                       cached_spec.names, cached_spec.units,
+                                       cached_spec.raw_metadata, output)
+
+    stage_filename = filename if _is_path(filename) else None
+    with _open_spec_file(filename) as file:
+        with instrument.stage(instrument.STAGE_SPEC_HEADER, stage_filename):
+            reader = spec.SpecReader(file, usecols, dtype)
+        with instrument.stage(instrument.STAGE_SPEC_DATA, stage_filename):
+            data = reader.read_data()
+
+    if cache is not None:
+        try:
+            cache.put(filename, spec_cache.CachedSpec(reader.raw_metadata,
+                                                      reader.names,
+                                                      reader.units, data),
+                      usecols, dtype)
+        except OSError:
+            pass  # Caching is best-effort (e.g. a full or read-only cache)
+
+    return _create_spec_output(stage_filename, data, reader.names,
+                               reader.units, reader.raw_metadata, output)
+
+
+def open_spec_metadata(filename: str | Path | bytes | BinaryIO | TextIO,
+                       typed: bool = False) -> dict:
+    """Open the metadata of a spec file, without reading its data.
+
+    Only the file header (up to the first '#C' line) is read, making this
+    much faster than open_spec() when only the metadata is of interest
+    (e.g. to catalogue or filter spec files).
+
+    Args:
+        filename: path of the file to open, can be given as a string
+            or a pathlib Path. Alternatively, the file contents, as bytes or
+            a (text or binary) file object.
+        typed: whether to tokenize the raw metadata into typed subkey vals
+            (see spec.tokenize_metadata()), rather than keeping each as a
+            single string, and to type the 'useful' metadata (see
+            spec.parse_useful_metadata()). Useful when querying many
+            metadata attributes.
 
     Returns:
-        A pandas.DataFrame instance, with the file's data stored with channels
-        explicited and units as an attr in each Series' attr instance.
-    """
-    raw_metadata = {}
-    data = None
-    names = None
-    units = None
-    with open(filename, 'r') as file:
-        lines = file.readlines()
-        spec.validate_spec_file(lines)
-        raw_metadata = spec.extract_raw_metadata(lines)
-        names, units, data = spec.extract_data(lines)
+        A dict containing the raw metadata (METADATA_KEY:METADATA_STR, as
+        stored in the attrs of open_spec(), or METADATA_KEY:{SUB_KEY:VAL}
+        if typed) and the parsed 'useful' metadata (see
+        spec.parse_useful_metadata()).
+    """
+    with _open_spec_file(filename) as file:
+        spec.validate_spec_file([file.readline()])
+        raw_metadata = spec.read_raw_metadata(file)
+
+    if typed:
+        return spec.tokenize_metadata(raw_metadata) | \
+            spec.parse_useful_metadata(raw_metadata, typed=True)
+    return _get_spec_metadata(raw_metadata)
+
+
+def iter_spec(filename: str | Path | bytes | BinaryIO | TextIO,
+              chunk_size: int = spec.DEFAULT_CHUNK_SIZE,
+              usecols: list[int | str] | None = None,
+              dtype: np.dtype = np.float32) -> Iterator[pd.DataFrame]:
+    """Iterate over spec data from a file, as DataFrames of chunk_size rows.
+
+    Streaming equivalent of open_spec(): the file is read in a single pass,
+    and only chunk_size data rows are held in memory at a time. This allows
+    handling spectroscopy files of any length with bounded memory.
+
+    Each chunk holds the same attrs as the DataFrame returned by open_spec()
+    (metadata and units), and is indexed by its row number within the full
+    data table.
+
+    Args:
+        filename: path of the file to open, can be given as a string
+            or a pathlib Path. Alternatively, the file contents, as bytes or
+            a (text or binary) file object.
+        chunk_size: the maximum number of data rows per DataFrame.
+        usecols: optional list of data columns to read, given either as
+            column indices or channel names. If None, all columns are read.
+        dtype: the numpy dtype to store the data in (e.g. np.float32 or
+            np.float64).
+
+    Yields:
+        pandas.DataFrame instances of (at most) chunk_size rows.
+    """
+    with _open_spec_file(filename) as file:
+        reader = spec.SpecReader(file, usecols, dtype)
+        metadata = _get_spec_metadata(reader.raw_metadata)
+        start_row = 0
+        for data in reader.iter_data(chunk_size):
+            df = _create_spec_dataframe(data, reader.names, reader.units,
+                                        metadata)
+            df.index += start_row
+            start_row += len(df)
+            yield df
+
+
+def open_spec_many(paths: str | list[str | Path]
+                   | Mapping[str, bytes | BinaryIO],
+                   workers: int | None = None,
+                   usecols: list[int | str] | None = None,
+                   dtype: np.dtype = np.float32) -> pd.DataFrame:
+    """Open multiple spec files in parallel, as a single long-form DataFrame.
+
+    Each file is parsed (as in open_spec()) in a separate worker process, and
+    the results are concatenated into a DataFrame indexed by (file, row).
+    Next to the data channels, the 'useful' metadata parsed for each file
+    (see spec.parse_useful_metadata()) is stored as columns, i.e.:
+    KEY_PROBE_POS_X, KEY_PROBE_POS_Y, KEY_PROBE_POS_UNITS, KEY_DATE and
+    KEY_FILENAME. Repeated channels are made unique (see
+    spec.get_unique_names()); files with different channels hold NaN in the
+    channels they lack.
+
+    A file failing to parse does not stop the others from loading: the
+    exception raised for it is stored in the DataFrame's attrs, as a dict
+    with key spec.KEY_ERRORS, containing FILE:EXCEPTION pairs.
+
+    Args:
+        paths: either a string glob in the form "path/to/my/files/*.vpdata"
+            or an explicit list of files to open. Paths can be given as
+            strings or as pathlib Paths. Alternatively, a dict of
+            FILENAME:BUFFER, holding the contents (as bytes or binary file
+            objects) of the spec files named FILENAME. File objects are read
+            (from their current position) in the calling process.
+        workers: the number of worker processes to use. If None, we use the
+            number of CPUs. If 1, files are parsed in the calling process.
+        usecols: optional list of data columns to read, given either as
+            column indices or channel names. If None, all columns are read.
+        dtype: the numpy dtype to store the data in (e.g. np.float32 or
+            np.float64).
+
+    Returns:
+        A pandas.DataFrame instance, indexed by (file, row), with the units
+        of each channel and the per-file errors in its attrs.
+    """
+    paths, sources = _get_sources(paths)
+    results = _map_read_spec_file(sources, workers, usecols, dtype)
+    return _create_spec_many_dataframe(paths, results)
+
 
+def open_spec_grid(paths: str | list[str | Path]
+                   | Mapping[str, bytes | BinaryIO],
+                   workers: int | None = None,
+                   usecols: list[int | str] | None = None,
+                   dtype: np.dtype = np.float32,
+                   num_points: int | None = None,
+                   memmap_path: str | Path | None = None,
+                   position_tolerance: float | None = None
+                   ) -> xarray.Dataset:
+    """Open grid spectroscopy spec files as a single (y, x, point) Dataset.
+
+    In grid spectroscopy, gxsm writes one spec file per grid point. This
+    method assembles them into a 'hyperspectral cube': an xarray.Dataset
+    with, for each channel of the data table, a data variable of dims
+    (GRID_DIM_Y, GRID_DIM_X, GRID_DIM_POINT).
+
+    The files are read in 2 passes, both in worker processes:
+        1. Their headers only (up to the data table): the channels, the
+            number of points, and the probe positions (see
+            spec.KEY_PROBE_POS_X/Y) which are the grid coordinates.
+            Positions within position_tolerance of each other (e.g. due to
+            drift or jitter of the probe) are considered the same grid
+            position, whose coordinate is their mean. Each file is then
+            placed in the grid.
+        2. Their data table, parsed chunk by chunk straight into a
+            preallocated array holding all channels (no per-file array is
+            sent back). Worker processes write it through a memory-mapped
+            .npy file: memmap_path, or a temporary file which is read into
+            memory once filled.
+
+    Missing grid points and sweeps shorter than num_points are padded with
+    NaN. Files that cannot be placed in the grid (unreadable, different
+    channels, more than num_points rows, or a position already filled by
+    another file) are skipped: the exception raised for each of them is
+    stored in the Dataset's attrs, as a dict with key spec.KEY_ERRORS. The
+    file placed at each grid point is stored in the GRID_COORD_PATH coord.
+
+    Args:
+        paths: either a string glob in the form "path/to/my/files/*.vpdata"
+            or an explicit list of files to open. Paths can be given as
+            strings or as pathlib Paths. Alternatively, a dict of
+            FILENAME:BUFFER, holding the contents (as bytes or binary file
+            objects) of the spec files named FILENAME. File objects are read
+            (from their current position) in the calling process.
+        workers: the number of worker processes to use. If None, we use the
+            number of CPUs. If 1, files are parsed in the calling process.
+        usecols: optional list of data columns to read, given either as
+            column indices or channel names. If None, all columns are read.
+        dtype: the (floating point) numpy dtype to store the data in.
+        num_points: the size of the GRID_DIM_POINT dimension. If None, we
+            use the largest number of points in the file headers (see
+            spec.IN_KEYS_NUM_POINTS), ignoring the headers without it.
+        memmap_path: optional path of a .npy file to store the data in
+            (memory-mapped), of shape (channel, y, x, point).
+        position_tolerance: the largest difference between the x (or y)
+            positions of files at the same grid position. If None, we use
+            GRID_POSITION_TOLERANCE times the largest gap between distinct x
+            or y positions.
+
+    Returns:
+        An xarray.Dataset instance, with a data variable per channel (see
+        spec.get_unique_names() for repeated channels), each holding its
+        units as an attr.
+
+    Raises:
+        ValueError if none of the files can be read, or if num_points is None
+        and none of the file headers holds it.
+    """
+    paths, sources = _get_sources(paths)
+    errors = {}
+    headers = {}
+    for path, result in zip(paths, utils.map_parallel(
+            partial(_read_spec_grid_header, usecols=usecols, dtype=dtype),
+            sources, workers)):
+        if isinstance(result, Exception):
+            errors[path] = result
+        else:
+            headers[path] = result
+    if not headers:
+        raise ValueError('None of the provided spec files could be read.')
+
+    # The grid channels are those of the first file whose header parses.
+    names, units, first_metadata, _ = next(iter(headers.values()))
+    pos_xs = [header[2][spec.KEY_PROBE_POS_X] for header in headers.values()]
+    pos_ys = [header[2][spec.KEY_PROBE_POS_Y] for header in headers.values()]
+    if position_tolerance is None:
+        position_tolerance = _get_grid_tolerance(pos_xs, pos_ys)
+    xs, x_starts = _get_grid_axis(pos_xs, position_tolerance)
+    ys, y_starts = _get_grid_axis(pos_ys, position_tolerance)
+    if num_points is None:
+        # Files without it can still be placed, if not too long.
+        num_points = max((header[3] for header in headers.values()
+                          if header[3] is not None), default=None)
+    if num_points is None:
+        raise ValueError(f'No file header holds the number of points '
+                         f'({spec.IN_KEYS_NUM_POINTS[0]}): num_points must '
+                         f'be provided.')
+
+    # Place the files in the grid from their headers only.
+    grid_paths = np.full((len(ys), len(xs)), '', dtype=object)
+    tasks = {}
+    for source, path in zip(sources, paths):
+        if path not in headers:
+            continue
+        file_names, _, metadata, _ = headers[path]
+        iy = np.searchsorted(y_starts, metadata[spec.KEY_PROBE_POS_Y],
+                             side='right') - 1
+        ix = np.searchsorted(x_starts, metadata[spec.KEY_PROBE_POS_X],
+                             side='right') - 1
+        if file_names != names:
+            errors[path] = ValueError(f'Channels {file_names} differ from '
+                                      f'grid channels {names}.')
+        elif grid_paths[iy, ix]:
+            errors[path] = ValueError(f'Grid position already filled by '
+                                      f'{grid_paths[iy, ix]}.')
+        elif (metadata[spec.KEY_PROBE_POS_UNITS] !=
+              first_metadata[spec.KEY_PROBE_POS_UNITS]):
+            errors[path] = ValueError('Probe position units differ from '
+                                      'those of the grid.')
+        else:
+            grid_paths[iy, ix] = path
+            tasks[path] = (source, int(iy), int(ix))
+
+    # Worker processes write to the cube through a memory-mapped file: the
+    # given one, or a temporary one (loaded into memory once filled).
+    shape = (len(names), len(ys), len(xs), num_points)
+    is_parallel = utils.is_parallel(list(tasks), workers)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if memmap_path is None and is_parallel:
+            cube_path = Path(tmp_dir) / 'grid.npy'
+        else:
+            cube_path = memmap_path
+        if cube_path is not None:
+            cube = np.lib.format.open_memmap(cube_path, mode='w+',
+                                             dtype=dtype, shape=shape)
+            cube[...] = np.nan
+        else:
+            cube = np.full(shape, np.nan, dtype)
+
+        func = partial(_fill_spec_grid_point,
+                       cube=str(cube_path) if is_parallel else cube,
+                       usecols=usecols, dtype=dtype)
+        for path, result in zip(tasks, utils.map_parallel(
+                func, list(tasks.values()), workers)):
+            if isinstance(result, Exception):
+                errors[path] = result
+                grid_paths[tasks[path][1:]] = ''
+        if memmap_path is None and is_parallel:
+            cube = np.array(cube)
+
+    dims = (spec.GRID_DIM_Y, spec.GRID_DIM_X, spec.GRID_DIM_POINT)
+    data_vars = {name: (dims, cube[i], {'units': unit}) for i, (name, unit)
+                 in enumerate(zip(spec.get_unique_names(names), units))}
+    pos_attrs = {'units': first_metadata[spec.KEY_PROBE_POS_UNITS]}
+    coords = {spec.GRID_DIM_Y: (spec.GRID_DIM_Y, ys, pos_attrs),
+              spec.GRID_DIM_X: (spec.GRID_DIM_X, xs, pos_attrs),
+              spec.GRID_DIM_POINT: np.arange(num_points),
+              spec.GRID_COORD_PATH: (dims[:2], grid_paths)}
+    return xarray.Dataset(data_vars=data_vars, coords=coords,
+                          attrs={spec.KEY_ERRORS: errors})
+
+
+def _read_spec_grid_header(filename_or_obj: str | bytes,
+                           usecols: list[int | str] | None, dtype: np.dtype
+                           ) -> tuple[list[str], list[str], dict, int | None
+                                      ] | Exception:
+    """Read a spec file header into (names, units, useful_metadata, N).
+
+    N is the number of points of the header (None if missing). Used as a
+    worker process task, so any exception is returned (rather than raised)
+    for the caller to collect.
+    """
+    try:
+        with _open_spec_file(filename_or_obj) as file:
+            reader = spec.SpecReader(file, usecols, dtype)
+        num_points_key, num_points_subkey = spec.IN_KEYS_NUM_POINTS
+        num_points = None
+        if num_points_key in reader.raw_metadata:
+            num_points = spec.tokenize_metadata(
+                {num_points_key: reader.raw_metadata[num_points_key]}
+            )[num_points_key].get(num_points_subkey)
+        return (reader.names, reader.units,
+                spec.parse_useful_metadata(reader.raw_metadata, typed=True),
+                num_points)
+    except Exception as e:
+        return e
+
+
+def _fill_spec_grid_point(task: tuple[str | bytes, int, int],
+                          cube: np.ndarray | str,
+                          usecols: list[int | str] | None, dtype: np.dtype
+                          ) -> None | Exception:
+    """Parse the data of a (source, iy, ix) spec file into its grid point.
+
+    The rows are written, chunk by chunk, straight into the (channel, y, x,
+    point) cube, given as an array or as the path of a .npy file (to
+    memory-map). Used as a worker process task, so any exception is
+    returned (rather than raised) for the caller to collect; the grid point
+    is then reset to NaN.
+    """
+    filename_or_obj, iy, ix = task
+    if isinstance(cube, str):
+        cube = np.load(cube, mmap_mode='r+')
+    point = cube[:, iy, ix]
+    try:
+        with _open_spec_file(filename_or_obj) as file:
+            reader = spec.SpecReader(file, usecols, dtype)
+            start = 0
+            for chunk in reader.iter_data():
+                end = start + len(chunk)
+                if end > point.shape[1]:
+                    raise ValueError(f'More data rows than the '
+                                     f'{point.shape[1]} grid points.')
+                point[:, start:end] = chunk.T
+                start = end
+    except Exception as e:
+        point[...] = np.nan
+        return e
+
+
+def _get_grid_tolerance(pos_xs: list[float], pos_ys: list[float]) -> float:
+    """Get the default open_spec_grid() position tolerance."""
+    gaps = [np.diff(np.unique(pos)) for pos in (pos_xs, pos_ys)]
+    largest_gap = max((gap.max() for gap in gaps if gap.size), default=0.0)
+    return GRID_POSITION_TOLERANCE * largest_gap
+
+
+def _get_grid_axis(positions: list[float], tolerance: float
+                   ) -> tuple[np.ndarray, np.ndarray]:
+    """Cluster probe positions into grid axis values, within tolerance.
+
+    Returns:
+        The axis values (the mean of the distinct positions of each
+        cluster), and the lowest position of each cluster (to find the
+        cluster of a position with np.searchsorted()).
+    """
+    values = np.unique(positions)
+    clusters = np.split(values,
+                        np.flatnonzero(np.diff(values) > tolerance) + 1)
+    return (np.array([cluster.mean() for cluster in clusters]),
+            np.array([cluster[0] for cluster in clusters]))
+
+
+def _get_main_path(paths: list[str]) -> str:
+    """Get the path of the main file of a scan (or the first path if none)."""
+    return next((path for path in paths
+                 if fn.parse_gxsm_filename(path).is_main_file), paths[0])
+
+
+def _merge_scan_datasets(paths: list[str], datasets: list[xarray.Dataset],
+                         main_path: str,
+                         sources: list[str | BinaryIO] | None = None
+                         ) -> xarray.Dataset:
+    """Merge the (pre-processed) channel datasets of a single scan's paths.
+
+    Rather than comparing all variables of all datasets (as with
+    compat='identical'), we use our knowledge of gxsm files:
+        - the metadata is taken from the main file (see _get_main_path());
+        - the other files (see pp.preprocess_channel()) are only checked to
+            be from the same scan, by comparing their fingerprint (see
+            pp.get_scan_fingerprint());
+        - their channel variables (see pp.get_channel_names()) are added to
+            the main dataset, reindexed to its coordinates where they differ
+            (e.g. the flipped 'dimx' of backward scans).
+
+    The fingerprints are read from sources (the path or binary file object
+    each dataset was opened from), paths if None.
+
+    Raises:
+        ValueError if a file's fingerprint differs from the main file's.
+    """
+    sources = paths if sources is None else sources
+    main_index = paths.index(main_path)
+    main_ds = datasets[main_index]
+    main_fingerprint = pp.get_scan_fingerprint(sources[main_index])
+
+    data_vars = {}
+    for path, source, ds in zip(paths, sources, datasets):
+        if path != main_path and \
+                pp.get_scan_fingerprint(source) != main_fingerprint:
+            raise ValueError(f'{path} does not appear to be from the same '
+                             f'scan as {main_path}.')
+        for name in pp.get_channel_names(ds):
+            da = ds[name]
+            for coord in pp.GXSM_KEPT_COORDS:
+                if not da[coord].equals(main_ds[coord]):
+                    da = da.reindex({coord: main_ds[coord]})
+            # Only the variable: its coords are the main dataset's.
+            data_vars[name] = da.variable
+
+    merged_ds = main_ds.assign(data_vars)
+    merged_ds = merged_ds[[*data_vars, *[name for name in main_ds.data_vars
+                                         if name not in data_vars]]]
+    merged_ds.set_close(partial(_close_datasets, datasets))
+    return merged_ds
+
+
+def _get_differing_scalar_attrs(datasets: list[xarray.Dataset]
+                                ) -> list[str]:
+    """Get the names of the scalar attrs differing between datasets."""
+    names = []
+    for name in datasets[0].attrs:
+        values = [ds.attrs.get(name) for ds in datasets]
+        if all(isinstance(value, (int, float, str, np.number))
+               for value in values) and len(set(values)) > 1:
+            names.append(name)
+    return names
+
+
+def _close_datasets(datasets: list[xarray.Dataset]):
+    for ds in datasets:
+        ds.close()
+
+
+def _open_dataset_memmap(filename: str | Path, **kwargs) -> xarray.Dataset:
+    """Open a gxsm file, with its FloatField memory-mapped.
+
+    gxsm files are NetCDF3 files, where the FloatField is stored as a
+    contiguous block (see netcdf3.memmap_variable()). We open the file
+    without its FloatField, and add it back as a dask array over a memmap of
+    this block, chunked by rows. Thus, opening the file is near-instant, and
+    computations (e.g. the unit conversion in preprocessing, or slicing away
+    its 'time' and 'value' dimensions) are lazy and only read the rows they
+    touch.
+
+    Note: this requires dask (see the 'parallel' optional dependencies).
+    """
+    import dask.array
+
+    ds = xarray.open_dataset(filename, drop_variables=[pp.GXSM_DATA_VAR],
+                             **kwargs)
+    variable = netcdf3.read_header(filename).variables[pp.GXSM_DATA_VAR]
+    data = netcdf3.memmap_variable(filename, variable)
+    # Chunk by blocks of whole rows, small enough that accessing a few rows
+    # only reads a few pages.
+    row_size = variable.shape[-1] * variable.dtype.itemsize
+    chunks = (1, 1, max(1, MEMMAP_CHUNK_SIZE // row_size), -1)
+    ds[pp.GXSM_DATA_VAR] = xarray.Variable(
+        variable.dimensions, dask.array.from_array(data, chunks=chunks),
+        attrs=variable.attributes)
+    return ds
+
+
+def _is_path(filename_or_obj) -> bool:
+    return isinstance(filename_or_obj, (str, Path))
+
+
+def _as_binary_file(obj: bytes | BinaryIO) -> BinaryIO:
+    """Wrap bytes in a binary file object (other objects are returned)."""
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return io.BytesIO(obj)
+    return obj
+
+
+@contextmanager
+def _open_spec_file(filename_or_obj: str | Path | bytes | BinaryIO | TextIO
+                    ) -> Iterator[TextIO]:
+    """Open a spec file path, or buffer, as a text file object.
+
+    File objects given are not closed.
+    """
+    if _is_path(filename_or_obj):
+        with open(filename_or_obj, 'r') as file:
+            yield file
+    elif isinstance(filename_or_obj, io.TextIOBase):
+        yield filename_or_obj
+    else:
+        # Decoded as open() would, streaming from the buffer.
+        file = io.TextIOWrapper(_as_binary_file(filename_or_obj))
+        try:
+            yield file
+        finally:
+            file.detach()
+
+
+def _get_sources(paths: str | list[str | Path]
+                 | Mapping[str, bytes | BinaryIO]
+                 ) -> tuple[list[str], list[str | bytes]]:
+    """Get the names and sources (paths, or contents) of files to read.
+
+    The contents of file objects are read, so that they can be read more
+    than once, or sent to worker processes.
+    """
+    if isinstance(paths, Mapping):
+        return ([str(path) for path in paths],
+                [obj if isinstance(obj, bytes) else
+                 bytes(obj) if isinstance(obj, (bytearray, memoryview)) else
+                 obj.read() for obj in paths.values()])
+    paths = _expand_paths(paths)
+    return paths, paths
+
+
+def _expand_paths(paths: str | list[str | Path]) -> list[str]:
+    """Expand a string glob (or list of paths) to a list of path strings."""
+    if isinstance(paths, str):
+        paths = sorted(glob.glob(paths))
+    return [str(path) for path in paths]
+
+
+def _map_read_spec_file(sources: list[str | bytes], workers: int | None,
+                        usecols: list[int | str] | None, dtype: np.dtype
+                        ) -> Iterator:
+    """Yield the _read_spec_file() result of each source, read in parallel."""
+    func = partial(_read_spec_file, usecols=usecols, dtype=dtype)
+    return utils.map_parallel(func, sources, workers)
+
+
+def _read_spec_file(filename_or_obj: str | bytes,
+                    usecols: list[int | str] | None, dtype: np.dtype
+                    ) -> tuple[list[str], list[str], np.ndarray, dict
+                               ] | Exception:
+    """Read a spec file into (names, units, data, useful_metadata).
+
+    Used as a worker process task, so any exception is returned (rather
+    than raised) for the caller to collect.
+    """
+    try:
+        with _open_spec_file(filename_or_obj) as file:
+            reader = spec.SpecReader(file, usecols, dtype)
+            data = reader.read_data()
+        useful_metadata = spec.parse_useful_metadata(reader.raw_metadata)
+        return reader.names, reader.units, data, useful_metadata
+    except Exception as e:
+        return e
+
+
+def _create_spec_many_dataframe(paths: list[str], results: Iterator
+                                ) -> pd.DataFrame:
+    """Concatenate _read_spec_file() results into a long-form DataFrame.
+
+    To avoid the (large) overhead of creating one DataFrame per file, the
+    results are grouped by channel names and each group is assembled from
+    a single concatenated array. Repeated channels are made unique (see
+    spec.get_unique_names()), so that groups with different channels can
+    be concatenated (missing channels being NaN). The rows follow the order
+    of paths.
+    """
+    groups = {}
+    units_dict = {}
+    errors = {}
+    for path, result in zip(paths, results):
+        if isinstance(result, Exception):
+            errors[path] = result
+            continue
+
+        names, units, data, useful_metadata = result
+        names = spec.get_unique_names(names)
+        groups.setdefault(tuple(names), []).append((path, data,
+                                                    useful_metadata))
+        units_dict |= dict(zip(names, units))
+
+    dfs = [_create_spec_group_dataframe(list(names), group)
+           for names, group in groups.items()]
+    if len(dfs) == 0:
+        df = pd.DataFrame()
+    elif len(dfs) == 1:
+        df = dfs[0]
+    else:
+        df = pd.concat(dfs)
+        path_order = {path: i for i, path in enumerate(paths)}
+        file_order = df.index.get_level_values('file').map(path_order)
+        df = df.iloc[np.argsort(file_order, kind='stable')]
+    df.attrs[spec.KEY_UNITS] = units_dict
+    df.attrs[spec.KEY_ERRORS] = errors
+    return df
+
+
+def _create_spec_group_dataframe(names: list[str],
+                                 group: list[tuple[str, np.ndarray, dict]]
+                                 ) -> pd.DataFrame:
+    """Create long-form DataFrame from files sharing the same channels."""
+    paths, datas, metadatas = zip(*group)
+    lengths = [len(data) for data in datas]
+
+    index = pd.MultiIndex.from_arrays(
+        [np.repeat(paths, lengths),
+         np.concatenate([np.arange(length) for length in lengths])],
+        names=['file', 'row'])
+    data_df = pd.DataFrame(np.concatenate(datas), columns=names, index=index)
+    metadata_df = pd.DataFrame({k: np.repeat([md[k] for md in metadatas],
+                                             lengths)
+                                for k in metadatas[0]}, index=index)
+    return pd.concat([data_df, metadata_df], axis=1)
+
+
+def _get_spec_metadata(raw_metadata: dict[str, str]) -> dict:
+    """Combine raw metadata with the parsed 'useful' metadata."""
     new_metadata = spec.parse_useful_metadata(raw_metadata)
-    metadata = raw_metadata | new_metadata
+    return raw_metadata | new_metadata
+
+
+def _create_spec_output(filename: str | Path | None, data: np.ndarray,
+                        names: list[str], units: list[str],
+                        raw_metadata: dict[str, str], output: str
+                        ) -> pd.DataFrame | tuple[np.ndarray | xarray.Dataset,
+                                                  spec.SpecMetadata]:
+    """Create the open_spec() output of parsed (or cached) spec data."""
+    if output == SPEC_OUTPUT_DATAFRAME:
+        with instrument.stage(instrument.STAGE_SPEC_DATAFRAME, filename):
+            return _create_spec_dataframe(data, names, units,
+                                          _get_spec_metadata(raw_metadata))
+
+    unique_names = spec.get_unique_names(names)
+    metadata = spec.SpecMetadata(raw_metadata,
+                                 spec.parse_useful_metadata(raw_metadata),
+                                 unique_names, dict(zip(unique_names, units)))
+    if output == SPEC_OUTPUT_STRUCTURED:
+        return _create_spec_structured_array(data, unique_names), metadata
+    return _create_spec_xarray(data, unique_names, units), metadata
+
+
+def _create_spec_structured_array(data: np.ndarray, names: list[str]
+                                  ) -> np.ndarray:
+    """View a (rows, channels) data array as a structured array (no copy)."""
+    data = np.ascontiguousarray(data)
+    dtype = np.dtype({'names': names, 'formats': [data.dtype] * len(names)})
+    return data.view(dtype).reshape(len(data))
+
+
+def _create_spec_xarray(data: np.ndarray, names: list[str],
+                        units: list[str]) -> xarray.Dataset:
+    """Create a spec Dataset, the 'Index' column (if any) as its coord."""
+    variables = {name: xarray.Variable(SPEC_DIM_ROW, data[:, i],
+                                       {'units': unit} if unit else None)
+                 for i, (name, unit) in enumerate(zip(names, units))}
+    coords = {}
+    if spec.VP_HEADER_INDEX_NAME in variables:
+        coords[SPEC_DIM_ROW] = variables.pop(spec.VP_HEADER_INDEX_NAME)
+    return xarray.Dataset(data_vars=variables, coords=coords)
+
 
+def _create_spec_dataframe(data: np.ndarray, names: list[str],
+                           units: list[str], metadata: dict
+                           ) -> pd.DataFrame:
+    """Create spec DataFrame from data, with metadata and units as attrs."""
     df = pd.DataFrame(data, columns=names)
     for k, v in metadata.items():
         df.attrs[k] = v
@@ -1,8 +1,17 @@
 """Logic around reading spectroscopy files."""
 
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+from typing import Any, Iterable, Iterator
+import re
 import numpy as np
 
 
+# Version of the parsing logic below. Bump it whenever the parsed output of
+# a file changes, to invalidate previously cached results (see cache.py).
+PARSER_VERSION = 1
+
 VISUALIZATION_HEADER = '# view'
 COMMENT = '#C'
 
@@ -14,12 +23,49 @@ DATA_END = '#C END.'
 DATA_SEP = '\t'
 UNIT_STRIP_CHARS = r'(")'
 
+# Number of data rows converted at once when streaming the data table.
+DEFAULT_CHUNK_SIZE = 65536
+
+# Channel map table (one line per potential channel)
+CHANNEL_MAP_PREFIX = '# Cmap['
+CHANNEL_MAP_UNIT_SUFFIX = '/DAC'
+CHANNEL_MAP_ACTIVE = 'Yes'
+
+# Vector Probe Header list (appendix following the data table)
+VP_HEADER_START = '#C Vector Probe Header List'
+VP_HEADER_END = '#C END OF HEADER LIST APPENDIX'
+VP_HEADER_ROW_STRIP_CHARS = '# '
+VP_HEADER_INDEX_NAME = 'Index'
+
+# Tokenizing metadata vals, of format: SUB_KEY1=... SUB_KEY2=...
+# A subkey val is either quoted, a bracketed list, or anything up to the
+# next subkey.
+SUBKEY_REGEX = re.compile(r'(?P<subkey>[^\s=,]+)='
+                          r'(?P<val>"[^"]*"|\[[^\]]*\]|.*?)'
+                          r'(?=[\s,]+[^\s=,]+=|\s*$)')
+NUMBER_REGEX = re.compile(r'(?P<number>[-+]?(?:\d+\.?\d*|\.\d+)'
+                          r'(?:[eE][-+]?\d+)?)(?:\s+(?P<units>\S+))?')
+INT_REGEX = re.compile(r'[-+]?\d+')
+SUBKEY_VAL_STRIP_CHARS = ' ,'
+SUBKEY_STR_STRIP_CHARS = '" '
+SUBKEY_LIST_SEP = ','
+# Dates, as written by gxsm (C asctime() format). The day and month names
+# are always English: they are matched explicitly, rather than with
+# datetime.strptime() (whose '%a %b' depend on the locale).
+DATE_WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+DATE_MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep',
+               'Oct', 'Nov', 'Dec']
+DATE_REGEX = re.compile(rf'(?:{"|".join(DATE_WEEKDAYS)})\s+'
+                        rf'(?P<month>{"|".join(DATE_MONTHS)})\s+'
+                        r'(?P<day>\d{1,2})\s+'
+                        r'(?P<hour>\d{1,2}):(?P<minute>\d{2}):'
+                        r'(?P<second>\d{2})\s+(?P<year>\d{4})')
+
 # Extracting useful metadata
-SUBKEY_SEP = '='
-POS_STRIP_CHARS = ' ,'
 IN_KEYS_FILENAME = ['FileName', 'name']
 IN_KEYS_DATE = ['Date', 'date']
 IN_KEYS_PROBE_POS = ['GXSM-Main-Offset', ['X0', 'Y0']]
+IN_KEYS_NUM_POINTS = ['Probe Data Number', 'N']
 
 KEY_PROBE_POS_X = 'probe_position_x'
 KEY_PROBE_POS_Y = 'probe_position_y'
@@ -27,6 +73,14 @@ KEY_PROBE_POS_UNITS = 'probe_position_units'
 KEY_FILENAME = 'filename'
 KEY_DATE = 'date'
 KEY_UNITS = 'units'
+KEY_ERRORS = 'errors'
+
+# Grid spectroscopy dimensions and coords
+GRID_DIM_X = 'x'
+GRID_DIM_Y = 'y'
+GRID_DIM_POINT = 'point'
+GRID_COORD_PATH = 'path'
+UNIQUE_NAME_SEP = '_'
 
 
 def validate_spec_file(lines: list[str]):
@@ -52,17 +106,32 @@ def extract_raw_metadata(lines: list[str]) -> dict[str, str]:
     Returns:
         str:str key:val dict containing METADATA_KEY:METADATA_STR.
     """
-    comment_indices = [i for i, v in enumerate(lines) if
-                       v.startswith(COMMENT)]
+    # Skip the visualization header
+    return read_raw_metadata(islice(lines, 1, None))
 
-    # Extract the metadata (OWN METHOD)
-    raw_metadata = {}
-    md_lines = lines[1:comment_indices[0]]
 
-    # Skip lines without metadata key:vals
-    md_lines = [line for line in md_lines if MD_KEY_VAL_DELINEATOR in line]
+def read_raw_metadata(line_iter: Iterator[str]) -> dict[str, str]:
+    """Read metadata lines, consuming line_iter up to the first comment.
+
+    Contrary to extract_raw_metadata(), line_iter is expected to start
+    right after the visualization header, and is only consumed up to the
+    end of the metadata (so the rest of a file is never read).
+
+    Args:
+        line_iter: iterator over the lines of a spectroscopy file (e.g. an
+            open file), following the visualization header.
+
+    Returns:
+        str:str key:val dict containing METADATA_KEY:METADATA_STR.
+    """
+    raw_metadata = {}
+    for line in line_iter:
+        if line.startswith(COMMENT):
+            break
+        # Skip lines without metadata key:vals
+        if MD_KEY_VAL_DELINEATOR not in line:
+            continue
 
-    for line in md_lines:
         kv = line.split(MD_KEY_VAL_DELINEATOR)
         k = kv[0].strip(MD_STRIP_CHARS)
         v = kv[1].strip()
@@ -71,7 +140,86 @@ def extract_raw_metadata(lines: list[str]) -> dict[str, str]:
     return raw_metadata
 
 
-def parse_useful_metadata(raw_metadata: dict[str, str]) -> dict[str, str]:
+@dataclass
+class SpecQuantity:
+    """Class holding a metadata subkey val with units (e.g. 'Bias=0.1 V')."""
+
+    value: float
+    units: str
+
+
+def tokenize_metadata(raw_metadata: dict[str, str]
+                      ) -> dict[str, dict[str, Any]]:
+    """Parse each raw metadata val into a dict of typed subkey vals.
+
+    Each raw metadata val is of format:
+        SUB_KEY1=... SUB_KEY2=...
+
+    and is converted to a SUB_KEY:VAL dict, with each subkey val converted
+    to the most appropriate type:
+    - 'Bias=0.1 V' -> SpecQuantity(value=0.1, units='V').
+    - 'N=100' -> int, 'AC_frq=4687.5' -> float.
+    - 'date=Wed Feb 26 15:44:23 2025' -> datetime.
+    - 'AC_amp=[ 0.02 V, 0, 14, 0]' -> list of the above.
+    - 'comment="..."' (or anything else) -> str, with quotes removed.
+
+    Metadata vals without any subkey (e.g. 'NO MASTERSCAN SCAN COORDINATES
+    N/A') result in an empty dict; their raw string remains available in
+    the raw metadata.
+
+    Args:
+        raw_metadata: raw metadata extracted from spec file.
+
+    Returns:
+        A METADATA_KEY:{SUB_KEY:VAL} nested dict.
+    """
+    return {k: {subkey: _parse_subkey_val(val)
+                for subkey, val in _split_subkey_vals(v).items()}
+            for k, v in raw_metadata.items()}
+
+
+def _split_subkey_vals(val: str) -> dict[str, str]:
+    """Split a raw metadata val into its SUB_KEY:VAL strings."""
+    return {match['subkey']: match['val'].strip(SUBKEY_VAL_STRIP_CHARS)
+            for match in SUBKEY_REGEX.finditer(val)}
+
+
+def _parse_subkey_val(val: str) -> Any:
+    """Convert a subkey val string to its most appropriate type."""
+    val = val.strip(SUBKEY_VAL_STRIP_CHARS)
+    if val.startswith('"'):
+        return val.strip(SUBKEY_STR_STRIP_CHARS)
+    if val.startswith('['):
+        return [_parse_subkey_val(item) for item in
+                val[1:-1].split(SUBKEY_LIST_SEP)]
+
+    match = NUMBER_REGEX.fullmatch(val)
+    if match:
+        number = match['number']
+        if match['units']:
+            return SpecQuantity(float(number), match['units'])
+        return int(number) if INT_REGEX.fullmatch(number) else float(number)
+
+    date = _parse_date(val)
+    return val if date is None else date
+
+
+def _parse_date(val: str) -> datetime | None:
+    """Convert a gxsm date string to a datetime (None if not a date)."""
+    match = DATE_REGEX.fullmatch(val)
+    if match is None:
+        return None
+    try:
+        return datetime(int(match['year']),
+                        DATE_MONTHS.index(match['month']) + 1,
+                        int(match['day']), int(match['hour']),
+                        int(match['minute']), int(match['second']))
+    except ValueError:  # e.g. Feb 30
+        return None
+
+
+def parse_useful_metadata(raw_metadata: dict[str, str],
+                          typed: bool = False) -> dict[str, Any]:
     """Parse raw metadata and extract some useful metadata.
 
     Particularly, we want to explicit:
@@ -82,60 +230,48 @@ def parse_useful_metadata(raw_metadata: dict[str, str]) -> dict[str, str]:
 
     Args:
         raw_metadata: raw metadata extracted from spec file.
+        typed: whether to convert the probe position to floats and the date
+            to a datetime (None if it cannot be parsed). Else, they are kept
+            as the strings found in the file.
 
     Returns:
         new dict containing the parsed 'useful' data, with keys matching
             those indicated above.
+
+    Raises:
+        ValueError if the probe position is not a number with units, or if
+        its x and y units differ.
     """
     useful_metadata = {}
-    useful_metadata[KEY_DATE] = _extract_date(raw_metadata)
-    useful_metadata[KEY_FILENAME] = _extract_filename(raw_metadata)
+    date = _split_subkey_vals(raw_metadata[IN_KEYS_DATE[0]])[IN_KEYS_DATE[1]]
+    useful_metadata[KEY_DATE] = _parse_date(date) if typed else date
+    useful_metadata[KEY_FILENAME] = _split_subkey_vals(
+        raw_metadata[IN_KEYS_FILENAME[0]])[IN_KEYS_FILENAME[1]]
 
-    coords, units = _extract_position(raw_metadata)
+    position_vals = _split_subkey_vals(raw_metadata[IN_KEYS_PROBE_POS[0]])
+    coords = []
+    units = []
+    for subkey in IN_KEYS_PROBE_POS[1]:
+        # Expect: '0 Ang'
+        match = NUMBER_REGEX.fullmatch(position_vals[subkey])
+        if match is None or not match['units']:
+            raise ValueError(f'Expected a probe position with units, got '
+                             f'{subkey}={position_vals[subkey]!r}.')
+        coords.append(float(match['number']) if typed else match['number'])
+        units.append(match['units'])
+    if units[0] != units[1]:
+        raise ValueError(f'The probe position x and y units differ: '
+                         f'{units[0]!r} and {units[1]!r}.')
     useful_metadata[KEY_PROBE_POS_X] = coords[0]
     useful_metadata[KEY_PROBE_POS_Y] = coords[1]
     useful_metadata[KEY_PROBE_POS_UNITS] = units[0]
     return useful_metadata
 
 
-def _extract_date(raw_metadata: dict[str, str]) -> str:
-    date_subdata = raw_metadata[IN_KEYS_DATE[0]].split(SUBKEY_SEP)
-    date_idx = [i for i, v in enumerate(date_subdata) if
-                IN_KEYS_DATE[1] in v]
-    assert len(date_idx) == 1
-    date_idx = date_idx[0]
-    return date_subdata[date_idx + 1]
-
-
-def _extract_position(raw_metadata: dict[str, str]) -> (list[str], list[str]):
-    pos_subdata = raw_metadata[IN_KEYS_PROBE_POS[0]].split(SUBKEY_SEP)
-
-    coords = []
-    units = []
-    for pos in range(2):
-        idx = [i for i, v in enumerate(pos_subdata) if
-               IN_KEYS_PROBE_POS[1][pos] in v]
-        idx = idx[0]
-
-        # Expect: '0 Ang  ' or '0 Ang, '
-        subdata = pos_subdata[idx + 1].split()
-        coords.append(subdata[0].strip(POS_STRIP_CHARS))
-        units.append(subdata[1].strip(POS_STRIP_CHARS))
-
-    assert units[0] == units[1]
-    return coords, units
-
-
-def _extract_filename(raw_metadata: dict[str, str]) -> str:
-    filename_subdata = raw_metadata[IN_KEYS_FILENAME[0]].split(SUBKEY_SEP)
-    filename_idx = [i for i, v in enumerate(filename_subdata) if
-                    IN_KEYS_FILENAME[1] in v]
-    assert len(filename_idx) == 1
-    filename_idx = filename_idx[0]
-    return filename_subdata[filename_idx + 1]
-
-
-def extract_data(lines: list[str]) -> (list[str], list[str], np.ndarray):
+def extract_data(lines: list[str],
+                 usecols: list[int | str] | None = None,
+                 dtype: np.dtype = np.float32
+                 ) -> (list[str], list[str], np.ndarray):
     r"""Extract data from spec file lines into names, units, and data.
 
     Given the read lines from a spectroscopy file, extract the data (as a
@@ -156,27 +292,39 @@ def extract_data(lines: list[str]) -> (list[str], list[str], np.ndarray):
 
     Args:
         lines: list[str] of read lines from a spectroscpy file.
+        usecols: optional list of columns to extract, given either as
+            column indices or channel names (for a repeated channel name,
+            the first matching column is used). If None, all columns are
+            extracted.
+        dtype: the numpy dtype of the output data array.
 
     Returns:
         (list[str], list[str], np.ndarray) of:
         - list[str] of channel names
         - list[str] of units (empty string for Index/Block-start-index)
         - np.ndarray of all data.
+
+    Raises:
+        ValueError if a data row does not have the expected number of
+            columns, or contains a non-numeric value.
     """
-    data_start_indices = [i for i, v in enumerate(lines) if
-                          v.startswith(DATA_START)]
-    data_end_indices = [i for i, v in enumerate(lines) if
-                        v.startswith(DATA_END)]
-    data_range = (data_start_indices[0], data_end_indices[0])
+    data_start = next(i for i, v in enumerate(lines) if
+                      v.startswith(DATA_START))
 
     # Get data header
-    data_header = lines[data_range[0] + 1].split(DATA_SEP)
+    data_header = lines[data_start + 1].split(DATA_SEP)
     names, units = _extract_names_units(data_header)
+    col_indices = _get_col_indices(names, usecols)
 
-    # Get data
-    data_lines = lines[data_range[0] + 2:data_range[1] - 1]
-    data = _extract_data(data_lines, len(names))
+    # Get data (everything up to the comment preceding DATA_END)
+    data_iter = islice(lines, data_start + 2, None)
+    chunks = _iter_data_chunks(data_iter, len(names), col_indices, dtype,
+                               chunk_size=None, line_offset=data_start + 2)
+    data = next(chunks)
 
+    if col_indices is not None:
+        names = [names[i] for i in col_indices]
+        units = [units[i] for i in col_indices]
     return names, units, data
 
 
@@ -194,9 +342,347 @@ def _extract_names_units(data_header: str) -> (list[str], list[str]):
     return channel_names, units
 
 
-def _extract_data(data_lines: list[str], num_cols: int) -> np.ndarray:
-    data = [line.split(DATA_SEP) for line in data_lines]
-    for line in data:
-        assert num_cols == len(line)
-    data = np.array(data, np.float32)
+def get_unique_names(names: list[str]) -> list[str]:
+    """Provide unique channel names, for data tables with repeated channels.
+
+    The n-th repeat (starting from 1) of a name is suffixed with
+    UNIQUE_NAME_SEP + n, e.g. ['ADC0-I', 'ADC0-I'] -> ['ADC0-I', 'ADC0-I_1'].
+    """
+    counts = {}
+    unique_names = []
+    for name in names:
+        count = counts.get(name, 0)
+        counts[name] = count + 1
+        unique_names.append(name if count == 0 else
+                            name + UNIQUE_NAME_SEP + str(count))
+    return unique_names
+
+
+def _get_col_indices(names: list[str], usecols: list[int | str] | None
+                     ) -> list[int] | None:
+    """Convert usecols (indices or channel names) to column indices."""
+    if usecols is None:
+        return None
+
+    col_indices = []
+    for col in usecols:
+        if isinstance(col, str):
+            if col not in names:
+                raise KeyError(f'Channel {col} not found in data table '
+                               f'(available: {names}).')
+            col_indices.append(names.index(col))
+        else:
+            if not -len(names) <= col < len(names):
+                raise IndexError(f'Column {col} out of range for data table '
+                                 f'with {len(names)} columns.')
+            col_indices.append(col % len(names))
+    return col_indices
+
+
+def _extract_data(data_lines: list[str], num_cols: int,
+                  col_indices: list[int] | None = None,
+                  dtype: np.dtype = np.float32,
+                  line_offset: int = 0) -> np.ndarray:
+    """Convert the data table lines to a numpy array in a single pass.
+
+    The conversion itself is done by np.loadtxt's C parser. Since it does
+    not check the number of columns of the rows when only a subset of
+    columns is requested, we validate the row lengths beforehand (counting
+    separators is much cheaper than splitting each row).
+
+    Args:
+        data_lines: list[str] of data rows, in the data table format.
+        num_cols: the expected number of columns in each row.
+        col_indices: optional list of column indices to extract.
+        dtype: the numpy dtype of the output data array.
+        line_offset: index of the first data row within the file, used to
+            report the line of an invalid row.
+
+    Returns:
+        np.ndarray of shape (num_rows, num_extracted_cols).
+
+    Raises:
+        ValueError if a row does not have num_cols columns or cannot be
+            converted to dtype.
+    """
+    num_out_cols = num_cols if col_indices is None else len(col_indices)
+    if len(data_lines) == 0:
+        return np.empty((0, num_out_cols), dtype)
+
+    row_lengths = np.fromiter((line.count(DATA_SEP) + 1
+                               for line in data_lines),
+                              dtype=np.int64, count=len(data_lines))
+    bad_rows = np.flatnonzero(row_lengths != num_cols)
+    if bad_rows.size > 0:
+        row = int(bad_rows[0])
+        raise ValueError(f'Data row {row} (file line {line_offset + row + 1}'
+                         f') has {row_lengths[row]} columns, expected '
+                         f'{num_cols}.')
+
+    try:
+        data = np.loadtxt(data_lines, dtype=dtype, delimiter=DATA_SEP,
+                          usecols=col_indices, comments=None, ndmin=2)
+    except ValueError as e:
+        raise ValueError(f'Could not parse data table starting at file line '
+                         f'{line_offset + 1}: {e}') from e
     return data
+
+
+def _iter_data_chunks(line_iter: Iterator[str], num_cols: int,
+                      col_indices: list[int] | None, dtype: np.dtype,
+                      chunk_size: int | None, line_offset: int
+                      ) -> Iterator[np.ndarray]:
+    """Convert data table lines to arrays of (at most) chunk_size rows.
+
+    Consumes line_iter up to (and including) the comment line ending the
+    data table. At least one (possibly empty) chunk is always yielded.
+
+    Args:
+        line_iter: iterator over the data table rows.
+        num_cols: the expected number of columns in each row.
+        col_indices: optional list of column indices to extract.
+        dtype: the numpy dtype of the output data arrays.
+        chunk_size: the maximum number of rows per chunk. If None, all rows
+            are converted as a single chunk.
+        line_offset: index of the first data row within the file, used to
+            report the line of an invalid row.
+
+    Yields:
+        np.ndarray of shape (num_chunk_rows, num_extracted_cols).
+    """
+    chunk = []
+    num_yielded = 0
+    for line in line_iter:
+        if line.startswith(COMMENT):
+            break
+        chunk.append(line)
+        if len(chunk) == chunk_size:
+            yield _extract_data(chunk, num_cols, col_indices, dtype,
+                                line_offset)
+            num_yielded += 1
+            line_offset += len(chunk)
+            chunk = []
+
+    if chunk or num_yielded == 0:
+        yield _extract_data(chunk, num_cols, col_indices, dtype, line_offset)
+
+
+@dataclass
+class SpecChannel:
+    """Class holding an entry of the spec file channel map.
+
+    The channel map lists every channel that *could* have been saved by the
+    vector probe, in the format:
+        # Cmap[$i$]  $mask$  $expdi$  $label$  $dac_to_unit$  $units$/DAC  $active$
+
+    Attributes:
+        label: the channel name (as used in the data table header).
+        mask: the bit mask of the channel in the 'Data Sources Mask'.
+        expdi: the channel's internal gxsm index.
+        dac_to_unit: the conversion factor from DAC counts to units.
+        units: the physical units of the channel.
+        active: whether or not the channel was saved in this file.
+    """
+
+    label: str
+    mask: int
+    expdi: int
+    dac_to_unit: float
+    units: str
+    active: bool
+
+
+@dataclass
+class SpecMetadata:
+    """Class holding the metadata of a spec file, apart from its data.
+
+    Lightweight alternative to storing the metadata in the attrs of a
+    DataFrame (see read.open_spec()).
+
+    Attributes:
+        raw_metadata: the raw metadata (METADATA_KEY:METADATA_STR).
+        useful_metadata: the parsed 'useful' metadata (see
+            parse_useful_metadata()).
+        names: the (unique, see get_unique_names()) channel names, in data
+            table order.
+        units: dict of NAME:UNITS of each channel.
+    """
+
+    raw_metadata: dict[str, str]
+    useful_metadata: dict[str, Any]
+    names: list[str]
+    units: dict[str, str]
+
+    def to_attrs(self) -> dict[str, Any]:
+        """Get the metadata as the attrs of read.open_spec() DataFrames."""
+        return self.raw_metadata | self.useful_metadata | \
+            {KEY_UNITS: dict(self.units)}
+
+
+class SpecReader:
+    """Single-pass, streaming reader of a spectroscopy file.
+
+    The reader walks the lines of a .vpdata file once, as a state machine
+    going through its sections (see README for the file structure):
+        1. On construction, we read the visualization header, the metadata
+            and the channel map, stopping right after the data table header.
+        2. The data table is then read via iter_data() (as chunks of rows)
+            or read_data() (as a single array).
+        3. Once the data table has been consumed, the Vector Probe Header
+            list is read and stored in vp_header.
+
+    Since lines are only consumed on demand, the memory used when iterating
+    over the data is bounded by the chunk size (rather than the file size),
+    provided lines is itself lazy (e.g. an open file).
+
+    Basic usage:
+        with open(filename, 'r') as file:
+            reader = SpecReader(file)
+            for chunk in reader.iter_data(chunk_size=1000):
+                [...]
+
+    Attributes:
+        raw_metadata: str:str dict containing METADATA_KEY:METADATA_STR
+            (see extract_raw_metadata()).
+        channel_map: list of SpecChannel, one per channel map entry.
+        names: list[str] of (extracted) data table channel names.
+        units: list[str] of (extracted) data table units.
+        vp_header: (names, units, data) of the Vector Probe Header list, or
+            None if the data table has not been consumed yet (or the file
+            has no such list).
+    """
+
+    def __init__(self, lines: Iterable[str],
+                 usecols: list[int | str] | None = None,
+                 dtype: np.dtype = np.float32):
+        """Read the spec file up to the data table.
+
+        Args:
+            lines: iterable of the lines of a spectroscopy file (e.g. an
+                open file).
+            usecols: optional list of data columns to extract, given either
+                as column indices or channel names. If None, all columns are
+                extracted.
+            dtype: the numpy dtype of the output data arrays.
+
+        Raises:
+            AssertionError if this does not appear to be a spec file.
+            ValueError if no data table is found.
+        """
+        self._lines = iter(lines)
+        self._num_lines_read = 0
+        self._dtype = dtype
+        self._data_consumed = False
+        self.vp_header = None
+
+        validate_spec_file([self._next_line()])
+        self.raw_metadata = read_raw_metadata(self._counted_lines())
+        self.channel_map = self._read_channel_map()
+
+        data_header = self._next_line().split(DATA_SEP)
+        names, units = _extract_names_units(data_header)
+        self._num_cols = len(names)
+        self._col_indices = _get_col_indices(names, usecols)
+        if self._col_indices is not None:
+            names = [names[i] for i in self._col_indices]
+            units = [units[i] for i in self._col_indices]
+        self.names = names
+        self.units = units
+
+    def iter_data(self, chunk_size: int = DEFAULT_CHUNK_SIZE
+                  ) -> Iterator[np.ndarray]:
+        """Iterate over the data table, as arrays of chunk_size rows.
+
+        The data table can only be iterated over once. Once exhausted, the
+        Vector Probe Header list is read into vp_header.
+
+        Args:
+            chunk_size: the maximum number of rows per chunk.
+
+        Yields:
+            np.ndarray of shape (num_chunk_rows, len(names)).
+        """
+        if self._data_consumed:
+            raise RuntimeError('The data table has already been read.')
+        self._data_consumed = True
+
+        yield from _iter_data_chunks(self._counted_lines(), self._num_cols,
+                                     self._col_indices, self._dtype,
+                                     chunk_size, self._num_lines_read)
+        self.vp_header = self._read_vp_header()
+
+    def read_data(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> np.ndarray:
+        """Read the full data table into a single array.
+
+        Args:
+            chunk_size: the number of rows converted at once.
+
+        Returns:
+            np.ndarray of shape (num_rows, len(names)).
+        """
+        chunks = list(self.iter_data(chunk_size))
+        return chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+
+    def _next_line(self) -> str:
+        self._num_lines_read += 1
+        return next(self._lines)
+
+    def _counted_lines(self) -> Iterator[str]:
+        for line in self._lines:
+            self._num_lines_read += 1
+            yield line
+
+    def _read_channel_map(self) -> list[SpecChannel]:
+        """Read channel map lines, consuming lines up to DATA_START."""
+        channel_map = []
+        for line in self._counted_lines():
+            if line.startswith(DATA_START):
+                return channel_map
+            if line.startswith(CHANNEL_MAP_PREFIX):
+                channel_map.append(_parse_channel_map_line(line))
+        raise ValueError('No data table found in spec file.')
+
+    def _read_vp_header(self) -> (tuple[list[str], list[str], np.ndarray]
+                                  | None):
+        """Read the Vector Probe Header list, consuming the remaining lines.
+
+        The list is stored in the format:
+            #C Vector Probe Header List -----------------
+            #C # ####\t time[ms]  \t dt[ms]    \t [...]
+            #       0\t 0.000000000000e+00\t [...]
+            [...]
+            #C END OF HEADER LIST APPENDIX.
+
+        Returns:
+            (names, units, data) as in extract_data(), or None if the file
+            has no Vector Probe Header list.
+        """
+        line_iter = self._counted_lines()
+        if not any(line.startswith(VP_HEADER_START) for line in line_iter):
+            return None
+
+        header = next(line_iter)[len(COMMENT):].split(DATA_SEP)
+        names = [VP_HEADER_INDEX_NAME]
+        units = ['']
+        for substr in header[1:]:
+            name, _, unit = substr.strip().partition('[')
+            names.append(name)
+            units.append(unit.rstrip(']'))
+
+        rows = []
+        for line in line_iter:
+            if line.startswith(VP_HEADER_END):
+                break
+            rows.append(line.strip(VP_HEADER_ROW_STRIP_CHARS).split())
+        data = np.array(rows, np.float64).reshape(-1, len(names))
+        return names, units, data
+
+
+def _parse_channel_map_line(line: str) -> SpecChannel:
+    # Skip '# Cmap[$i$]'
+    substrs = line.rstrip().split(DATA_SEP)[1:]
+    mask, expdi, label, dac_to_unit, units, active = substrs
+    return SpecChannel(label=label, mask=int(mask), expdi=int(expdi),
+                       dac_to_unit=float(dac_to_unit),
+                       units=units.removesuffix(CHANNEL_MAP_UNIT_SUFFIX),
+                       active=active == CHANNEL_MAP_ACTIVE)
@@ -0,0 +1,431 @@
+"""Generation of synthetic gxsm scan (.nc) and spectroscopy (.vpdata) files.
+
+Benchmarks and stress tests need large, gxsm-shaped inputs that cannot be
+shipped with the repo. This file contains methods to write them:
+    - scan sets: one NetCDF3 file per channel, laid out as gxsm writes them
+        (a 'Creator' attribute, a (time, value, dimy, dimx) 'FloatField' of
+        DAC counts, its 'dz' differential, the 'dimx'/'dimy' coordinates and
+        100+ metadata variables), named $file_base$[-M]-$Xp|Xm$-$channel$.nc;
+    - spectroscopy files: a gxsm 'VP' header (metadata, channel map), a data
+        table of any number of rows and columns, and the Vector Probe Header
+        list appendix.
+
+The data is random (a tilted plane plus noise for scans), generated and
+written with vectorized operations, so that corpora of several GB can be
+created in minutes (see write_corpus()).
+
+Basic usage:
+    paths = write_scan_set('/path/to/dir', 'my_scan', dimx=1024,
+                           num_channels=4)
+    spec_path = write_spec_file('/path/to/dir/my_spec.vpdata',
+                                num_rows=100000)
+    corpus = write_corpus('/path/to/dir', num_scan_sets=100, dimx=4096)
+"""
+
+from functools import partial
+from pathlib import Path
+import time
+import numpy as np
+import xarray
+from . import filename as fn
+from . import utils
+
+DEFAULT_FILE_BASE = 'synthetic'
+DEFAULT_SCAN_SIZE = 256
+# Default scan start (unix time), each scan set of a corpus starting later.
+DEFAULT_T_START = 1638464648
+DEFAULT_SCAN_DURATION = 382
+
+# The (scan direction, channel) of the files of a scan set, in order. The
+# first one is the main file.
+SCAN_CHANNELS = ([('Xp', 'Topo'), ('Xm', 'Topo')] +
+                 [(direction, f'ADC{adc}') for adc in range(8)
+                  for direction in ('Xp', 'Xm')])
+
+# Differentials of the FloatField (i.e. the units of a DAC count): in
+# Angstrom for the topography, in V for the ADC channels.
+TOPO_DZ = 0.22131370724876562
+ADC_DZ = 10 / 2**15
+# Pixel size, in Angstrom.
+DEFAULT_PIXEL_SIZE = 1587.3015873015872
+# Range of the random data, in DAC counts.
+NOISE_AMPLITUDE = 100.0
+SLOPE = 4.0
+
+SCAN_ATTRS = {
+    'Creator': 'gxsm3',
+    'Version': '3.48.0',
+    'build_from': 'gxsmread.synthetic',
+    'DataIOVer': 'synthetic',
+    'HardwareCtrlType': 'SRangerMK2:SPM',
+    'HardwareConnectionDev': '/dev/sranger_mk2_0',
+    'InstrumentType': 'AFM',
+    'InstrumentName': 'Synthetic',
+}
+LENGTH_ATTRS = {'Info': 'This number is alwalys stored in Angstroem. Unit is '
+                'used for user display only.', 'label': 'L',
+                'var_unit': 'Ang', 'unit': 'nm'}
+HWI_PREFIX = 'sranger_mk2_hwi_'
+HWI_METADATA = {
+    'bias': -5.0, 'motor': -0.04, 'z_setpoint': 0.04, 'move_speed_x': 1000.0,
+    'scan_speed_x': 60000.0, 'fast_scan_flag': np.int32(0),
+    'z_servo_CP': 21.3, 'z_servo_CI': 100.0, 'ldc_flag': np.int32(1),
+    'dxdt': 0.0, 'dydt': 0.0, 'dzdt': 0.0, 'frq_ref': 75000.0,
+    'IIR_f0_min': 200.0, 'IIR_f0_max0': 8000.0, 'IIR_f0_max1': 18000.0,
+    'IIR_f0_max2': 18000.0, 'IIR_f0_max3': 18000.0,
+    'IIR_I_crossover': 100.0, 'LOG_I_offset': 10.0,
+    'slope_compensation_flag': np.int32(1), 'slope_x': 0.0, 'slope_y': 0.0,
+    'pre_points': np.int32(0), 'dynamic_zoom': 1.0, 'XSM_Inst_VX': 12.8,
+    'XSM_Inst_VY': 12.8, 'XSM_Inst_VZ': 12.8, 'XSM_Inst_XResolution': 1.774,
+    'XSM_Inst_YResolution': 1.774, 'XSM_Inst_ZResolution': TOPO_DZ,
+    'XSM_Inst_nAmpere2V': 0.1, 'XSM_Inst_BiasGain': 1.0,
+    'XSM_Inst_BiasOffset': 0.0, 'AC_amp': 0.02, 'AC_frq': 1169.3,
+    'AC_phaseA': 0.0, 'AC_phaseB': 90.0, 'AC_avg_cycels': np.int32(32),
+    'noise_amp': 0.0,
+    **{f'mix{i}_{key}': val for i in range(4)
+       for key, val in [('set_point', 0.01), ('mix_gain', 0.3),
+                        ('mix_level', 0.0), ('transform_mode', 0.0)]},
+    **{f'Trigger_{direction}_{key}_{i}': val for i in range(8)
+       for direction in ('Xp', 'Xm')
+       for key, val in [('at', np.int16(0)), ('Bias', 0.0)]},
+}
+CHAR_DIM_SUFFIX = '_dim'
+
+# Spectroscopy files
+SPEC_FILE_SUFFIX = '.vpdata'
+# The (name, units) of the default data table columns (between the 'Index'
+# and 'Block-Start-Index' columns).
+DEFAULT_SPEC_COLUMNS = [('ADC0-I', 'nA'), ('ADC7', 'V'), ('Zmon', 'Å'),
+                        ('ZS', 'Å'), ('Bias', 'V')]
+SPEC_CHANNEL_MAP = [('ADC0-I', 16, 12, 0.00305185090212, 'nA')] + \
+    [(f'ADC{i}', 2**(4 + i), 12 + i, 0.00030518509476, 'V')
+     for i in range(1, 8)] + \
+    [('Zmon', 1, 10, 0.117506942891, 'Å'),
+     ('Umon', 2, 11, 0.000317586332138, 'V'),
+     ('Time', 1048576, 1, 0.0133333333333, 'ms'),
+     ('XS', 2097152, 5, 0.337911857395, 'Å'),
+     ('YS', 4194304, 6, 0.337911857395, 'Å'),
+     ('ZS', 8388608, 7, 0.117506942891, 'Å'),
+     ('Bias', 16777216, 8, 0.000317586332138, 'V')]
+SPEC_NUM_SECTIONS = 4
+# Number of data rows formatted at once.
+SPEC_CHUNK_SIZE = 65536
+
+
+def create_scan_dataset(channel: str = 'Topo', scan_direction: str = 'Xp',
+                        dimx: int = DEFAULT_SCAN_SIZE,
+                        dimy: int | None = None,
+                        t_start: int = DEFAULT_T_START,
+                        data: np.ndarray | None = None,
+                        seed: int | None = None,
+                        file_base: str = DEFAULT_FILE_BASE,
+                        is_main_file: bool = False) -> xarray.Dataset:
+    """Create a synthetic gxsm scan file dataset (as written by gxsm).
+
+    Args:
+        channel: the channel name (e.g. 'Topo' or 'ADC0').
+        scan_direction: 'Xp' (forward) or 'Xm' (backward, whose 'dimx' is
+            reversed).
+        dimx: the number of pixels in x.
+        dimy: the number of pixels in y (dimx if None).
+        t_start: the scan start time (unix time). All the channel files of a
+            scan share it (and the metadata derived from it).
+        data: optional (dimy, dimx) FloatField data, in DAC counts. If None,
+            random data is generated.
+        seed: the seed of the random data generator.
+        file_base: the base filename of the scan set, stored (with the
+            channel filename, see get_scan_filename()) in the metadata.
+        is_main_file: whether this is the main file of the scan set.
+
+    Returns:
+        An xarray.Dataset with the variables, dimensions and attributes of
+        a gxsm scan file.
+    """
+    dimy = dimx if dimy is None else dimy
+    if data is None:
+        data = _create_scan_data(dimx, dimy, np.random.default_rng(seed))
+    data = np.asarray(data, dtype=np.float32).reshape(1, 1, dimy, dimx)
+
+    x = np.arange(dimx, dtype=np.float32) * np.float32(DEFAULT_PIXEL_SIZE)
+    if scan_direction == 'Xm':
+        x = x[::-1]
+    y = np.arange(dimy, dtype=np.float32) * np.float32(DEFAULT_PIXEL_SIZE)
+    dz = TOPO_DZ if channel == 'Topo' else ADC_DZ
+    # asctime() dates are English (like gxsm's), whatever the locale.
+    date = time.asctime(time.gmtime(t_start))
+
+    data_vars = {
+        'rangex': ((), dimx * DEFAULT_PIXEL_SIZE, LENGTH_ATTRS),
+        'rangey': ((), dimy * DEFAULT_PIXEL_SIZE, LENGTH_ATTRS),
+        'rangez': ((), 1000.0, LENGTH_ATTRS),
+        'dx': ((), DEFAULT_PIXEL_SIZE, LENGTH_ATTRS),
+        'dy': ((), DEFAULT_PIXEL_SIZE, LENGTH_ATTRS),
+        'dz': ((), dz, {**LENGTH_ATTRS, 'label': 'Z'}),
+        'opt_xpiezo_av': ((), 453.859), 'opt_ypiezo_av': ((), 453.859),
+        'opt_zpiezo_av': ((), 56.62),
+        'offsetx': ((), 0.0, LENGTH_ATTRS), 'offsety': ((), 0.0, LENGTH_ATTRS),
+        'alpha': ((), 0.0), 'contrast': ((), 1.0), 'bright': ((), 0.0),
+        'vrange_z': ((), 150.0), 'voffset_z': ((), 0.0),
+        't_start': ((), np.int32(t_start)),
+        't_end': ((), np.int32(t_start + DEFAULT_SCAN_DURATION)),
+        'viewmode': ((), np.int32(2)),
+        'Event_User_Scan_Speed_adjust': (
+            ('Event_User_Scan_Speed_adjust_Dim', 'Event_User_Adjust_Data_Dim'),
+            np.zeros((1, 20))),
+        **{HWI_PREFIX + key: ((), val) for key, val in HWI_METADATA.items()},
+    }
+    # gxsm stores strings as char arrays: as coordinates (of their own
+    # dimension) for the scan description, as variables for the others.
+    coord_texts = {
+        'reftime': date, 'comment': 'gxsmread synthetic scan',
+        'title': file_base, 'type': 'Topo', 'username': 'Nobody',
+        'dateofscan': date,
+        'basename': get_scan_filename(file_base, scan_direction, channel,
+                                      is_main_file),
+    }
+    var_texts = {
+        'spm_scancontrol': 'XpXm',
+        'extra_scan_info': f'{scan_direction}-{channel}',
+        'sranger_info': 'Synthetic SRanger MK2 info',
+    }
+    data_vars.update({name: _create_char_variable(name + CHAR_DIM_SUFFIX,
+                                                  text)
+                      for name, text in var_texts.items()})
+    coords = {
+        'time': ('time', [float(DEFAULT_SCAN_DURATION)], {'unit': 's'}),
+        'value': ('value', np.array([HWI_METADATA['bias']], np.float32),
+                  {'unit': 'V'}),
+        'dimx': ('dimx', x, {'long_name': '# Pixels in X, contains X-Pos '
+                             'Lookup'}),
+        'dimy': ('dimy', y, {'long_name': '# Pixels in Y, contains Y-Pos '
+                             'Lookup'}),
+        **{name: _create_char_variable(name, text)
+           for name, text in coord_texts.items()},
+    }
+    # gxsm writes the FloatField first, but netCDF4 redefines the file header
+    # (moving any data already written) for each variable: writing the
+    # FloatField last makes writing large scans much faster.
+    ds = xarray.Dataset(data_vars, coords, attrs=SCAN_ATTRS)
+    ds['FloatField'] = xarray.Variable(
+        ('time', 'value', 'dimy', 'dimx'), data,
+        {'long_name': 'FLOAT: single precision floating point data field',
+         'var_units_hint': 'raw DAC/counter data. Unit is not defined here: '
+         'multiply by dz-unit'})
+    return ds
+
+
+def get_scan_filename(file_base: str, scan_direction: str, channel: str,
+                      is_main_file: bool = False) -> str:
+    """Get the gxsm filename of a channel file."""
+    return fn.format_gxsm_filename(fn.GxsmFileAttribs(
+        file_base, channel, scan_direction, is_main_file))
+
+
+def write_scan_set(directory: str | Path,
+                   file_base: str = DEFAULT_FILE_BASE,
+                   dimx: int = DEFAULT_SCAN_SIZE, dimy: int | None = None,
+                   num_channels: int = 1,
+                   t_start: int = DEFAULT_T_START,
+                   seed: int | None = None,
+                   engine: str | None = None) -> list[str]:
+    """Write a synthetic gxsm scan set (one file per channel).
+
+    Args:
+        directory: the directory to write the files to.
+        file_base: the base filename of the scan set.
+        dimx: the number of pixels in x.
+        dimy: the number of pixels in y (dimx if None).
+        num_channels: the number of channel files, up to
+            len(SCAN_CHANNELS). They are the first num_channels of
+            SCAN_CHANNELS, the first one being the main file.
+        t_start: the scan start time (unix time).
+        seed: the seed of the random data generator.
+        engine: the xarray engine to write the files with (netCDF3 classic
+            format). The 'scipy' engine is faster for small scans.
+
+    Returns:
+        The paths of the written files, main file first.
+    """
+    if not 0 < num_channels <= len(SCAN_CHANNELS):
+        raise ValueError(f'num_channels must be in [1, {len(SCAN_CHANNELS)}]'
+                         f', got {num_channels}.')
+    rng = np.random.default_rng(seed)
+    dimy = dimx if dimy is None else dimy
+    paths = []
+    for i, (direction, channel) in enumerate(SCAN_CHANNELS[:num_channels]):
+        path = Path(directory) / get_scan_filename(file_base, direction,
+                                                   channel, i == 0)
+        ds = create_scan_dataset(channel, direction, dimx, dimy, t_start,
+                                 _create_scan_data(dimx, dimy, rng),
+                                 file_base=file_base, is_main_file=i == 0)
+        ds.to_netcdf(path, format='NETCDF3_CLASSIC', engine=engine)
+        paths.append(str(path))
+    return paths
+
+
+def write_spec_file(filename: str | Path, num_rows: int = 1000,
+                    columns: list[tuple[str, str]] = DEFAULT_SPEC_COLUMNS,
+                    metadata: dict[str, str] | None = None,
+                    seed: int | None = None) -> str:
+    """Write a synthetic gxsm spectroscopy (vpdata) file.
+
+    Args:
+        filename: the path of the file to write.
+        num_rows: the number of data table rows.
+        columns: the (name, units) of the data table columns, written
+            between the 'Index' and 'Block-Start-Index' columns.
+        metadata: optional header metadata (KEY: 'SUB_KEY1=... SUB_KEY2=...'
+            strings) added to (or replacing) the default header entries.
+        seed: the seed of the random data generator.
+
+    Returns:
+        The path of the written file.
+    """
+    rng = np.random.default_rng(seed)
+    names = [name for name, _ in columns]
+    header = _create_spec_header(str(filename), num_rows, names, metadata)
+    column_header = '\t'.join(['#C Index'] +
+                              [f'"{name} ({units})"' for name, units
+                               in columns] + ['Block-Start-Index'])
+    row_format = '\t'.join(['%d'] + ['%.12e'] * (len(columns) + 1)) + '\n'
+    sections = np.linspace(0, num_rows, SPEC_NUM_SECTIONS, endpoint=False,
+                           dtype=np.int64)
+
+    with open(filename, 'w') as file:
+        file.write(header)
+        file.write(column_header + '\n')
+        for start in range(0, num_rows, SPEC_CHUNK_SIZE):
+            index = np.arange(start, min(start + SPEC_CHUNK_SIZE, num_rows))
+            block_start = sections[np.searchsorted(sections, index,
+                                                   side='right') - 1]
+            chunk = np.column_stack(
+                [index, rng.standard_normal((len(index), len(columns))),
+                 block_start])
+            # A single format operation per chunk (rather than per row).
+            file.write((row_format * len(chunk)) % tuple(chunk.ravel()))
+        file.write('#C \n#C END.\n')
+        file.write(_create_spec_vp_header(sections))
+    return str(filename)
+
+
+def write_corpus(directory: str | Path, num_scan_sets: int = 10,
+                 dimx: int = DEFAULT_SCAN_SIZE, dimy: int | None = None,
+                 num_channels: int = 1, num_spec_files: int = 0,
+                 spec_rows: int = 1000, workers: int | None = None,
+                 engine: str | None = None) -> list[str]:
+    """Write a corpus of synthetic scan sets and spectroscopy files.
+
+    Each scan set and spectroscopy file is written by a worker process (see
+    utils.map_parallel()). Scan set i is named DEFAULT_FILE_BASE$iiii$, with
+    $iiii$ being i zero-padded to 4 digits (e.g. 'synthetic0007'), and a
+    t_start of DEFAULT_T_START + i hours; spectroscopy file i is
+    DEFAULT_FILE_BASE$iiii$-VP.vpdata.
+
+    Args:
+        directory: the directory to write the files to (created if needed).
+        num_scan_sets: the number of scan sets.
+        dimx: see write_scan_set().
+        dimy: see write_scan_set().
+        num_channels: see write_scan_set().
+        num_spec_files: the number of spectroscopy files.
+        spec_rows: the number of data rows of each spectroscopy file.
+        workers: the number of worker processes to use. If None, we use the
+            number of CPUs.
+        engine: see write_scan_set().
+
+    Returns:
+        The paths of all written files.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    scan_func = partial(_write_corpus_scan_set, directory=directory,
+                        dimx=dimx, dimy=dimy, num_channels=num_channels,
+                        engine=engine)
+    spec_func = partial(_write_corpus_spec_file, directory=directory,
+                        num_rows=spec_rows)
+    tasks = ([partial(scan_func, i) for i in range(num_scan_sets)] +
+             [partial(spec_func, i) for i in range(num_spec_files)])
+    paths = []
+    for result in utils.map_parallel(_run_task, tasks, workers):
+        if isinstance(result, Exception):
+            raise result
+        paths.extend(result)
+    return paths
+
+
+def _create_scan_data(dimx: int, dimy: int, rng: np.random.Generator
+                      ) -> np.ndarray:
+    """Create (dimy, dimx) random data: a tilted plane plus noise."""
+    data = rng.standard_normal((dimy, dimx), dtype=np.float32)
+    data *= NOISE_AMPLITUDE
+    data += np.arange(dimx, dtype=np.float32) * np.float32(SLOPE)
+    data += np.arange(dimy, dtype=np.float32)[:, None] * np.float32(SLOPE)
+    return data
+
+
+def _create_char_variable(dim: str, text: str) -> tuple:
+    """Create a gxsm char array variable, of dimension dim and dtype S1."""
+    return (dim, np.frombuffer(text.encode(), dtype='S1'))
+
+
+def _create_spec_header(filename: str, num_rows: int, names: list[str],
+                        metadata: dict[str, str] | None) -> str:
+    """Create the spec file lines preceding the data table column names."""
+    header = {
+        'GXSM Vector Probe Data': 'VPVersion=00.02 vdate=20070227',
+        'Date': f'date={time.asctime()}',
+        'FileName': f'name={filename}',
+        'GXSM-Main-Offset': 'X0=0 Ang  Y0=0 Ang, iX0=0 Pix iX0=0 Pix',
+        'DSP SCANCOORD POSITION': 'DSP-XSpos=0 DSP-YSpos=0',
+        'GXSM-DSP-Control-FB': 'Bias=0.1 V, Current=0 nA',
+        'GXSM-Main-Comment': 'comment="gxsmread synthetic spectroscopy"',
+        'Probe Data Number': f'N={num_rows}',
+        **(metadata or {}),
+    }
+    lines = [f'# view via: xmgrace -block {filename} -bxy 2:4 ...']
+    lines += [f'# {key:<23}:: {val}' for key, val in header.items()]
+    lines += ['#C ', '#C VP Channel Map and Units lookup table used:=table '
+              '[## msk expdi, lab, DAC2U, unit/DAC, Active]']
+    for i, (label, mask, expdi, dac_to_unit, units) in enumerate(
+            SPEC_CHANNEL_MAP):
+        active = 'Yes' if label in names else 'No'
+        lines.append(f'# Cmap[{i}]\t{mask}\t{expdi}\t{label}\t{dac_to_unit}'
+                     f'\t{units}/DAC\t{active}')
+    lines += ['#C ', '#C Data Table             :: data=']
+    return '\n'.join(lines) + '\n'
+
+
+def _create_spec_vp_header(sections: np.ndarray) -> str:
+    """Create the Vector Probe Header list appendix."""
+    lines = ['#C START OF HEADER LIST APPENDIX',
+             '#C Vector Probe Header List -----------------',
+             '#C # ####\t time[ms]  \t dt[ms]    \t X[Ang]   \t Y[Ang]   '
+             '\t Z[Ang]    \t Sec']
+    for i, start in enumerate(sections):
+        lines.append(f'# {i:7d}\t {float(start):.12e}\t {1.0:.12e}\t '
+                     f'{0.0:.12e}\t {0.0:.12e}\t {0.0:.12e}\t {float(i):.12e}'
+                     '\t ')
+    lines.append('#C END OF HEADER LIST APPENDIX.')
+    return '\n'.join(lines) + '\n'
+
+
+def _write_corpus_scan_set(i: int, directory: Path, dimx: int,
+                           dimy: int | None, num_channels: int,
+                           engine: str | None) -> list[str]:
+    return write_scan_set(directory, f'{DEFAULT_FILE_BASE}{i:04d}', dimx,
+                          dimy, num_channels, DEFAULT_T_START + 3600 * i,
+                          seed=i, engine=engine)
+
+
+def _write_corpus_spec_file(i: int, directory: Path, num_rows: int
+                            ) -> list[str]:
+    filename = directory / f'{DEFAULT_FILE_BASE}{i:04d}-VP{SPEC_FILE_SUFFIX}'
+    return [write_spec_file(filename, num_rows, seed=i)]
+
+
+def _run_task(task: partial) -> list[str] | Exception:
+    """Run a write task (in a worker process), returning any exception."""
+    try:
+        return task()
+    except Exception as e:
+        return e
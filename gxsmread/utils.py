@@ -1,6 +1,9 @@
 """Simple container of utils."""
 
+import os
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterator
 
 
 def extract_numpy_data(arr: np.ndarray):
@@ -15,3 +18,32 @@ def extract_numpy_data(arr: np.ndarray):
         return arr[0]
     else:
         raise TypeError('Unsure how to extract from this numpy format.')
+
+
+def map_parallel(func: Callable, items: list, workers: int | None
+                 ) -> Iterator:
+    """Yield func(item) for each item, computed in worker processes.
+
+    Args:
+        func: the (picklable) function to apply.
+        items: the items to apply it to.
+        workers: the number of worker processes to use. If None, we use the
+            number of CPUs. If 1, func is applied in the calling process.
+
+    Returns:
+        An iterator over the results, in the order of items.
+    """
+    if not is_parallel(items, workers):
+        yield from map(func, items)
+        return
+
+    workers = workers if workers else os.cpu_count()
+    chunksize = max(1, len(items) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(func, items, chunksize=chunksize)
+
+
+def is_parallel(items: list, workers: int | None) -> bool:
+    """Whether map_parallel(func, items, workers) uses worker processes."""
+    workers = workers if workers else os.cpu_count()
+    return workers != 1 and len(items) > 1
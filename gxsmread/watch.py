@@ -0,0 +1,345 @@
+"""Watching a directory for the gxsm files being written to it.
+
+During a measurement session, gxsm keeps writing new scan (.nc) and
+spectroscopy (.vpdata) files to its data directory. Rather than re-globbing
+and re-opening all files to find the new ones, a Watcher polls the directory
+and only ingests the new (or modified) files, once they are complete.
+
+A file is considered complete (stable) once its size and modification time
+have not changed across the polls of stable_time seconds. Its modification
+time itself is not trusted (it may be preserved by a copy, e.g. with rsync,
+or skewed on a network file system): files already present when watching
+starts are also only ingested after stable_time. Stable files are then
+ingested:
+    - scan files are added to a Catalog (see catalog.py), and grouped into
+        scan sets by their directory and file_base (see
+        filename.parse_gxsm_filename()). Scan sets are keyed by their
+        directory (relative to the watched one) joined with their
+        file_base, e.g. 'day1/my_scan' (or 'my_scan' for the watched
+        directory itself), so that scans sharing a file_base in different
+        sub-directories are kept apart. A scan set is reported (and,
+        optionally, converted to a Zarr or NetCDF4 store, see convert.py,
+        in the matching sub-directory of the output directory) once its
+        main file has arrived and none of its known files is still being
+        written. It is reported again when later channels arrive.
+    - spec files are parsed into a SpecCache (see cache.py), so that later
+        read.open_spec() calls are cache hits.
+
+Note that changes are detected by polling (listing the directory and
+stat-ing its files), rather than with OS file system events (e.g. inotify),
+as these are not available from the standard library.
+
+Basic usage:
+    for event in watch('/path/to/data', catalog='/path/to/catalog.sqlite',
+                       spec_cache='/path/to/cache'):
+        for scan_set, paths in event.scan_sets.items():
+            ds = read.open_mfdataset(paths)
+            [...]
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterator
+import fnmatch
+import os
+import time
+from . import cache
+from . import catalog as ct
+from . import convert
+from . import filename as fn
+from . import read
+
+SCAN_PATTERN = '*.nc'
+SPEC_PATTERN = '*.vpdata'
+
+DEFAULT_POLL_INTERVAL = 1.0
+# Time (in seconds) a file must remain unchanged to be considered complete.
+DEFAULT_STABLE_TIME = 2.0
+
+
+@dataclass
+class WatchEvent:
+    """The files ingested by a poll of a Watcher.
+
+    Attributes:
+        scan_sets: dict of SCAN_SET:PATHS of the new or updated scan sets,
+            SCAN_SET being the scan set directory (relative to the watched
+            one) joined with its file_base, and PATHS all the (sorted) files
+            of the scan set so far.
+        spec_files: the new or modified spec files.
+        removed: the previously ingested files that no longer exist.
+        errors: dict of PATH:EXCEPTION for the files that could not be
+            ingested (or SCAN_SET:EXCEPTION for the scan sets that could not
+            be converted).
+    """
+
+    scan_sets: dict[str, list[str]] = field(default_factory=dict)
+    spec_files: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    errors: dict[str, Exception] = field(default_factory=dict)
+
+    def __bool__(self) -> bool:
+        return bool(self.scan_sets or self.spec_files or self.removed or
+                    self.errors)
+
+
+class Watcher:
+    """Incremental ingestion of the gxsm files written to a directory.
+
+    Can be used as a context manager, closing its catalog on exit (if the
+    Watcher opened it).
+
+    Attributes:
+        directory: the watched directory.
+        recursive: whether sub-directories are watched too.
+        stable_time: the time (in seconds) a file must remain unchanged to
+            be ingested.
+        catalog: the Catalog scan files are added to (or None).
+        spec_cache: the SpecCache spec files are parsed into (or None).
+        output_dir: the directory scan sets are converted to (or None).
+        convert_kwargs: the arguments passed to convert.convert().
+    """
+
+    def __init__(self, directory: str | Path, recursive: bool = True,
+                 stable_time: float = DEFAULT_STABLE_TIME,
+                 catalog: ct.Catalog | str | Path | None = None,
+                 spec_cache: cache.SpecCache | str | Path | None = None,
+                 output_dir: str | Path | None = None,
+                 **convert_kwargs: Any):
+        """Create a Watcher (no file is ingested until poll() is called).
+
+        Args:
+            directory: the directory to watch.
+            recursive: whether to also watch sub-directories.
+            stable_time: the time (in seconds) a file must remain unchanged
+                to be considered complete, and ingested.
+            catalog: optional Catalog instance (or the path of its database)
+                to add the scan files to.
+            spec_cache: optional cache.SpecCache instance (or the directory of
+                one) to parse the spec files into.
+            output_dir: optional directory to convert the scan sets to (see
+                convert.convert()). It is not watched.
+            **convert_kwargs: arguments passed to convert.convert() (e.g.
+                output_format or channels_config_path). Scan sets are
+                converted one at a time (any workers argument is ignored).
+                A scan set failing to convert is not reported, and its
+                conversion is retried on the next polls.
+
+        Raises:
+            ValueError if output_dir is given, and the output_format is
+                unknown.
+            ImportError if output_dir is given, the output_format is
+                convert.FORMAT_ZARR, and the 'zarr' optional dependencies
+                are not installed.
+        """
+        if output_dir is not None:
+            convert.check_output_format(
+                convert_kwargs.get('output_format', convert.FORMAT_ZARR))
+        self.directory = Path(directory).resolve()
+        self.recursive = recursive
+        self.stable_time = stable_time
+        self._owns_catalog = catalog is not None and \
+            not isinstance(catalog, ct.Catalog)
+        if self._owns_catalog:
+            catalog = ct.Catalog(catalog)
+        self.catalog = catalog
+        if spec_cache is not None and \
+                not isinstance(spec_cache, cache.SpecCache):
+            spec_cache = cache.SpecCache(spec_cache)
+        self.spec_cache = spec_cache
+        self.output_dir = (None if output_dir is None
+                           else Path(output_dir).resolve())
+        self.convert_kwargs = convert_kwargs
+
+        # PATH:((SIZE, MTIME_NS), STABLE_SINCE) of the files not ingested yet
+        self._pending = {}
+        # PATH:(SIZE, MTIME_NS) of the ingested files
+        self._ingested = {}
+        # SCAN_SET:PATHS of the ingested scan files
+        self._scan_sets = {}
+        # The scan sets with ingested files not reported yet
+        self._updated_scan_sets = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Close the catalog, if the Watcher opened it."""
+        if self._owns_catalog:
+            self.catalog.close()
+
+    def poll(self) -> WatchEvent:
+        """List the directory once, ingesting the newly stable files.
+
+        Returns:
+            A WatchEvent of the files ingested (empty if none).
+        """
+        event = WatchEvent()
+        now = time.time()
+        stats = self._list_files()
+
+        for path in list(self._pending):
+            if path not in stats:
+                del self._pending[path]
+        for path in list(self._ingested):
+            if path not in stats:
+                del self._ingested[path]
+                self._forget_scan_file(path)
+                event.removed.append(path)
+
+        stable = []
+        for path, stat in stats.items():
+            if self._ingested.get(path) == stat:
+                continue
+            pending = self._pending.get(path)
+            if pending is None or pending[0] != stat:
+                pending = (stat, now)
+                self._pending[path] = pending
+            if now - pending[1] >= self.stable_time:
+                stable.append(path)
+
+        scan_paths = [path for path in stable
+                      if fnmatch.fnmatch(path, SCAN_PATTERN)]
+        spec_paths = [path for path in stable
+                      if fnmatch.fnmatch(path, SPEC_PATTERN)]
+        if self.catalog is not None:
+            event.errors.update(self.catalog.update(scan_paths + [
+                path for path in event.removed
+                if fnmatch.fnmatch(path, SCAN_PATTERN)]))
+        for path in scan_paths:
+            self._add_scan_file(path, event)
+        for path in spec_paths:
+            self._add_spec_file(path, event)
+        for path in stable:
+            self._ingested[path] = self._pending.pop(path)[0]
+
+        self._report_scan_sets(event)
+        return event
+
+    def watch(self, poll_interval: float = DEFAULT_POLL_INTERVAL,
+              timeout: float | None = None) -> Iterator[WatchEvent]:
+        """Poll the directory repeatedly, yielding the non-empty events.
+
+        Args:
+            poll_interval: the time (in seconds) between polls.
+            timeout: the time (in seconds) after which to stop watching. If
+                None, watch forever.
+
+        Yields:
+            WatchEvent instances.
+        """
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            event = self.poll()
+            if event:
+                yield event
+            if end is not None and time.monotonic() + poll_interval > end:
+                return
+            time.sleep(poll_interval)
+
+    def _list_files(self) -> dict[str, tuple[int, int]]:
+        """Get PATH:(SIZE, MTIME_NS) of the watched files."""
+        stats = {}
+        for dirpath, dirnames, filenames in os.walk(self.directory):
+            if not self.recursive:
+                dirnames.clear()
+            elif self.output_dir is not None:
+                dirnames[:] = [name for name in dirnames
+                               if os.path.join(dirpath, name) !=
+                               str(self.output_dir)]
+            for filename in filenames:
+                if not (fnmatch.fnmatch(filename, SCAN_PATTERN) or
+                        fnmatch.fnmatch(filename, SPEC_PATTERN)):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:  # Removed since listed
+                    continue
+                stats[path] = (stat.st_size, stat.st_mtime_ns)
+        return stats
+
+    def _get_scan_set(self, path: str) -> str:
+        """Get the key of the scan set of a scan file (see WatchEvent)."""
+        file_base = fn.parse_gxsm_filename(path).file_base
+        directory = os.path.relpath(os.path.dirname(path), self.directory)
+        return os.path.normpath(os.path.join(directory, file_base))
+
+    def _add_scan_file(self, path: str, event: WatchEvent):
+        try:
+            scan_set = self._get_scan_set(path)
+        except Exception as e:
+            event.errors[path] = e
+            return
+        self._scan_sets.setdefault(scan_set, set()).add(path)
+        self._updated_scan_sets.add(scan_set)
+
+    def _forget_scan_file(self, path: str):
+        for scan_set, paths in list(self._scan_sets.items()):
+            if path in paths:
+                paths.discard(path)
+                if not paths:
+                    del self._scan_sets[scan_set]
+                    self._updated_scan_sets.discard(scan_set)
+
+    def _add_spec_file(self, path: str, event: WatchEvent):
+        if self.spec_cache is not None:
+            try:
+                read.open_spec(path, cache=self.spec_cache)
+            except Exception as e:
+                event.errors[path] = e
+                return
+        event.spec_files.append(path)
+
+    def _report_scan_sets(self, event: WatchEvent):
+        """Report the updated scan sets which are complete."""
+        pending_scan_sets = set()
+        for path in self._pending:
+            if fnmatch.fnmatch(path, SCAN_PATTERN):
+                try:
+                    pending_scan_sets.add(self._get_scan_set(path))
+                except Exception:
+                    pass
+
+        for scan_set in sorted(self._updated_scan_sets):
+            paths = sorted(self._scan_sets[scan_set])
+            has_main_file = any(fn.parse_gxsm_filename(path).is_main_file
+                                for path in paths)
+            if not has_main_file or scan_set in pending_scan_sets:
+                continue
+            if self.output_dir is not None:
+                # Converting a single directory, the store is keyed by the
+                # file_base (see convert.group_scan_sets()).
+                directory, file_base = os.path.split(scan_set)
+                status = convert.convert(
+                    paths, self.output_dir / directory,
+                    **{**self.convert_kwargs, 'workers': 1})[file_base]
+                if isinstance(status, Exception):
+                    # Still updated: retried on the next poll
+                    event.errors[scan_set] = status
+                    continue
+            self._updated_scan_sets.discard(scan_set)
+            event.scan_sets[scan_set] = paths
+
+
+def watch(directory: str | Path,
+          poll_interval: float = DEFAULT_POLL_INTERVAL,
+          timeout: float | None = None, **kwargs: Any
+          ) -> Iterator[WatchEvent]:
+    """Watch a directory, yielding the gxsm files ingested as they arrive.
+
+    Args:
+        directory: the directory to watch.
+        poll_interval: see Watcher.watch().
+        timeout: see Watcher.watch().
+        **kwargs: arguments passed to Watcher() (e.g. catalog, spec_cache,
+            stable_time or output_dir).
+
+    Yields:
+        WatchEvent instances (see Watcher.poll()).
+    """
+    with Watcher(directory, **kwargs) as watcher:
+        yield from watcher.watch(poll_interval, timeout)
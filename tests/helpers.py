@@ -0,0 +1,14 @@
+"""Helpers shared by several test modules."""
+
+
+class CountingScheduler:
+    """Dask scheduler counting the number of computations performed."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, dsk, keys, **kwargs):
+        # Imported here: modules without dask skip their tests instead.
+        import dask
+        self.count += 1
+        return dask.get(dsk, keys, **kwargs)
@@ -0,0 +1,133 @@
+import asyncio
+import gc
+import threading
+import pytest
+import xarray as xr
+import gxsmread.aio as aio
+import gxsmread.read as read
+
+
+FILENAME = './tests/data/chigwell009-M-Xp-Topo.nc'
+MF_FILENAME = './tests/data/chigwell009*.nc'
+SPEC_FILENAME = './tests/data/test007-VP003-VP.vpdata'
+
+
+def test_open_async():
+    async def main():
+        return await asyncio.gather(
+            aio.open_dataset_async(FILENAME, use_physical_units=False),
+            aio.open_mfdataset_async(MF_FILENAME, use_physical_units=False,
+                                     fast_merge=True),
+            aio.open_spec_async(SPEC_FILENAME))
+    ds, mf_ds, spec_df = asyncio.run(main())
+
+    xr.testing.assert_identical(
+        ds, read.open_dataset(FILENAME, use_physical_units=False))
+    assert all(var.chunks is None for var in mf_ds.data_vars.values())
+    xr.testing.assert_identical(
+        mf_ds, read.open_mfdataset(MF_FILENAME, use_physical_units=False,
+                                   fast_merge=True).load())
+    assert spec_df.attrs == read.open_spec(SPEC_FILENAME).attrs
+
+
+def test_default_reader_per_loop():
+    async def get_reader():
+        assert aio.get_default_reader() is aio.get_default_reader()
+        return aio.get_default_reader()
+    assert asyncio.run(get_reader()) is not asyncio.run(get_reader())
+
+
+def test_default_reader_shutdown(monkeypatch):
+    shut_down = []
+
+    class Executor(aio.ThreadPoolExecutor):
+        def shutdown(self, *args, **kwargs):
+            shut_down.append(self)
+            super().shutdown(*args, **kwargs)
+
+    async def read(num_reads):
+        reader = aio.get_default_reader()
+        await asyncio.gather(*[reader.run(sum, [i])
+                               for i in range(num_reads)])
+        return reader._executor
+
+    monkeypatch.setattr(aio, 'ThreadPoolExecutor', Executor)
+    # Shut down once the loop is collected...
+    executor = asyncio.run(read(1))
+    gc.collect()
+    assert shut_down == [executor]
+    # ... or closed (if waiting for a slot bound the reader to the loop)
+    executor = asyncio.run(read(2 * aio.DEFAULT_MAX_CONCURRENCY))
+    asyncio.run(read(1))
+    assert executor in shut_down
+
+
+def test_max_concurrency():
+    lock = threading.Lock()
+    running = []
+    max_running = []
+    release = threading.Event()
+
+    def blocking_read(i):
+        with lock:
+            running.append(i)
+            max_running.append(len(running))
+        release.wait(5)
+        with lock:
+            running.remove(i)
+        return i
+
+    async def main():
+        async with aio.AsyncReader(max_concurrency=2) as reader:
+            tasks = [asyncio.create_task(reader.run(blocking_read, i))
+                     for i in range(5)]
+            # The event loop is not blocked while reads are running
+            await asyncio.sleep(0.1)
+            assert len(running) == 2
+            release.set()
+            return await asyncio.gather(*tasks)
+
+    assert asyncio.run(main()) == list(range(5))
+    assert max(max_running) == 2
+
+    with pytest.raises(ValueError):
+        aio.AsyncReader(max_concurrency=0)
+
+
+def test_cancel(monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+    closed = []
+    open_dataset = read.open_dataset
+
+    def blocking_open(*args, **kwargs):
+        started.set()
+        release.wait(5)
+        ds = open_dataset(*args, **kwargs)
+        ds.set_close(lambda: closed.append(True))
+        return ds
+    monkeypatch.setattr(read, 'open_dataset', blocking_open)
+
+    async def main():
+        reader = aio.AsyncReader(max_concurrency=1)
+        running = asyncio.create_task(reader.open_dataset(
+            FILENAME, load=False, use_physical_units=False))
+        waiting = asyncio.create_task(reader.open_spec(SPEC_FILENAME))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        running.cancel()
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await running
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+
+        # The slot is freed once the cancelled read completes
+        assert reader._semaphore.locked()
+        release.set()
+        df = await reader.open_spec(SPEC_FILENAME)
+        reader.close()
+        return df
+
+    assert len(asyncio.run(main())) == 100
+    # The dataset of the cancelled read was closed
+    assert closed == [True]
@@ -0,0 +1,110 @@
+import glob
+import io
+import os
+import tarfile
+import zipfile
+import pytest
+import xarray as xr
+import gxsmread.archive as archive
+import gxsmread.read as read
+
+
+SCAN_FILES = sorted(glob.glob('./tests/data/chigwell009*.nc'))[:3] + \
+    ['./tests/data/r19_AuNP_LN158-Xp-ADC0mITunnel.nc']
+SPEC_FILE = './tests/data/test007-VP003-VP.vpdata'
+FILES = SCAN_FILES + [SPEC_FILE]
+KWARGS = {'use_physical_units': False}
+
+
+def arcname(filename):
+    return 'session/' + os.path.basename(filename)
+
+
+def write_zip(path):
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for filename in FILES:
+            zf.write(filename, arcname(filename))
+
+
+def write_tar(path):
+    with tarfile.open(path, 'w:gz') as tf:
+        for filename in FILES:
+            tf.add(filename, arcname(filename))
+
+
+@pytest.fixture(params=['zip', 'tar.gz'])
+def archive_path(request, tmp_path):
+    path = tmp_path / f'session.{request.param}'
+    write_zip(path) if request.param == 'zip' else write_tar(path)
+    return path
+
+
+def test_list_members(archive_path):
+    with archive.Archive(archive_path) as arc:
+        assert arc.names == [arcname(filename) for filename in FILES]
+        assert arc.is_random_access == (archive_path.suffix == '.zip')
+        assert arc.scan_sets() == {
+            'session/chigwell009': [arcname(f) for f in SCAN_FILES[:3]],
+            'session/r19_AuNP_LN158': [arcname(SCAN_FILES[3])]}
+        assert arc.spec_files() == [arcname(SPEC_FILE)]
+        with open(SPEC_FILE, 'rb') as file:
+            assert arc.read(arcname(SPEC_FILE)) == file.read()
+        with pytest.raises(KeyError):
+            arc.read('session/missing.nc')
+
+
+def test_open_scans(archive_path):
+    expected = read.open_mfdataset(SCAN_FILES[:3], fast_merge=True,
+                                   **KWARGS)
+    with archive.Archive(archive_path) as arc:
+        ds = arc.open_mfdataset('session/chigwell009', **KWARGS)
+        single_ds = arc.open_dataset(arcname(SCAN_FILES[3]), **KWARGS)
+        scan_sets = dict(arc.iter_scan_sets(**KWARGS))
+    xr.testing.assert_identical(ds.load(), expected.load())
+    xr.testing.assert_identical(
+        single_ds.load(), read.open_dataset(SCAN_FILES[3], **KWARGS).load())
+    assert list(scan_sets) == ['session/chigwell009',
+                               'session/r19_AuNP_LN158']
+    xr.testing.assert_identical(scan_sets['session/chigwell009'].load(),
+                                expected.load())
+
+
+def test_open_spec(archive_path):
+    expected_df = read.open_spec(SPEC_FILE)
+    with archive.Archive(archive_path) as arc:
+        df = arc.open_spec(arcname(SPEC_FILE))
+        specs = list(arc.iter_spec())
+    assert df.equals(expected_df)
+    assert [name for name, _ in specs] == [arcname(SPEC_FILE)]
+    assert specs[0][1].equals(expected_df)
+
+
+def test_scan_sets_by_directory(tmp_path):
+    path = tmp_path / 'sessions.zip'
+    with zipfile.ZipFile(path, 'w') as zf:
+        for day in ['day1', 'day2']:
+            for filename in SCAN_FILES[:3]:
+                zf.write(filename, f'{day}/{os.path.basename(filename)}')
+        zf.writestr('day1/notes.nc', 'not a gxsm scan')
+
+    errors = {}
+    with archive.Archive(path) as arc:
+        scan_sets = arc.scan_sets(errors=errors)
+        datasets = dict(arc.iter_scan_sets(**KWARGS))
+    assert list(scan_sets) == ['day1/chigwell009', 'day2/chigwell009']
+    assert scan_sets['day2/chigwell009'] == [
+        f'day2/{os.path.basename(f)}' for f in SCAN_FILES[:3]]
+    assert list(errors) == ['day1/notes.nc']
+    assert list(datasets) == list(scan_sets)
+
+
+def test_archive_file_object(tmp_path):
+    path = tmp_path / 'session.tar'
+    with tarfile.open(path, 'w') as tf:
+        tf.add(SPEC_FILE, arcname(SPEC_FILE))
+    with open(path, 'rb') as file:
+        arc = archive.Archive(io.BytesIO(file.read()))
+    assert arc.spec_files() == [arcname(SPEC_FILE)]
+
+    with pytest.raises(ValueError):
+        archive.Archive(SPEC_FILE)
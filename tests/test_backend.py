@@ -0,0 +1,67 @@
+import pickle
+import pytest
+import numpy as np
+import xarray as xr
+import gxsmread.backend as backend
+import gxsmread.read as read
+from .helpers import CountingScheduler
+
+# Chunked (and multi-file) datasets need dask.
+dask = pytest.importorskip('dask')
+
+
+ENGINE = backend.GxsmBackendEntrypoint
+FILENAME = "./tests/data/chigwell009-M-Xp-Topo.nc"
+
+
+@pytest.mark.parametrize('simplify_metadata', [True, False])
+def test_open_dataset(simplify_metadata):
+    ds = xr.open_dataset(FILENAME, engine=ENGINE,
+                         simplify_metadata=simplify_metadata)
+    read_ds = read.open_dataset(FILENAME, simplify_metadata=simplify_metadata)
+    xr.testing.assert_identical(ds, read_ds)
+
+
+def test_open_dataset_lazy_indexing(monkeypatch):
+    read_ds = read.open_dataset(FILENAME, dtype=np.float64)
+
+    indexed_keys = []
+    raw_indexing_method = backend.GxsmBackendArray._raw_indexing_method
+
+    def recording_raw_indexing_method(self, key):
+        indexed_keys.append(key)
+        return raw_indexing_method(self, key)
+    monkeypatch.setattr(backend.GxsmBackendArray, '_raw_indexing_method',
+                        recording_raw_indexing_method)
+
+    ds = xr.open_dataset(FILENAME, engine=ENGINE, dtype=np.float64)
+    assert indexed_keys == []
+
+    da = ds['Topo-Xp'][10:12, [1, 5, 7]]
+    assert indexed_keys == []
+    assert da.dtype == np.float64
+    xr.testing.assert_identical(da, read_ds['Topo-Xp'][10:12, [1, 5, 7]])
+    assert len(indexed_keys) == 1
+    assert indexed_keys[0][0] == slice(10, 12, 1)
+    assert (indexed_keys[0][1] == [1, 5, 7]).all()
+
+
+def test_open_mfdataset_chunks():
+    paths = "./tests/data/chigwell009*.nc"
+    read_ds = read.open_mfdataset(paths, use_physical_units=False)
+
+    scheduler = CountingScheduler()
+    with dask.config.set(scheduler=scheduler):
+        ds = xr.open_mfdataset(paths, engine=ENGINE, combine='nested',
+                               concat_dim=None, compat='identical',
+                               chunks={'dimy': 16}, use_physical_units=False)
+        assert scheduler.count == 0
+    assert ds['Topo-Xp'].chunks == ((16, 16, 16, 16), (64,))
+    xr.testing.assert_identical(ds.compute(), read_ds.compute())
+
+
+def test_backend_array_pickle():
+    ds = xr.open_dataset(FILENAME, engine=ENGINE, chunks={})
+    ds = pickle.loads(pickle.dumps(ds))
+    read_ds = read.open_dataset(FILENAME)
+    xr.testing.assert_identical(ds.compute(), read_ds)
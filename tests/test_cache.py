@@ -0,0 +1,184 @@
+import concurrent.futures
+import os
+import shutil
+import pytest
+import numpy as np
+import gxsmread.cache as cache
+import gxsmread.read as read
+import gxsmread.spec as spec
+
+
+@pytest.fixture
+def spec_filename(tmp_path):
+    filename = tmp_path / 'test007-VP003-VP.vpdata'
+    shutil.copy('./tests/data/test007-VP003-VP.vpdata', filename)
+    return filename
+
+
+@pytest.fixture
+def spec_cache(tmp_path):
+    return cache.SpecCache(tmp_path / 'cache')
+
+
+def test_cache_hit(spec_filename, spec_cache):
+    assert spec_cache.get(spec_filename) is None
+    df = read.open_spec(spec_filename, cache=spec_cache)
+
+    cached_spec = spec_cache.get(spec_filename)
+    assert isinstance(cached_spec.data, np.memmap)
+    assert cached_spec.names == list(df.columns)
+
+    cached_df = read.open_spec(spec_filename, cache=spec_cache)
+    assert (cached_df.to_numpy() == df.to_numpy()).all()
+    assert cached_df.attrs == df.attrs
+
+    array, _ = read.open_spec(spec_filename, cache=spec_cache,
+                              output=read.SPEC_OUTPUT_STRUCTURED)
+    # A read-only view of the memory-mapped cache data
+    assert isinstance(array.base.base, np.memmap)
+    assert not array.flags.writeable
+
+
+def test_cache_key_options(spec_filename, spec_cache):
+    read.open_spec(spec_filename, cache=spec_cache)
+    assert spec_cache.get(spec_filename, dtype=np.float64) is None
+    assert spec_cache.get(spec_filename, usecols=[0, 1]) is None
+
+    df = read.open_spec(spec_filename, usecols=[0, 1], dtype=np.float64,
+                        cache=spec_cache)
+    cached_spec = spec_cache.get(spec_filename, [0, 1], np.float64)
+    assert cached_spec.data.dtype == np.float64
+    assert cached_spec.names == list(df.columns)
+
+    # numpy integer columns share the key of the python ints
+    np_df = read.open_spec(spec_filename, usecols=list(np.arange(2)),
+                           dtype=np.float64, cache=spec_cache)
+    assert (np_df.to_numpy() == df.to_numpy()).all()
+    assert spec_cache.get_key(spec_filename, list(np.arange(2)),
+                              np.float64) == \
+        spec_cache.get_key(spec_filename, [0, 1], np.float64)
+
+
+def test_cache_invalidation(spec_filename, spec_cache, monkeypatch):
+    read.open_spec(spec_filename, cache=spec_cache)
+
+    # Modified file
+    stat = os.stat(spec_filename)
+    os.utime(spec_filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert spec_cache.get(spec_filename) is None
+
+    # Updated parser
+    read.open_spec(spec_filename, cache=spec_cache)
+    monkeypatch.setattr(spec, 'PARSER_VERSION', spec.PARSER_VERSION + 1)
+    assert spec_cache.get(spec_filename) is None
+
+
+def test_cache_hash_contents(spec_filename, tmp_path):
+    spec_cache = cache.SpecCache(tmp_path / 'cache', hash_contents=True)
+    read.open_spec(spec_filename, cache=spec_cache)
+
+    # Touching the file does not invalidate the entry
+    os.utime(spec_filename)
+    assert spec_cache.get(spec_filename) is not None
+
+    # Nor does copying it: entries are keyed by contents only
+    copy_filename = tmp_path / 'copy.vpdata'
+    shutil.copy(spec_filename, copy_filename)
+    assert spec_cache.get(copy_filename) is not None
+
+
+def test_cache_eviction(spec_filename, spec_cache):
+    read.open_spec(spec_filename, cache=spec_cache)
+    read.open_spec(spec_filename, dtype=np.float16, cache=spec_cache)
+
+    # Room for these 2 entries only: adding a (smaller) 3rd entry evicts
+    # the least recently used one.
+    spec_cache.max_size = sum(path.stat().st_size for path in
+                              spec_cache.directory.iterdir())
+    key_old = spec_cache.get_key(spec_filename)
+    os.utime(spec_cache.directory / (key_old + cache.METADATA_SUFFIX),
+             (0, 0))
+    spec_cache.get(spec_filename, dtype=np.float16)  # Mark as used
+    read.open_spec(spec_filename, dtype=np.float16, usecols=[0],
+                   cache=spec_cache)
+
+    assert spec_cache.get(spec_filename) is None
+    assert spec_cache.get(spec_filename, dtype=np.float16) is not None
+    assert spec_cache.get(spec_filename, [0], np.float16) is not None
+    assert not any(path.suffix == cache.TMP_SUFFIX for path in
+                   spec_cache.directory.iterdir())
+
+    # Interrupted writes are cleared too
+    (spec_cache.directory / ('interrupted' + cache.TMP_SUFFIX)).touch()
+    spec_cache.clear()
+    assert list(spec_cache.directory.iterdir()) == []
+
+
+def test_cache_eviction_orphans(spec_filename, spec_cache):
+    read.open_spec(spec_filename, cache=spec_cache)
+    key = spec_cache.get_key(spec_filename)
+    data_path = spec_cache.directory / (key + cache.DATA_SUFFIX)
+    orphan_paths = [
+        data_path.with_name('orphan' + cache.DATA_SUFFIX),
+        data_path.with_name('orphan2' + cache.METADATA_SUFFIX),
+        data_path.with_name('partial' + cache.TMP_SUFFIX)]
+    for path in orphan_paths:
+        shutil.copy(data_path, path)
+        os.utime(path, (0, 0))
+    fresh_path = data_path.with_name('fresh' + cache.DATA_SUFFIX)
+    shutil.copy(data_path, fresh_path)
+
+    # Old orphans are removed, recent ones (which may belong to an entry
+    # being written) are kept but counted.
+    spec_cache.evict()
+    assert not any(path.exists() for path in orphan_paths)
+    assert fresh_path.exists()
+    assert spec_cache.get(spec_filename) is not None
+
+    # Recent orphans are never evicted
+    spec_cache.max_size = 0
+    spec_cache.evict()
+    assert spec_cache.get(spec_filename) is None
+    assert fresh_path.exists()
+
+
+def _put_entries(spec_filename, directory, process, num_entries):
+    spec_cache = cache.SpecCache(directory, max_size=1)
+    cached_spec = cache.CachedSpec({}, [], [], np.zeros(10000))
+    for i in range(num_entries):
+        spec_cache.put(spec_filename, cached_spec, usecols=[process, i])
+
+
+def test_cache_concurrent_writes(spec_filename, tmp_path):
+    # Each process evicts (all) the entries of the other, while it may be
+    # writing them.
+    num_entries = 200
+    with concurrent.futures.ProcessPoolExecutor(2) as executor:
+        futures = [executor.submit(_put_entries, spec_filename,
+                                   tmp_path / 'cache', process, num_entries)
+                   for process in range(2)]
+        for future in futures:
+            future.result()
+    assert not any(path.suffix == cache.TMP_SUFFIX for path in
+                   (tmp_path / 'cache').iterdir())
+
+
+def test_cache_best_effort(spec_filename, spec_cache, monkeypatch):
+    expected_df = read.open_spec(spec_filename, dtype=np.float64)
+
+    def fail(*args, **kwargs):
+        raise PermissionError('Read-only file system')
+
+    # A read-only cache can still be read
+    read.open_spec(spec_filename, cache=spec_cache)
+    with monkeypatch.context() as m:
+        m.setattr(cache.os, 'utime', fail)
+        assert spec_cache.get(spec_filename) is not None
+
+    # Failing to cache a file does not fail opening it
+    monkeypatch.setattr(cache.np, 'save', fail)
+    df = read.open_spec(spec_filename, dtype=np.float64, cache=spec_cache)
+    assert df.equals(expected_df)
+    assert spec_cache.get(spec_filename, dtype=np.float64) is None
+    assert not any(path.suffix == cache.TMP_SUFFIX for path in
+                   spec_cache.directory.iterdir())
@@ -0,0 +1,104 @@
+import glob
+import json
+import os
+import shutil
+import pytest
+import gxsmread.catalog as catalog
+import gxsmread.read as read
+
+
+@pytest.fixture
+def archive(tmp_path):
+    directory = tmp_path / 'archive'
+    (directory / 'sub').mkdir(parents=True)
+    for filename in glob.glob('./tests/data/chigwell009*.nc'):
+        shutil.copy(filename, directory)
+    shutil.copy('./tests/data/r19_AuNP_LN158-Xp-ADC0mITunnel.nc',
+                directory / 'sub')
+    return directory
+
+
+@pytest.fixture
+def scan_catalog(tmp_path):
+    with catalog.Catalog(tmp_path / 'catalog.sqlite') as cat:
+        yield cat
+
+
+def test_scan(archive, scan_catalog):
+    assert scan_catalog.scan(archive) == {}
+    paths = scan_catalog.query()
+    assert len(paths) == 13
+
+    row = scan_catalog._connection.execute(
+        f'SELECT * FROM {catalog.TABLE_NAME} WHERE is_main_file').fetchone()
+    row = dict(zip(catalog.COLUMNS, row))
+    assert row['path'] == str(archive / 'chigwell009-M-Xp-Topo.nc')
+    assert (row['file_base'], row['channel'], row['scan_direction']) == \
+        ('chigwell009', 'Topo', 'Xp')
+    assert (row['dimx'], row['dimy']) == (64, 64)
+    assert row['bias'] == -5.0
+    assert json.loads(row['metadata'])['t_start'] == row['t_start']
+
+    # Files in sub-directories are also cataloged
+    assert scan_catalog.query(file_base='r19_AuNP_LN158') == \
+        [str(archive / 'sub' / 'r19_AuNP_LN158-Xp-ADC0mITunnel.nc')]
+
+
+def test_scan_incremental(archive, scan_catalog, monkeypatch):
+    scan_catalog.scan(archive)
+
+    read_paths = []
+    read_row = catalog._read_catalog_row
+
+    def counting_read_row(file_stat):
+        read_paths.append(file_stat[0])
+        return read_row(file_stat)
+    monkeypatch.setattr(catalog, '_read_catalog_row', counting_read_row)
+
+    scan_catalog.scan(archive)
+    assert read_paths == []
+
+    modified = archive / 'chigwell009-Xm-ADC1.nc'
+    stat = os.stat(modified)
+    os.utime(modified, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    removed = archive / 'chigwell009-Xm-ADC2.nc'
+    removed.unlink()
+    (archive / 'bad-Xp-Topo.nc').write_bytes(b'not a netcdf file')
+
+    errors = scan_catalog.scan(archive)
+    assert list(errors) == [str(archive / 'bad-Xp-Topo.nc')]
+    assert sorted(read_paths) == sorted([str(modified),
+                                         str(archive / 'bad-Xp-Topo.nc')])
+    paths = scan_catalog.query()
+    assert str(removed) not in paths and str(modified) in paths
+    assert len(paths) == 12
+
+
+def test_scan_non_recursive(archive, scan_catalog):
+    scan_catalog.scan(archive, recursive=False)
+    assert len(scan_catalog.query()) == 12
+    assert scan_catalog.query(file_base='r19_AuNP_LN158') == []
+
+
+def test_query(archive, scan_catalog):
+    scan_catalog.scan(archive)
+
+    topo = scan_catalog.query(channel='Topo', file_base='chigwell009')
+    assert [os.path.basename(path) for path in topo] == \
+        ['chigwell009-M-Xp-Topo.nc', 'chigwell009-Xm-Topo.nc']
+    assert scan_catalog.query('bias < ?', (-10,)) == []
+    assert scan_catalog.query(
+        "json_extract(metadata, '$.username') = ?", ('Nobody',),
+        file_base='chigwell009', scan_direction='Xp') == \
+        sorted(glob.glob(str(archive / 'chigwell009*Xp*.nc')))
+    with pytest.raises(ValueError):
+        scan_catalog.query(bad_column=0)
+
+
+def test_open_mfdataset(archive, scan_catalog):
+    scan_catalog.scan(archive)
+    kwargs = {'channels_config_path': None, 'use_physical_units': False}
+    cat_ds = scan_catalog.open_mfdataset(
+        filters={'file_base': 'chigwell009'}, **kwargs)
+    ds = read.open_mfdataset(str(archive / 'chigwell009*.nc'), **kwargs)
+    assert cat_ds.identical(ds)
@@ -0,0 +1,166 @@
+import glob
+import json
+import os
+import shutil
+import sys
+import pytest
+import numpy as np
+import xarray as xr
+import gxsmread.convert as convert
+import gxsmread.read as read
+from gxsmread.__main__ import main
+
+
+@pytest.fixture
+def scan_dir(tmp_path):
+    directory = tmp_path / 'scans'
+    directory.mkdir()
+    for filename in glob.glob('./tests/data/*.nc'):
+        shutil.copy(filename, directory)
+    return directory
+
+
+def open_store(store_path, output_format):
+    engine = 'zarr' if output_format == convert.FORMAT_ZARR else None
+    return xr.open_dataset(store_path, engine=engine)
+
+
+@pytest.mark.parametrize('output_format', [convert.FORMAT_ZARR,
+                                           convert.FORMAT_NETCDF])
+def test_convert(scan_dir, tmp_path, output_format):
+    if output_format == convert.FORMAT_ZARR:
+        pytest.importorskip('zarr')
+    output_dir = tmp_path / 'output'
+    statuses = convert.convert(scan_dir, output_dir, output_format,
+                               workers=1, use_physical_units=False,
+                               chunks=(32, 16))
+    assert statuses == {'chigwell009': convert.STATUS_CONVERTED,
+                        'r19_AuNP_LN158': convert.STATUS_CONVERTED}
+
+    store_path = convert.get_store_path(output_dir, 'chigwell009',
+                                        output_format)
+    expected_ds = read.open_mfdataset(str(scan_dir / 'chigwell009*.nc'),
+                                      use_physical_units=False)
+    with open_store(store_path, output_format) as ds:
+        for name in expected_ds.data_vars:
+            xr.testing.assert_identical(ds[name].compute(),
+                                        expected_ds[name].compute())
+        assert ds.attrs['basename'] == \
+            expected_ds.attrs['basename'].rstrip(b'\x00').decode()
+        assert convert.KEY_CONVERSION in ds.attrs
+        if output_format == convert.FORMAT_ZARR:
+            assert ds['Topo-Xp'].encoding['chunks'] == (32, 16)
+            assert ds['Topo-Xp'].encoding['compressor'] is not None
+        else:
+            assert ds['Topo-Xp'].encoding['chunksizes'] == (32, 16)
+            assert ds['Topo-Xp'].encoding['zlib']
+    assert not any(path.name.endswith(convert.TMP_SUFFIX)
+                   for path in output_dir.iterdir())
+
+
+def test_convert_incremental(scan_dir, tmp_path):
+    output_dir = tmp_path / 'output'
+    kwargs = {'output_format': convert.FORMAT_NETCDF, 'workers': 1,
+              'use_physical_units': False}
+    convert.convert(scan_dir, output_dir, **kwargs)
+
+    statuses = convert.convert(scan_dir, output_dir, **kwargs)
+    assert set(statuses.values()) == {convert.STATUS_UP_TO_DATE}
+
+    # Modified source file
+    modified = scan_dir / 'chigwell009-Xm-ADC1.nc'
+    stat = os.stat(modified)
+    os.utime(modified, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    statuses = convert.convert(scan_dir, output_dir, **kwargs)
+    assert statuses == {'chigwell009': convert.STATUS_CONVERTED,
+                        'r19_AuNP_LN158': convert.STATUS_UP_TO_DATE}
+
+    # Changed options
+    statuses = convert.convert(scan_dir, output_dir, dtype=np.float64,
+                               **kwargs)
+    assert set(statuses.values()) == {convert.STATUS_CONVERTED}
+    statuses = convert.convert(scan_dir, output_dir, dtype=np.float64,
+                               overwrite=True, **kwargs)
+    assert set(statuses.values()) == {convert.STATUS_CONVERTED}
+
+    # Edited channels config
+    config_path = tmp_path / 'channels_config.toml'
+    config_path.write_text('[Topo]\nname = "Topo"\n')
+    kwargs['channels_config_path'] = config_path
+    convert.convert(scan_dir, output_dir, **kwargs)
+    statuses = convert.convert(scan_dir, output_dir, **kwargs)
+    assert set(statuses.values()) == {convert.STATUS_UP_TO_DATE}
+    config_path.write_text('[Topo]\nname = "Height"\n')
+    statuses = convert.convert(scan_dir, output_dir, **kwargs)
+    assert set(statuses.values()) == {convert.STATUS_CONVERTED}
+
+
+def test_convert_errors(scan_dir, tmp_path, monkeypatch):
+    statuses = convert.convert(str(scan_dir / 'chigwell009*.nc'),
+                               tmp_path / 'output', convert.FORMAT_NETCDF,
+                               workers=1)
+    assert isinstance(statuses['chigwell009'], KeyError)
+    with pytest.raises(ValueError):
+        convert.convert(scan_dir, tmp_path / 'output', 'hdf4')
+
+    monkeypatch.setitem(sys.modules, 'numcodecs', None)
+    with pytest.raises(ImportError, match="'zarr' optional dependencies"):
+        convert.convert(scan_dir, tmp_path / 'output', convert.FORMAT_ZARR)
+
+
+def test_group_scan_sets():
+    paths = ['/data/day2/scan001-Xp-Topo.nc', '/data/day1/scan001-Xp-Topo.nc',
+             '/data/day1/scan001-M-Xp-Topo.nc', '/data/day1/notes.nc']
+    assert convert.group_scan_sets(paths) == {
+        os.path.join('day1', 'scan001'): ['/data/day1/scan001-M-Xp-Topo.nc',
+                                          '/data/day1/scan001-Xp-Topo.nc'],
+        os.path.join('day2', 'scan001'): ['/data/day2/scan001-Xp-Topo.nc']}
+    assert convert.group_scan_sets(paths[1:3]) == \
+        {'scan001': ['/data/day1/scan001-M-Xp-Topo.nc',
+                     '/data/day1/scan001-Xp-Topo.nc']}
+    assert convert.group_scan_sets([]) == {}
+
+
+def test_sanitize_attrs():
+    attrs = convert.sanitize_attrs({'name': b'Bias\x00\x00', 'flag': True,
+                                    'values': [[1.0, 2.0], [3.0, 4.0]],
+                                    'list': [1, 2], 'val': 2.0})
+    assert attrs == {'name': 'Bias', 'flag': 1, 'list': [1, 2], 'val': 2.0,
+                     'values': json.dumps([[1.0, 2.0], [3.0, 4.0]])}
+
+
+def test_main(scan_dir, tmp_path, capsys):
+    output_dir = tmp_path / 'output'
+    args = ['convert', str(scan_dir), '-o', str(output_dir), '--raw',
+            '-f', convert.FORMAT_NETCDF, '-j', '1']
+    assert main(args) == 0
+    assert 'chigwell009: converted' in capsys.readouterr().out
+    assert main(args) == 0
+    assert 'chigwell009: up to date' in capsys.readouterr().out
+
+    # Without --raw, there are no conversion factors for the ADC channels
+    args = ['convert', str(scan_dir), '-o', str(output_dir),
+            '-f', convert.FORMAT_NETCDF, '-j', '1']
+    assert main(args) == 1
+    assert 'KeyError' in capsys.readouterr().err
+
+
+def test_main_directories(tmp_path, capsys):
+    # Two sessions holding scans with the same file_base
+    output_dir = tmp_path / 'output'
+    directories = []
+    for session in ['session1', 'session2']:
+        directory = tmp_path / session
+        directory.mkdir()
+        shutil.copy('./tests/data/r19_AuNP_LN158-Xp-ADC0mITunnel.nc',
+                    directory)
+        directories.append(str(directory))
+    args = ['convert', *directories, '-o', str(output_dir), '--raw',
+            '-f', convert.FORMAT_NETCDF, '-j', '1']
+    assert main(args) == 0
+    out = capsys.readouterr().out
+    for session in ['session1', 'session2']:
+        scan_set = os.path.join(session, 'r19_AuNP_LN158')
+        assert f'{scan_set}: converted' in out
+        assert convert.get_store_path(output_dir, scan_set,
+                                      convert.FORMAT_NETCDF).exists()
@@ -1,3 +1,4 @@
+import pytest
 import gxsmread.filename as fn
 
 
@@ -22,3 +23,30 @@ def test_non_main_file():
     assert fn.get_unique_channel_name(file_attribs.channel,
                                       file_attribs.scan_direction) == \
            "ADC0mITunnel-Xm"
+
+
+def test_group_by_file_base():
+    filenames = ["scan2-Xp-Topo.nc", "scan1-Xm-Topo.nc", "scan1-M-Xp-Topo.nc",
+                 "scan2-M-Xm-ADC1.nc"]
+    groups = fn.group_by_file_base(filenames)
+    assert groups == {"scan1": ["scan1-M-Xp-Topo.nc", "scan1-Xm-Topo.nc"],
+                      "scan2": ["scan2-M-Xm-ADC1.nc", "scan2-Xp-Topo.nc"]}
+    assert list(groups) == ["scan1", "scan2"]
+
+    errors = {}
+    groups = fn.group_by_file_base(filenames + ["notes.nc", "a-b.nc"], errors)
+    assert list(groups) == ["scan1", "scan2"]
+    assert list(errors) == ["a-b.nc", "notes.nc"]
+
+
+def test_parse_non_gxsm_filename():
+    for str in ["notes.nc", "scan-Xp.nc", "scan-X-Xp-Topo.nc",
+                "scan-M-Xp-Topo-extra.nc"]:
+        with pytest.raises(ValueError):
+            fn.parse_gxsm_filename(str)
+
+
+def test_format_gxsm_filename():
+    for str in ["r19_AuNP_LN048-M-Xp-Topo.nc",
+                "r19_AuNP_LN048-Xm-ADC0mITunnel.nc"]:
+        assert fn.format_gxsm_filename(fn.parse_gxsm_filename(str)) == str
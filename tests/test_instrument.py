@@ -0,0 +1,105 @@
+import os
+import tracemalloc
+import pytest
+import numpy as np
+import gxsmread.instrument as instrument
+import gxsmread.read as read
+
+
+FILENAME = './tests/data/chigwell009-M-Xp-Topo.nc'
+SPEC_FILENAME = './tests/data/test007-VP003-VP.vpdata'
+PREPROCESS_STAGES = [instrument.STAGE_LOAD_METADATA,
+                     instrument.STAGE_CLEAN_FLOATFIELD,
+                     instrument.STAGE_CLEAN_KEPT_COORDS,
+                     instrument.STAGE_CONVERT_FLOATFIELD,
+                     instrument.STAGE_CLEAN_UP_METADATA,
+                     instrument.STAGE_PREPROCESS]
+
+
+def test_stage_disabled():
+    assert not instrument.is_active()
+    with instrument.stage('stage', FILENAME) as record:
+        assert record is None
+
+
+def test_stage():
+    records = []
+    with instrument.profile(callback=records.append) as profiler:
+        assert instrument.is_active()
+        with instrument.stage('outer'):
+            with instrument.stage('read', FILENAME) as record:
+                with open(FILENAME, 'rb') as file:
+                    file.read()
+            with instrument.stage('alloc'):
+                data = np.ones(2**20, dtype=np.uint8)
+                del data
+    assert not instrument.is_active()
+    assert not tracemalloc.is_tracing()
+
+    assert records == profiler.records
+    assert [(r.stage, r.filename, r.depth) for r in records] == \
+        [('read', os.path.abspath(FILENAME), 1), ('alloc', None, 1),
+         ('outer', None, 0)]
+    assert record is records[0]
+    read_record, alloc_record, outer_record = records
+    if read_record.bytes_read is not None:  # Linux only
+        assert read_record.bytes_read == os.path.getsize(FILENAME)
+        assert alloc_record.bytes_read == 0
+        assert outer_record.bytes_read == read_record.bytes_read
+    assert alloc_record.peak_memory >= 2**20
+    assert outer_record.peak_memory >= alloc_record.peak_memory
+    assert outer_record.wall_time >= (read_record.wall_time +
+                                      alloc_record.wall_time)
+
+
+def test_profile_no_memory():
+    with instrument.profile(trace_memory=False) as profiler:
+        with instrument.stage('stage'):
+            pass
+    assert profiler.records[0].peak_memory is None
+    assert not tracemalloc.is_tracing()
+
+
+def test_profile_nested():
+    with instrument.profile():
+        with pytest.raises(RuntimeError):
+            with instrument.profile():
+                pass
+    assert not instrument.is_active()
+
+
+def test_profile_open_dataset():
+    with instrument.profile() as profiler:
+        read.open_dataset(FILENAME, use_physical_units=False)
+
+    records = profiler.records
+    assert [r.stage for r in records] == \
+        [instrument.STAGE_OPEN] + PREPROCESS_STAGES
+    assert {r.filename for r in records} == {os.path.abspath(FILENAME)}
+    assert records[-1].wall_time >= sum(r.wall_time for r in records[1:-1])
+
+
+def test_profile_open_mfdataset_report():
+    paths = './tests/data/chigwell009*.nc'
+    with instrument.profile(trace_memory=False) as profiler:
+        read.open_mfdataset(paths, use_physical_units=False, fast_merge=True)
+
+    report = profiler.report()
+    assert set(report.index) == {instrument.STAGE_OPEN,
+                                 instrument.STAGE_MERGE,
+                                 instrument.STAGE_OPEN_MFDATASET,
+                                 *PREPROCESS_STAGES}
+    assert report.loc[instrument.STAGE_OPEN, 'calls'] == 12
+    assert report.loc[instrument.STAGE_PREPROCESS, 'files'] == 12
+    # Only the main file's metadata is loaded and simplified
+    assert report.loc[instrument.STAGE_LOAD_METADATA, 'calls'] == 1
+    assert report.loc[instrument.STAGE_CLEAN_UP_METADATA, 'calls'] == 1
+    assert report.loc[instrument.STAGE_MERGE, 'calls'] == 1
+
+
+def test_profile_open_spec():
+    with instrument.profile() as profiler:
+        read.open_spec(SPEC_FILENAME)
+    assert [r.stage for r in profiler.records] == \
+        [instrument.STAGE_SPEC_HEADER, instrument.STAGE_SPEC_DATA,
+         instrument.STAGE_SPEC_DATAFRAME]
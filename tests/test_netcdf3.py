@@ -0,0 +1,204 @@
+import dataclasses
+import io
+import glob
+import netCDF4
+import pytest
+import numpy as np
+import xarray as xr
+import gxsmread.netcdf3 as netcdf3
+import gxsmread.utils as utils
+import gxsmread.preprocess as pp
+
+
+NC_FILES = sorted(glob.glob('./tests/data/*.nc'))
+
+
+def open_raw_dataset(filename: str) -> xr.Dataset:
+    return xr.open_dataset(filename, decode_cf=False, mask_and_scale=False,
+                           decode_times=False)
+
+
+def assert_values_equal(val, expected_val):
+    # NaN-aware, for numeric values only
+    equal_nan = np.asarray(expected_val).dtype.kind == 'f'
+    assert np.array_equal(val, expected_val, equal_nan=equal_nan)
+
+
+def assert_attrs_equal(attrs: dict, expected_attrs: dict):
+    assert attrs.keys() == expected_attrs.keys()
+    for key, val in expected_attrs.items():
+        assert_values_equal(attrs[key], val)
+
+
+@pytest.mark.parametrize('filename', NC_FILES)
+def test_read_header(filename):
+    header = netcdf3.read_header(filename)
+    ds = open_raw_dataset(filename)
+
+    assert header.version == netcdf3.VERSION_CLASSIC
+    assert header.numrecs == 0
+    assert_attrs_equal(header.attributes, ds.attrs)
+    assert header.variables.keys() == ds.variables.keys()
+    for name, var in header.variables.items():
+        assert var.dimensions == ds[name].dims
+        assert var.shape == ds[name].shape
+        assert var.dtype.newbyteorder('=') == ds[name].dtype
+        assert not var.is_record
+        assert_attrs_equal(var.attributes, ds[name].attrs)
+
+
+@pytest.mark.parametrize('filename', NC_FILES[:2])
+def test_read_variable(filename):
+    ds = open_raw_dataset(filename)
+    with open(filename, 'rb') as f:
+        header = netcdf3.read_header(f)
+        for name in ['FloatField', 'dz', 'rangex']:
+            data = netcdf3.read_variable(f, header.variables[name])
+            assert_values_equal(data, ds[name].values)
+
+
+@pytest.mark.parametrize('filename', NC_FILES[:2])
+def test_memmap_variable(filename):
+    ds = open_raw_dataset(filename)
+    header = netcdf3.read_header(filename)
+    data = netcdf3.memmap_variable(filename, header.variables['FloatField'])
+    assert isinstance(data, np.memmap)
+    assert not data.flags.writeable
+    assert_values_equal(data, ds['FloatField'].values)
+
+    record_var = dataclasses.replace(header.variables['FloatField'],
+                                     is_record=True)
+    with pytest.raises(ValueError):
+        netcdf3.memmap_variable(filename, record_var)
+
+
+@pytest.mark.parametrize('filename', NC_FILES)
+def test_read_metadata(filename):
+    metadata = netcdf3.read_metadata(filename, max_size=1024)
+    header = netcdf3.read_header(filename)
+    ds = open_raw_dataset(filename)
+
+    assert metadata[netcdf3.KEY_DIMENSIONS] == header.dimensions
+    assert_attrs_equal(metadata[netcdf3.KEY_ATTRIBUTES], ds.attrs)
+
+    variables = metadata[netcdf3.KEY_VARIABLES]
+    assert 'FloatField' not in variables
+    assert variables.keys() == {name for name, var in header.variables.items()
+                                if var.nbytes <= 1024}
+    for name, val in variables.items():
+        expected_val = utils.extract_numpy_data(ds[name].values)
+        assert type(val) is type(expected_val)
+        assert_values_equal(val, expected_val)
+
+
+@pytest.mark.parametrize('filename', NC_FILES[:2])
+def test_read_metadata_drop_variables(filename):
+    variables = netcdf3.read_metadata(filename)[netcdf3.KEY_VARIABLES]
+    assert pp.GXSM_DATA_VAR in netcdf3.DEFAULT_DROP_VARIABLES
+    assert pp.GXSM_DATA_VAR not in variables
+    assert pp.GXSM_DATA_DIFFERENTIAL in variables
+
+    variables = netcdf3.read_metadata(
+        filename, drop_variables=(pp.GXSM_DATA_DIFFERENTIAL,))[
+            netcdf3.KEY_VARIABLES]
+    assert pp.GXSM_DATA_VAR in variables
+    assert pp.GXSM_DATA_DIFFERENTIAL not in variables
+
+
+def test_read_metadata_buffer():
+    filename = NC_FILES[0]
+    variables = netcdf3.read_metadata(filename)[netcdf3.KEY_VARIABLES]
+    with open(filename, 'rb') as file:
+        contents = file.read()
+        # Read from the start, wherever the file is positioned
+        assert_attrs_equal(
+            netcdf3.read_metadata(file)[netcdf3.KEY_VARIABLES], variables)
+    assert_attrs_equal(
+        netcdf3.read_metadata(contents)[netcdf3.KEY_VARIABLES], variables)
+    assert netcdf3.read_header(contents).variables.keys() == \
+        netcdf3.read_header(filename).variables.keys()
+
+
+def test_read_header_bad_file():
+    with pytest.raises(ValueError):
+        netcdf3.read_header(io.BytesIO(b'HDF\x01' + bytes(8)))
+    with pytest.raises(ValueError):
+        netcdf3.read_header(io.BytesIO(b'CDF\x01' + bytes(2)))
+
+
+@pytest.mark.parametrize('version, nc_format', [
+    (netcdf3.VERSION_CLASSIC, 'NETCDF3_CLASSIC'),
+    (netcdf3.VERSION_64BIT_OFFSET, 'NETCDF3_64BIT_OFFSET'),
+    (netcdf3.VERSION_64BIT_DATA, 'NETCDF3_64BIT_DATA')])
+def test_read_header_formats(tmp_path, version, nc_format):
+    filename = tmp_path / 'test.nc'
+    # The unsigned and 64-bit types are CDF-5 only
+    dtypes = ['i1', 'i2', 'i4', 'f4', 'f8']
+    if version == netcdf3.VERSION_64BIT_DATA:
+        dtypes += ['u1', 'u2', 'u4', 'i8', 'u8']
+    with netCDF4.Dataset(filename, 'w', format=nc_format) as nc:
+        nc.createDimension('time', None)
+        nc.createDimension('x', 3)
+        nc.title = 'Test \u00e5'
+        for dtype in dtypes:
+            var = nc.createVariable(f'var_{dtype}', dtype, ('x',))
+            var[:] = np.arange(3)
+            var.scalar = np.array(7, dtype)
+            var.array = np.arange(1, 4, dtype=dtype)
+            scalar = nc.createVariable(f'scalar_{dtype}', dtype, ())
+            scalar.assignValue(5)
+        for name in ['record', 'other_record']:
+            record = nc.createVariable(name, 'f8', ('time', 'x'))
+            record[:] = np.ones((2, 3))
+
+    header = netcdf3.read_header(filename)
+    assert header.version == version
+    assert header.numrecs == 2
+    assert header.dimensions == {'time': 2, 'x': 3}
+    assert header.attributes == {'title': 'Test \u00e5'}
+    assert header.record_size == 2 * 3 * 8
+    assert header.variables['record'].is_record
+    assert header.variables['record'].shape == (2, 3)
+
+    ds = open_raw_dataset(filename)
+    with open(filename, 'rb') as file:
+        for dtype in dtypes:
+            var = header.variables[f'var_{dtype}']
+            assert var.dtype.newbyteorder('=') == np.dtype(dtype)
+            assert_attrs_equal(var.attributes, ds[f'var_{dtype}'].attrs)
+            assert type(var.attributes['scalar']) is np.dtype(dtype).type
+            assert_values_equal(netcdf3.read_variable(file, var),
+                                ds[f'var_{dtype}'].values)
+        assert_values_equal(
+            netcdf3.read_variable(file, header.variables['other_record']),
+            ds['other_record'].values)
+
+    variables = netcdf3.read_metadata(filename)[netcdf3.KEY_VARIABLES]
+    assert 'record' not in variables
+    for dtype in dtypes:
+        expected_val = utils.extract_numpy_data(ds[f'scalar_{dtype}'].values)
+        assert variables[f'scalar_{dtype}'] == expected_val
+        assert type(variables[f'scalar_{dtype}']) is type(expected_val)
+
+
+def test_read_header_small_reads(monkeypatch):
+    # Headers larger than the first read are read in several blocks
+    filename = NC_FILES[0]
+    expected_header = netcdf3.read_header(filename)
+    expected_metadata = netcdf3.read_metadata(filename)
+    monkeypatch.setattr(netcdf3, 'HEADER_READ_SIZE', 100)
+    header = netcdf3.read_header(filename)
+    assert header.variables.keys() == expected_header.variables.keys()
+    for name, var in header.variables.items():
+        assert_attrs_equal(var.attributes,
+                           expected_header.variables[name].attributes)
+    assert_attrs_equal(netcdf3.read_metadata(filename)[netcdf3.KEY_VARIABLES],
+                       expected_metadata[netcdf3.KEY_VARIABLES])
+
+    with open(filename, 'rb') as file:
+        # The header, up to the data of the first variable
+        contents = file.read(min(var.begin for var in
+                                 expected_header.variables.values()))
+    for size in [10, 1000, len(contents) // 2, len(contents) - 4]:
+        with pytest.raises(ValueError, match='end of NetCDF3 header'):
+            netcdf3.read_header(contents[:size])
@@ -1,4 +1,6 @@
+import glob
 import pytest
+import numpy as np
 import xarray as xr
 import gxsmread.preprocess as pp
 import gxsmread.channel_config as cc
@@ -6,13 +8,17 @@ import gxsmread.channel_config as cc
 
 def assert_floatfield_conversion(old_ds: xr.DataArray,
                                  new_ds: xr.DataArray,
-                                 config: cc.GxsmChannelConfig):
+                                 config: cc.GxsmChannelConfig,
+                                 dtype: np.dtype = pp.DEFAULT_DTYPE):
+    # The conversion applies dz * conversion_factor as a single scale,
+    # cast to dtype.
+    scale = old_ds[pp.GXSM_DATA_DIFFERENTIAL].item() * config.conversion_factor
+    expected_data = (old_ds[pp.GXSM_DATA_VAR].values.astype(dtype) *
+                     np.dtype(dtype).type(scale))
     assert config.name in new_ds
     assert new_ds[config.name].attrs['units'] == config.units
-    assert (new_ds[config.name].values ==
-            (old_ds[pp.GXSM_DATA_VAR] *
-             old_ds[pp.GXSM_DATA_DIFFERENTIAL] *
-             config.conversion_factor).values).all()
+    assert new_ds[config.name].dtype == dtype
+    assert (new_ds[config.name].values == expected_data.squeeze()).all()
     with pytest.raises(KeyError):
         new_ds[pp.GXSM_DATA_VAR]
     with pytest.raises(KeyError):
@@ -84,6 +90,46 @@ class TestPreProcess:
         new_ds = pp.convert_floatfield(ds, cc_physical)
         assert_floatfield_conversion(ds, new_ds, cc_physical)
 
+    def test_convert_floatfield_dtype(self):
+        ds = pp.clean_floatfield(self.ds.copy(deep=True))
+        ds = pp.clean_kept_coords(ds)
+
+        cc_physical = cc.GxsmChannelConfig(name='Topo-Xp',
+                                           conversion_factor=2.0,
+                                           units='Angstrom')
+        new_ds = pp.convert_floatfield(ds.copy(deep=True), cc_physical,
+                                       dtype=np.float64)
+        assert_floatfield_conversion(ds, new_ds, cc_physical, np.float64)
+        assert np.allclose(new_ds[cc_physical.name].values,
+                           (ds[pp.GXSM_DATA_VAR] *
+                            ds[pp.GXSM_DATA_DIFFERENTIAL] *
+                            cc_physical.conversion_factor).values)
+
+    def test_convert_floatfield_inplace(self):
+        ds = pp.clean_floatfield(self.ds.copy(deep=True))
+        ds = pp.clean_kept_coords(ds)
+        old_ds = ds.copy(deep=True)
+
+        cc_physical = cc.GxsmChannelConfig(name='Topo-Xp',
+                                           conversion_factor=2.0,
+                                           units='Angstrom')
+        floatfield_data = ds[pp.GXSM_DATA_VAR].values
+        new_ds = pp.convert_floatfield(ds, cc_physical, inplace=True)
+        assert_floatfield_conversion(old_ds, new_ds, cc_physical)
+        assert new_ds[cc_physical.name].values is floatfield_data
+
+    def test_convert_floatfield_lazy(self):
+        ds = pp.clean_floatfield(self.ds.copy(deep=True))
+        ds = pp.clean_kept_coords(ds).chunk()
+
+        cc_physical = cc.GxsmChannelConfig(name='Topo-Xp',
+                                           conversion_factor=2.0,
+                                           units='Angstrom')
+        new_ds = pp.convert_floatfield(ds, cc_physical)
+        assert new_ds[cc_physical.name].chunks is not None
+        assert_floatfield_conversion(ds.compute(), new_ds.compute(),
+                                     cc_physical)
+
     def test_clean_up_metadata_default_data_vars(self):
         ds = pp.clean_floatfield(self.ds.copy(deep=True))
         ds = pp.clean_kept_coords(ds)
@@ -102,5 +148,64 @@ class TestPreProcess:
 
         assert_cleaned_metadata(ds, new_ds, kept_vars)
 
+    def test_preprocess_channel(self):
+        new_ds = pp.preprocess_channel(xr.open_dataset(self.filename),
+                                       use_physical_units=False,
+                                       allow_convert_from_metadata=False,
+                                       channels_config_dict=None)
+        full_ds = pp.preprocess(xr.open_dataset(self.filename),
+                                use_physical_units=False,
+                                allow_convert_from_metadata=False,
+                                simplify_metadata=True,
+                                channels_config_dict=None)
+        assert list(new_ds.data_vars) == ['Topo-Xp']
+        assert new_ds.attrs == {}
+        assert new_ds['Topo-Xp'].identical(full_ds['Topo-Xp'])
+
+    def test_preprocess_keeps_input_data(self):
+        ds = xr.open_dataset(self.filename).load()
+        orig_ds = ds.copy()  # Shallow: shares the FloatField array
+        expected_ds = ds.copy(deep=True)
+        for func in [pp.preprocess, pp.preprocess_channel]:
+            kwargs = {'simplify_metadata': True} \
+                if func is pp.preprocess else {}
+            func(ds.copy(), use_physical_units=False,
+                 allow_convert_from_metadata=False,
+                 channels_config_dict=None, **kwargs)
+            xr.testing.assert_identical(orig_ds, expected_ds)
+
+    def test_load_metadata(self, monkeypatch, tmp_path):
+        with xr.open_dataset(self.filename,
+                             drop_variables=[pp.GXSM_DATA_VAR]) as ref_ds:
+            expected_ds = ref_ds.load()
+
+        def assert_loaded(ds):
+            assert ds[pp.GXSM_DATA_VAR].chunks is not None
+            for name, var in expected_ds.variables.items():
+                assert ds[name].chunks is None
+                assert ds[name].variable.identical(var)
+
+        # NetCDF3 files are read from their header, without xarray.
+        lazy_ds = xr.open_dataset(self.filename, chunks={})
+        with monkeypatch.context() as m:
+            m.setattr(pp.xarray, 'open_dataset', None)
+            assert_loaded(pp.load_metadata(lazy_ds, self.filename))
+
+        netcdf4_filename = tmp_path / 'chigwell009-M-Xp-Topo.nc'
+        xr.open_dataset(self.filename).to_netcdf(netcdf4_filename,
+                                                 format='NETCDF4')
+        lazy_ds = xr.open_dataset(netcdf4_filename, chunks={})
+        assert_loaded(pp.load_metadata(lazy_ds, netcdf4_filename))
+
+        lazy_ds = xr.open_dataset(self.filename, chunks={})
+        assert_loaded(pp.load_metadata(lazy_ds, None))
+
+    def test_get_scan_fingerprint(self):
+        fingerprint = pp.get_scan_fingerprint(self.filename)
+        for filename in glob.glob("./tests/data/chigwell009*.nc"):
+            assert pp.get_scan_fingerprint(filename) == fingerprint
+        assert pp.get_scan_fingerprint(
+            "./tests/data/r19_AuNP_LN158-Xp-ADC0mITunnel.nc") != fingerprint
+
 #    def test_is_gxsm_file(self):
 #        # TODO: Need a non-gxsm nc file..
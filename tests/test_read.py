@@ -1,13 +1,21 @@
 import pytest
+import dask
 import numpy as np
+import pandas as pd
 import xarray as xr
 import glob
+import io
+import os
+import shutil
+from datetime import datetime
 import gxsmread.read as read
 import gxsmread.spec as spec
 import gxsmread.channel_config as cc
 import gxsmread.preprocess as pp
 import gxsmread.filename as fn
+import gxsmread.synthetic as synthetic
 from . import test_preprocess as tpp
+from .helpers import CountingScheduler
 
 
 def flip_x_axis_floatfield(ds: xr.Dataset):
@@ -94,6 +102,36 @@ def first_row_data():
             0.000000000000e+00]
 
 
+def test_open_directory(tmp_path):
+    for filename in glob.glob("./tests/data/*.nc"):
+        shutil.copy(filename, tmp_path)
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "notes.txt").write_text("not a scan")
+    (tmp_path / "notes.nc").write_text("not a gxsm scan")
+    kwargs = {'channels_config_path': None, 'use_physical_units': False}
+
+    with read.open_directory(tmp_path, workers=2, **kwargs) as scan_sets:
+        assert list(scan_sets) == ['chigwell009', 'r19_AuNP_LN158']
+        assert list(scan_sets.errors) == [str(tmp_path / "notes.nc")]
+        assert isinstance(scan_sets.errors[str(tmp_path / "notes.nc")],
+                          ValueError)
+        assert len(scan_sets.groups['chigwell009']) == 12
+        # Nothing is opened until accessed
+        assert scan_sets._futures == {}
+
+        ds = scan_sets['chigwell009']
+        assert list(scan_sets._futures) == ['chigwell009']
+        assert scan_sets['chigwell009'] is ds
+        assert ds.identical(read.open_mfdataset(
+            str(tmp_path / "chigwell009*.nc"), **kwargs))
+
+        scan_sets.prefetch()
+        assert list(scan_sets._futures) == list(scan_sets)
+        assert 'ADC0mITunnel-Xp' in scan_sets['r19_AuNP_LN158']
+        with pytest.raises(KeyError):
+            scan_sets['missing']
+
+
 def test_open_spec(units_dict, names, first_row_data):
     spec_filename = './tests/data/test007-VP003-VP.vpdata'
     spec_df = read.open_spec(spec_filename)
@@ -101,3 +139,473 @@ def test_open_spec(units_dict, names, first_row_data):
     assert (spec_df.columns.to_numpy() == names).all()
     assert spec_df.attrs[spec.KEY_UNITS] == units_dict
     assert np.allclose(spec_df[0:1].to_numpy(), np.array(first_row_data))
+
+
+def test_open_spec_outputs(names, first_row_data):
+    spec_filename = './tests/data/test007-VP003-VP.vpdata'
+    spec_df = read.open_spec(spec_filename)
+    unique_names = spec.get_unique_names(names)
+
+    array, metadata = read.open_spec(spec_filename,
+                                     output=read.SPEC_OUTPUT_STRUCTURED)
+    assert list(array.dtype.names) == unique_names
+    assert array.shape == (len(spec_df),)
+    assert np.allclose(list(array[0]), first_row_data)
+    assert metadata.names == unique_names
+    assert metadata.units['ADC0-I_1'] == 'nA'
+    assert {k: v for k, v in metadata.to_attrs().items()
+            if k != spec.KEY_UNITS} == \
+        {k: v for k, v in spec_df.attrs.items() if k != spec.KEY_UNITS}
+
+    ds, metadata = read.open_spec(spec_filename, usecols=[0, 1, 5],
+                                  output=read.SPEC_OUTPUT_XARRAY)
+    assert list(ds.data_vars) == ['ADC0-I', 'Zmon']
+    assert (ds[read.SPEC_DIM_ROW].values == spec_df['Index'].values).all()
+    assert ds['ADC0-I'].attrs['units'] == 'nA'
+    assert metadata.names == ['Index', 'ADC0-I', 'Zmon']
+    # The data variables view the same parsed array
+    assert np.may_share_memory(ds['ADC0-I'].values, ds['Zmon'].values)
+
+    with pytest.raises(ValueError):
+        read.open_spec(spec_filename, output='list')
+
+
+def test_iter_spec():
+    spec_filename = './tests/data/test007-VP003-VP.vpdata'
+    spec_df = read.open_spec(spec_filename)
+    chunks = list(read.iter_spec(spec_filename, chunk_size=40))
+
+    assert [len(chunk) for chunk in chunks] == [40, 40, 20]
+    assert chunks[-1].index[0] == 80
+    for chunk in chunks:
+        assert chunk.attrs[spec.KEY_UNITS] == spec_df.attrs[spec.KEY_UNITS]
+        assert chunk.attrs[spec.KEY_DATE] == spec_df.attrs[spec.KEY_DATE]
+    assert (pd.concat(chunks).to_numpy() == spec_df.to_numpy()).all()
+
+
+def test_open_spec_many(tmp_path):
+    spec_filename = './tests/data/test007-VP003-VP.vpdata'
+    spec_df = read.open_spec(spec_filename)
+
+    paths = []
+    for i in range(2):
+        path = tmp_path / f'test007-VP00{i}-VP.vpdata'
+        shutil.copy(spec_filename, path)
+        paths.append(str(path))
+    bad_path = tmp_path / 'test007-VP009-VP.vpdata'
+    bad_path.write_text('not a spec file\n')
+
+    df = read.open_spec_many(str(tmp_path / '*.vpdata'), workers=2)
+
+    assert list(df.index.get_level_values('file').unique()) == paths
+    assert len(df) == 2 * len(spec_df)
+    assert list(df.attrs[spec.KEY_ERRORS]) == [str(bad_path)]
+    names = list(spec_df.columns)
+    assert df.attrs[spec.KEY_UNITS] == dict(zip(
+        spec.get_unique_names(names),
+        [spec_df.attrs[spec.KEY_UNITS][name] for name in names]))
+    for path in paths:
+        file_df = df.loc[path]
+        assert (file_df.iloc[:, :spec_df.shape[1]].to_numpy() ==
+                spec_df.to_numpy()).all()
+        for key in [spec.KEY_PROBE_POS_X, spec.KEY_PROBE_POS_Y,
+                    spec.KEY_DATE, spec.KEY_FILENAME]:
+            assert (file_df[key] == spec_df.attrs[key]).all()
+
+
+def test_open_spec_many_mixed_channels(tmp_path):
+    spec_filename = './tests/data/test007-VP003-VP.vpdata'
+    spec_df = read.open_spec(spec_filename)
+    with open(spec_filename, 'r') as file:
+        text = file.read()
+
+    paths = []
+    for i in range(3):
+        path = tmp_path / f'test007-VP00{i}-VP.vpdata'
+        # The middle file has a renamed channel (so a different group)
+        path.write_text(text if i != 1 else
+                        text.replace('"ZS (', '"ZS2 (', 1))
+        paths.append(str(path))
+
+    df = read.open_spec_many(paths, workers=1)
+
+    assert df.attrs[spec.KEY_ERRORS] == {}
+    assert list(df.index.get_level_values('file').unique()) == paths
+    assert len(df) == 3 * len(spec_df)
+    assert {'ADC0-I', 'ADC0-I_1', 'ZS', 'ZS2'} <= set(df.columns)
+    assert df.loc[paths[1], 'ZS'].isna().all()
+    assert df.loc[paths[1], 'ZS2'].notna().all()
+    assert df.loc[paths[2], 'ZS2'].isna().all()
+    assert (df.loc[paths[0], 'ADC0-I_1'].to_numpy() ==
+            spec_df.iloc[:, 3].to_numpy()).all()
+
+
+def test_open_spec_metadata():
+    spec_filename = './tests/data/test007-VP003-VP.vpdata'
+    spec_df = read.open_spec(spec_filename)
+    metadata = read.open_spec_metadata(spec_filename)
+
+    assert metadata == {k: v for k, v in spec_df.attrs.items()
+                        if k != spec.KEY_UNITS}
+
+
+def test_open_spec_metadata_typed():
+    spec_filename = './tests/data/test007-VP003-VP.vpdata'
+    metadata = read.open_spec_metadata(spec_filename)
+    typed_metadata = read.open_spec_metadata(spec_filename, typed=True)
+
+    assert typed_metadata.keys() == metadata.keys()
+    assert typed_metadata['Probe Data Number'] == {'N': 100}
+    assert typed_metadata[spec.KEY_PROBE_POS_X] == \
+        float(metadata[spec.KEY_PROBE_POS_X])
+    assert typed_metadata[spec.KEY_PROBE_POS_Y] == \
+        float(metadata[spec.KEY_PROBE_POS_Y])
+    assert isinstance(typed_metadata[spec.KEY_DATE], datetime)
+    assert typed_metadata[spec.KEY_DATE].strftime('%H:%M:%S %Y') in \
+        metadata[spec.KEY_DATE]
+    for key in [spec.KEY_PROBE_POS_UNITS, spec.KEY_FILENAME]:
+        assert typed_metadata[key] == metadata[key]
+
+
+def write_spec_at_position(src: str, dst: str, x: float, y: float,
+                           num_rows: int | None = None):
+    """Copy spec file, changing its probe position and (opt.) its rows."""
+    with open(src, 'r') as file:
+        lines = file.readlines()
+    pos_idx = next(i for i, v in enumerate(lines) if
+                   v.startswith('# GXSM-Main-Offset'))
+    lines[pos_idx] = (f'# GXSM-Main-Offset       :: X0={x} Ang  Y0={y} Ang, '
+                      'iX0=5 Pix iX0=5 Pix\n')
+    if num_rows is not None:
+        data_start = next(i for i, v in enumerate(lines) if
+                          v.startswith(spec.DATA_START)) + 2
+        data_end = next(i for i, v in enumerate(lines) if
+                        v.startswith(spec.DATA_END)) - 1
+        del lines[data_start + num_rows:data_end]
+    with open(dst, 'w') as file:
+        file.writelines(lines)
+
+
+def test_open_spec_grid(tmp_path):
+    spec_filename = './tests/data/test007-VP003-VP.vpdata'
+    spec_df = read.open_spec(spec_filename)
+
+    # 2x3 grid, missing (x=2, y=1), with a ragged sweep at (x=1, y=1) and
+    # a duplicate at (x=0, y=0).
+    positions = [(0, 0), (1, 0), (2, 0), (0, 1), (1, 1), (0, 0)]
+    paths = [str(tmp_path / f'grid-VP{i:03d}-VP.vpdata')
+             for i in range(len(positions))]
+    for path, (x, y) in zip(paths, positions):
+        write_spec_at_position(spec_filename, path, x, y,
+                               num_rows=50 if (x, y) == (1, 1) else None)
+    bad_path = str(tmp_path / 'grid-VP999-VP.vpdata')
+    with open(bad_path, 'w') as file:
+        file.write('not a spec file\n')
+
+    memmap_path = tmp_path / 'grid.npy'
+    ds = read.open_spec_grid(paths + [bad_path], workers=2,
+                             memmap_path=memmap_path)
+
+    names = spec.get_unique_names(list(spec_df.columns))
+    assert list(ds.data_vars) == names
+    assert names[3] == 'ADC0-I_1'
+    assert ds['ADC0-I'].dims == (spec.GRID_DIM_Y, spec.GRID_DIM_X,
+                                 spec.GRID_DIM_POINT)
+    assert ds['ADC0-I'].shape == (2, 3, len(spec_df))
+    assert ds['ADC0-I'].attrs['units'] == 'nA'
+    assert list(ds[spec.GRID_DIM_X].values) == [0, 1, 2]
+    assert ds[spec.GRID_DIM_X].attrs['units'] == 'Ang'
+    assert set(ds.attrs[spec.KEY_ERRORS]) == {paths[-1], bad_path}
+
+    full_point = ds.isel({spec.GRID_DIM_X: 0, spec.GRID_DIM_Y: 1})
+    assert full_point[spec.GRID_COORD_PATH].item() == paths[3]
+    assert (np.stack([full_point[name].values for name in names], axis=1) ==
+            spec_df.to_numpy()).all()
+
+    ragged_point = ds['ZS'].isel({spec.GRID_DIM_X: 1, spec.GRID_DIM_Y: 1})
+    assert not np.isnan(ragged_point[:50]).any()
+    assert np.isnan(ragged_point[50:]).all()
+
+    missing_point = ds.isel({spec.GRID_DIM_X: 2, spec.GRID_DIM_Y: 1})
+    assert missing_point[spec.GRID_COORD_PATH].item() == ''
+    assert np.isnan(missing_point['ZS']).all()
+
+    assert np.load(memmap_path, mmap_mode='r').shape == (len(names), 2, 3,
+                                                         len(spec_df))
+
+    # Parsed in worker processes without a memmap_path, or in the calling
+    # process
+    for workers in [2, 1]:
+        other_ds = read.open_spec_grid(paths + [bad_path], workers=workers)
+        xr.testing.assert_equal(other_ds, ds)
+        assert list(other_ds.attrs[spec.KEY_ERRORS]) == \
+            list(ds.attrs[spec.KEY_ERRORS])
+
+    # Sweeps longer than num_points are skipped
+    ds = read.open_spec_grid(paths, workers=2, num_points=len(spec_df) - 1)
+    assert set(ds.attrs[spec.KEY_ERRORS]) == set(paths) - {paths[4]}
+    assert list(ds[spec.GRID_COORD_PATH].values.ravel()) == \
+        ['', '', '', '', paths[4], '']
+    assert np.isnan(ds['ZS'].isel({spec.GRID_DIM_X: 0})).all()
+
+
+def test_open_spec_grid_robust(tmp_path):
+    spec_filename = './tests/data/test007-VP003-VP.vpdata'
+    spec_df = read.open_spec(spec_filename)
+
+    # Jittered 2x2 grid, the last point missing its number of points
+    positions = [(0, 0), (1.01, 0.004), (0.003, 0.99), (0.998, 1.002)]
+    paths = [str(tmp_path / f'grid-VP{i:03d}-VP.vpdata')
+             for i in range(1, len(positions) + 1)]
+    for path, (x, y) in zip(paths, positions):
+        write_spec_at_position(spec_filename, path, x, y)
+    with open(paths[-1], 'r') as file:
+        lines = [line for line in file
+                 if not line.startswith('# Probe Data Number')]
+    with open(paths[-1], 'w') as file:
+        file.writelines(lines)
+    # The first file has a header, but no data table
+    truncated_path = str(tmp_path / 'grid-VP000-VP.vpdata')
+    with open(paths[0], 'r') as file:
+        lines = file.readlines()
+    with open(truncated_path, 'w') as file:
+        file.writelines(lines[:next(i for i, v in enumerate(lines)
+                                    if v.startswith(spec.DATA_START))])
+
+    ds = read.open_spec_grid([truncated_path] + paths, workers=1)
+
+    assert list(ds.attrs[spec.KEY_ERRORS]) == [truncated_path]
+    assert ds['ZS'].shape == (2, 2, len(spec_df))
+    assert np.allclose(ds[spec.GRID_DIM_X].values, [0.0015, 1.004])
+    assert np.allclose(ds[spec.GRID_DIM_Y].values, [0.002, 0.996])
+    assert list(ds[spec.GRID_COORD_PATH].values.ravel()) == paths
+    assert not np.isnan(ds['ZS']).any()
+
+    # An explicit tolerance smaller than the jitter splits the positions
+    ds = read.open_spec_grid(paths, workers=1, position_tolerance=1e-4)
+    assert ds['ZS'].shape == (4, 4, len(spec_df))
+
+
+def test_open_dataset_lazy():
+    filename = "./tests/data/chigwell009-M-Xp-Topo.nc"
+    eager_ds = read.open_dataset(filename)
+
+    scheduler = CountingScheduler()
+    with dask.config.set(scheduler=scheduler):
+        lazy_ds = read.open_dataset(filename, chunks={})
+        assert scheduler.count == 0
+        assert lazy_ds['Topo-Xp'].chunks is not None
+
+        assert lazy_ds.attrs.keys() == eager_ds.attrs.keys()
+        assert (lazy_ds['Topo-Xp'].values == eager_ds['Topo-Xp'].values).all()
+        assert scheduler.count == 1
+
+
+def test_open_dataset_memmap():
+    filename = "./tests/data/chigwell009-M-Xp-Topo.nc"
+    eager_ds = read.open_dataset(filename)
+
+    scheduler = CountingScheduler()
+    with dask.config.set(scheduler=scheduler):
+        memmap_ds = read.open_dataset(filename, memmap=True)
+        assert scheduler.count == 0
+        assert memmap_ds['Topo-Xp'].chunks is not None
+        xr.testing.assert_identical(memmap_ds.compute(), eager_ds)
+
+
+def test_open_mfdataset_lazy():
+    mf_filename = "./tests/data/chigwell009*.nc"
+    expected_ds = read.open_mfdataset(mf_filename,
+                                      use_physical_units=False).compute()
+
+    scheduler = CountingScheduler()
+    with dask.config.set(scheduler=scheduler):
+        lazy_ds = read.open_mfdataset(mf_filename, use_physical_units=False)
+        assert scheduler.count == 0
+        for var in lazy_ds.data_vars:
+            assert lazy_ds[var].chunks is not None
+
+        assert lazy_ds.identical(expected_ds)
+        assert scheduler.count > 0
+
+
+def test_open_mfdataset_fast_merge(tmp_path):
+    mf_filename = "./tests/data/chigwell009*.nc"
+    expected_ds = read.open_mfdataset(mf_filename,
+                                      use_physical_units=False).compute()
+
+    scheduler = CountingScheduler()
+    with dask.config.set(scheduler=scheduler):
+        fast_ds = read.open_mfdataset(mf_filename, use_physical_units=False,
+                                      fast_merge=True)
+        assert scheduler.count == 0
+    assert list(fast_ds.data_vars) == list(expected_ds.data_vars)
+    xr.testing.assert_identical(fast_ds.compute(), expected_ds)
+
+    # The merging options of xarray.open_mfdataset() work with both
+    mf_kwargs = {'compat': 'identical', 'join': 'outer',
+                 'combine_attrs': 'override'}
+    for fast_merge in [False, True]:
+        ds = read.open_mfdataset(mf_filename, use_physical_units=False,
+                                 fast_merge=fast_merge, **mf_kwargs)
+        assert list(ds.data_vars) == list(expected_ds.data_vars)
+
+    # Metadata variables are those of the main file
+    unsimplified_ds = read.open_mfdataset(mf_filename,
+                                          use_physical_units=False,
+                                          simplify_metadata=False,
+                                          fast_merge=True)
+    main_ds = read.open_dataset("./tests/data/chigwell009-M-Xp-Topo.nc",
+                                use_physical_units=False,
+                                simplify_metadata=False)
+    for var in main_ds.data_vars:
+        assert unsimplified_ds[var].identical(main_ds[var])
+
+    # Files from another scan are rejected
+    other_filename = tmp_path / "chigwell009-Xp-ADC0mITunnel.nc"
+    shutil.copy("./tests/data/r19_AuNP_LN158-Xp-ADC0mITunnel.nc",
+                other_filename)
+    with pytest.raises(ValueError, match='same scan'):
+        read.open_mfdataset(sorted(glob.glob(mf_filename)) +
+                            [str(other_filename)],
+                            use_physical_units=False, fast_merge=True)
+
+
+def test_open_series(tmp_path):
+    # Numbers and acquisition times in opposite orders
+    for i in [10, 9, 11]:
+        synthetic.write_scan_set(tmp_path, f'series{i:03d}', 16,
+                                 num_channels=2, t_start=1000 - i, seed=i)
+    paths = str(tmp_path / "*.nc")
+
+    scheduler = CountingScheduler()
+    with dask.config.set(scheduler=scheduler):
+        series_ds = read.open_series(paths, use_physical_units=False)
+        assert scheduler.count == 0
+    assert list(series_ds[read.SERIES_COORD_FILE_BASE].values) == \
+        ['series009', 'series010', 'series011']
+    assert list(series_ds['t_start'].values) == [991, 990, 989]
+    assert 't_start' not in series_ds.attrs
+    assert series_ds.attrs['Creator'] == 'gxsm3'
+    for name in ['Topo-Xp', 'Topo-Xm']:
+        assert series_ds[name].dims == (read.SERIES_DIM_FRAME, 'dimy', 'dimx')
+        assert series_ds[name].chunks[0] == (1, 1, 1)
+
+    frame_ds = read.open_mfdataset(str(tmp_path / "series010*.nc"),
+                                   use_physical_units=False)
+    np.testing.assert_array_equal(series_ds['Topo-Xm'][1].values,
+                                  frame_ds['Topo-Xm'].values)
+
+    time_ds = read.open_series(paths, order_by=read.SERIES_ORDER_TIME,
+                               frame_attrs=['t_start'],
+                               use_physical_units=False)
+    assert list(time_ds[read.SERIES_COORD_FILE_BASE].values) == \
+        ['series011', 'series010', 'series009']
+    assert list(time_ds['t_start'].values) == [989, 990, 991]
+    assert 't_end' not in time_ds.coords
+
+    with pytest.raises(ValueError):
+        read.open_series(paths, order_by='size')
+    synthetic.write_scan_set(tmp_path, 'unnumbered', 16)
+    with pytest.raises(ValueError, match='number'):
+        read.open_series(paths, use_physical_units=False)
+
+
+def test_open_dataset_buffer():
+    filename = "./tests/data/chigwell009-M-Xp-Topo.nc"
+    expected_ds = read.open_dataset(filename, use_physical_units=False)
+    with open(filename, 'rb') as file:
+        contents = file.read()
+
+    ds = read.open_dataset(contents, filename="chigwell009-M-Xp-Topo.nc",
+                           use_physical_units=False)
+    xr.testing.assert_identical(ds, expected_ds)
+    ds = read.open_dataset(io.BytesIO(contents),
+                           filename=fn.parse_gxsm_filename(filename),
+                           use_physical_units=False, chunks={})
+    xr.testing.assert_identical(ds.compute(), expected_ds)
+
+    with pytest.raises(ValueError, match='filename'):
+        read.open_dataset(contents, use_physical_units=False)
+    with pytest.raises(ValueError, match='memory-mapped'):
+        read.open_dataset(contents, filename=filename, memmap=True)
+
+
+def test_open_mfdataset_buffers():
+    mf_filename = "./tests/data/chigwell009*.nc"
+    expected_ds = read.open_mfdataset(mf_filename, use_physical_units=False,
+                                      fast_merge=True).compute()
+    buffers = {}
+    for filename in sorted(glob.glob(mf_filename)):
+        with open(filename, 'rb') as file:
+            buffers[os.path.basename(filename)] = file.read()
+
+    ds = read.open_mfdataset(buffers, use_physical_units=False)
+    xr.testing.assert_identical(ds.compute(), expected_ds)
+
+
+def test_open_spec_buffer():
+    spec_filename = './tests/data/test007-VP003-VP.vpdata'
+    expected_df = read.open_spec(spec_filename)
+    with open(spec_filename, 'rb') as file:
+        contents = file.read()
+
+    for obj in [contents, io.BytesIO(contents),
+                io.StringIO(contents.decode())]:
+        df = read.open_spec(obj)
+        assert df.equals(expected_df)
+        assert df.attrs == expected_df.attrs
+    with open(spec_filename, 'rb') as file:
+        read.open_spec(file)
+        # File objects are left open
+        assert not file.closed
+
+    chunks = list(read.iter_spec(io.BytesIO(contents), chunk_size=40))
+    assert (pd.concat(chunks).to_numpy() == expected_df.to_numpy()).all()
+    assert read.open_spec_metadata(contents) == \
+        read.open_spec_metadata(spec_filename)
+    with pytest.raises(ValueError, match='cached'):
+        read.open_spec(contents, cache='unused')
+
+
+def test_open_many_buffers(tmp_path):
+    spec_filename = './tests/data/test007-VP003-VP.vpdata'
+    paths = [str(tmp_path / f'grid-VP{i:03d}-VP.vpdata') for i in range(2)]
+    for i, path in enumerate(paths):
+        write_spec_at_position(spec_filename, path, i, 0)
+    buffers = {}
+    for path in paths:
+        with open(path, 'rb') as file:
+            buffers[os.path.basename(path)] = file.read()
+    buffers[os.path.basename(paths[1])] = io.BytesIO(
+        buffers[os.path.basename(paths[1])])
+
+    df = read.open_spec_many(dict(buffers), workers=2)
+    expected_df = read.open_spec_many(paths, workers=1)
+    assert list(df.index.get_level_values('file').unique()) == list(buffers)
+    assert (df.to_numpy() == expected_df.to_numpy()).all()
+
+    buffers[os.path.basename(paths[1])].seek(0)
+    grid_ds = read.open_spec_grid(buffers, workers=1)
+    expected_ds = read.open_spec_grid(paths, workers=1)
+    assert list(grid_ds[spec.GRID_COORD_PATH].values.ravel()) == \
+        list(buffers)
+    xr.testing.assert_identical(grid_ds.drop_vars(spec.GRID_COORD_PATH),
+                                expected_ds.drop_vars(spec.GRID_COORD_PATH))
+
+    for i in [2, 1]:
+        synthetic.write_scan_set(tmp_path, f'series{i:03d}', 16,
+                                 num_channels=2, seed=i)
+    scan_buffers = {}
+    for path in sorted(glob.glob(str(tmp_path / 'series*.nc'))):
+        with open(path, 'rb') as file:
+            scan_buffers[os.path.basename(path)] = io.BytesIO(file.read())
+    series_ds = read.open_series(scan_buffers, use_physical_units=False,
+                                 order_by=read.SERIES_ORDER_TIME)
+    expected_ds = read.open_series(str(tmp_path / 'series*.nc'),
+                                   use_physical_units=False,
+                                   order_by=read.SERIES_ORDER_TIME)
+    xr.testing.assert_identical(series_ds.load(), expected_ds.load())
+
+    with pytest.raises(ValueError, match='open_mfdataset'):
+        read.open_directory(scan_buffers)
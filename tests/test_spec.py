@@ -1,5 +1,6 @@
 import pytest
 import numpy as np
+from datetime import datetime
 import gxsmread.spec as spec
 
 
@@ -87,6 +88,59 @@ def test_parse_useful_metadata(metadata, probe_pos,
         assert useful_md[key] == val
 
 
+def test_parse_useful_metadata_errors(metadata):
+    lines = metadata.splitlines()
+    md = spec.extract_raw_metadata(lines)
+    md['GXSM-Main-Offset'] = 'X0=0 Ang  Y0=0 nm'
+    with pytest.raises(ValueError, match="'Ang' and 'nm'"):
+        spec.parse_useful_metadata(md)
+    md['GXSM-Main-Offset'] = 'X0=0  Y0=0 Ang'
+    with pytest.raises(ValueError, match='units'):
+        spec.parse_useful_metadata(md)
+
+
+def test_tokenize_metadata(metadata):
+    lines = metadata.splitlines()
+    md = spec.extract_raw_metadata(lines)
+    typed_md = spec.tokenize_metadata(md)
+
+    assert typed_md.keys() == md.keys()
+    assert typed_md['GXSM Vector Probe Data'] == {'VPVersion': 0.02,
+                                                  'vdate': 20070227}
+    assert typed_md['GXSM-Main-Offset'] == {
+        'X0': spec.SpecQuantity(0.0, 'Ang'),
+        'Y0': spec.SpecQuantity(0.0, 'Ang'),
+        'iX0': spec.SpecQuantity(-999999.0, 'Pix')}
+    assert typed_md['DSP SCANCOORD POSITION'] == {}
+    assert typed_md['GXSM-DSP-Control-FB'] == {
+        'Bias': spec.SpecQuantity(0.1, 'V'),
+        'Current': spec.SpecQuantity(0.0, 'nA')}
+    assert typed_md['GXSM-DSP-Control-STS'] == {'#IV': 1}
+    assert typed_md['GXSM-DSP-Control-LOCKIN'] == {
+        'AC_amp': [spec.SpecQuantity(0.02, 'V'), 0, 14, 0],
+        'AC_frq': spec.SpecQuantity(4687.5, 'Hz'),
+        'AC_phaseA': spec.SpecQuantity(0.0, 'deg'),
+        'AC_phaseB': spec.SpecQuantity(90.0, 'deg'),
+        'AC_avg_cycles': 32}
+    assert typed_md['GXSM-Main-Comment'] == {
+        'comment': 'nlt-user@nlt-afm Session Date: Wed Feb 26 15:10:56 2025'}
+    assert typed_md['Date'] == {'date': datetime(2025, 2, 26, 15, 26, 3)}
+
+    useful_md = spec.parse_useful_metadata(md, typed=True)
+    assert useful_md[spec.KEY_DATE] == datetime(2025, 2, 26, 15, 26, 3)
+    assert (useful_md[spec.KEY_PROBE_POS_X],
+            useful_md[spec.KEY_PROBE_POS_Y]) == (0.0, 0.0)
+
+
+def test_tokenize_metadata_date():
+    # Day and month names are matched explicitly (not with the locale).
+    typed_md = spec.tokenize_metadata(
+        {'Date': 'date=Thu Feb  6 09:05:01 2025',
+         'Invalid': 'date=Sun Feb 30 09:05:01 2025'})
+    assert typed_md['Date'] == {'date': datetime(2025, 2, 6, 9, 5, 1)}
+    assert typed_md['Invalid'] == {'date': 'Sun Feb 30 09:05:01 2025'}
+
+
 # ----- Data Testing ----- #
 @pytest.fixture
 def spec_data():
@@ -146,3 +200,79 @@ def test_extract_data(spec_data, expected_names, expected_units, expected_data):
     assert received_names == expected_names
     assert received_units == expected_units
     assert (received_data == expected_data).all()
+
+
+def test_extract_data_usecols(spec_data, expected_names, expected_units,
+                              expected_data):
+    lines = spec_data.splitlines()
+    usecols = [0, 'Zmon', -1]
+    received_names, received_units, received_data = spec.extract_data(
+        lines, usecols=usecols)
+
+    col_indices = [0, 3, 5]
+    assert received_names == [expected_names[i] for i in col_indices]
+    assert received_units == [expected_units[i] for i in col_indices]
+    assert (received_data == expected_data[:, col_indices]).all()
+
+
+def test_extract_data_dtype(spec_data):
+    lines = spec_data.splitlines()
+    _, _, received_data = spec.extract_data(lines, dtype=np.float64)
+
+    assert received_data.dtype == np.float64
+    assert received_data[0, 1] == -2.763450991873e+01
+
+
+def test_extract_data_bad_row(spec_data):
+    lines = spec_data.splitlines()
+    lines[5] = lines[5].rsplit(spec.DATA_SEP, 1)[0]  # Drop the last column
+
+    # Data starts at file line 4, so file line 6 is data row 2.
+    with pytest.raises(ValueError, match='Data row 2 \\(file line 6\\)'):
+        spec.extract_data(lines)
+    with pytest.raises(ValueError, match='Data row 2 \\(file line 6\\)'):
+        spec.extract_data(lines, usecols=[0, 1])
+
+
+# ----- Streaming Reader Testing ----- #
+@pytest.fixture
+def spec_filename():
+    return './tests/data/test007-VP003-VP.vpdata'
+
+
+def test_spec_reader(spec_filename):
+    with open(spec_filename, 'r') as file:
+        lines = file.readlines()
+    exp_names, exp_units, exp_data = spec.extract_data(lines)
+
+    with open(spec_filename, 'r') as file:
+        reader = spec.SpecReader(file)
+        assert reader.raw_metadata == spec.extract_raw_metadata(lines)
+        assert reader.names == exp_names
+        assert reader.units == exp_units
+        assert reader.vp_header is None
+
+        chunks = list(reader.iter_data(chunk_size=30))
+        assert [len(chunk) for chunk in chunks] == [30, 30, 30, 10]
+        assert (np.concatenate(chunks) == exp_data).all()
+
+        with pytest.raises(RuntimeError):
+            reader.read_data()
+
+    assert len(reader.channel_map) == 23
+    assert reader.channel_map[0] == spec.SpecChannel('ADC0-I', 16, 12,
+                                                     0.00305185090212,
+                                                     'nA', True)
+    assert [c.label for c in reader.channel_map if c.active] == \
+        ['ADC0-I', 'ADC7', 'Zmon', 'ZS']
+
+    vp_names, vp_units, vp_data = reader.vp_header
+    assert vp_names == ['Index', 'time', 'dt', 'X', 'Y', 'Z', 'Sec']
+    assert vp_units == ['', 'ms', 'ms', 'Ang', 'Ang', 'Ang', '']
+    assert vp_data.shape == (8, 7)
+    assert vp_data[1, 1] == 2.215560000000e+03
+
+
+def test_spec_reader_bad_file(spec_data):
+    with pytest.raises(AssertionError):
+        spec.SpecReader(spec_data.splitlines())
@@ -0,0 +1,95 @@
+import os
+import pytest
+import numpy as np
+import xarray as xr
+import gxsmread.filename as fn
+import gxsmread.netcdf3 as netcdf3
+import gxsmread.preprocess as pp
+import gxsmread.read as read
+import gxsmread.spec as spec
+import gxsmread.synthetic as synthetic
+
+
+def test_write_scan_set(tmp_path):
+    paths = synthetic.write_scan_set(tmp_path, 'scan', dimx=32, dimy=24,
+                                     num_channels=4, seed=0)
+    assert [os.path.basename(path) for path in paths] == \
+        ['scan-M-Xp-Topo.nc', 'scan-Xm-Topo.nc', 'scan-Xp-ADC0.nc',
+         'scan-Xm-ADC0.nc']
+    assert fn.parse_gxsm_filename(paths[0]).is_main_file
+
+    raw_ds = xr.open_dataset(paths[0])
+    assert pp.is_gxsm_file(raw_ds)
+    assert raw_ds['FloatField'].dims == ('time', 'value', 'dimy', 'dimx')
+    assert raw_ds['FloatField'].shape == (1, 1, 24, 32)
+    assert len(raw_ds.variables) > 100
+    assert raw_ds['title'].values.tobytes() == b'scan'
+    assert raw_ds['basename'].values.tobytes() == b'scan-M-Xp-Topo.nc'
+
+    # Backward scans have a reversed dimx, but are from the same scan
+    assert (xr.open_dataset(paths[1])['dimx'].values ==
+            raw_ds['dimx'].values[::-1]).all()
+    assert len({pp.get_scan_fingerprint(path) for path in paths}) == 1
+
+    ds = read.open_mfdataset(paths, use_physical_units=False)
+    assert list(ds.data_vars) == ['Topo-Xp', 'Topo-Xm', 'ADC0-Xp', 'ADC0-Xm']
+    assert ds['Topo-Xp'].shape == (24, 32)
+
+
+def test_write_scan_set_bad_num_channels(tmp_path):
+    with pytest.raises(ValueError):
+        synthetic.write_scan_set(tmp_path, num_channels=0)
+    with pytest.raises(ValueError):
+        synthetic.write_scan_set(
+            tmp_path, num_channels=len(synthetic.SCAN_CHANNELS) + 1)
+
+
+def test_create_scan_dataset(tmp_path):
+    data = np.arange(12 * 16, dtype=np.float32).reshape(12, 16)
+    filename = tmp_path / synthetic.get_scan_filename('scan', 'Xp', 'ADC1',
+                                                      is_main_file=True)
+    synthetic.create_scan_dataset('ADC1', 'Xp', dimx=16, dimy=12,
+                                  data=data).to_netcdf(
+        filename, format='NETCDF3_CLASSIC')
+    assert netcdf3.read_header(filename).version == netcdf3.VERSION_CLASSIC
+
+    ds = read.open_dataset(filename, use_physical_units=False)
+    np.testing.assert_allclose(ds['ADC1-Xp'].values,
+                               data * np.float32(synthetic.ADC_DZ))
+
+
+@pytest.mark.parametrize('num_rows', [1, 100, synthetic.SPEC_CHUNK_SIZE + 1])
+def test_write_spec_file(tmp_path, num_rows):
+    columns = [('ADC0-I', 'nA'), ('ADC1', 'V'), ('Bias', 'V')]
+    filename = synthetic.write_spec_file(
+        tmp_path / 'spec.vpdata', num_rows, columns,
+        metadata={'GXSM-Main-Offset': 'X0=12.5 Ang  Y0=-3 Ang'}, seed=0)
+
+    df = read.open_spec(filename)
+    assert list(df.columns) == ['Index', 'ADC0-I', 'ADC1', 'Bias',
+                                'Block-Start-Index']
+    assert list(df.attrs[spec.KEY_UNITS].values()) == ['', 'nA', 'V', 'V', '']
+    assert len(df) == num_rows
+    assert (df['Index'].values == np.arange(num_rows)).all()
+    assert (df.attrs[spec.KEY_PROBE_POS_X],
+            df.attrs[spec.KEY_PROBE_POS_Y]) == ('12.5', '-3')
+
+    with open(filename) as file:
+        reader = spec.SpecReader(file)
+        reader.read_data()
+    assert [channel.label for channel in reader.channel_map
+            if channel.active] == ['ADC0-I', 'ADC1', 'Bias']
+    assert reader.vp_header[2].shape == (synthetic.SPEC_NUM_SECTIONS, 7)
+
+
+def test_write_corpus(tmp_path):
+    paths = synthetic.write_corpus(tmp_path / 'corpus', num_scan_sets=3,
+                                   dimx=16, num_channels=2, num_spec_files=2,
+                                   workers=1)
+    assert len(paths) == 3 * 2 + 2
+    assert all(os.path.exists(path) for path in paths)
+
+    scan_sets = read.find_scan_sets(tmp_path / 'corpus')
+    assert len(scan_sets) == 3
+    assert len({pp.get_scan_fingerprint(scan_paths[0])
+                for scan_paths in scan_sets.values()}) == 3
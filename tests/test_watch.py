@@ -0,0 +1,241 @@
+import os
+import sys
+import time
+import pytest
+import gxsmread.catalog as catalog
+import gxsmread.convert as convert
+import gxsmread.read as read
+import gxsmread.synthetic as synthetic
+import gxsmread.watch as watch
+
+# The fixtures are written with xarray's (netCDF3) scipy engine.
+pytest.importorskip('scipy')
+
+
+def age(*paths, seconds=10):
+    """Set the modification time of files to the past."""
+    mtime = time.time() - seconds
+    for path in paths:
+        os.utime(path, (mtime, mtime))
+
+
+class Clock:
+    """Fake time.time() of the Watcher polls."""
+
+    def __init__(self):
+        self.now = time.time()
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds=watch.DEFAULT_STABLE_TIME):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(watch.time, 'time', clock.time)
+    return clock
+
+
+@pytest.fixture
+def directory(tmp_path):
+    directory = tmp_path / 'data'
+    directory.mkdir()
+    return directory
+
+
+def poll_stable(watcher, clock):
+    """Poll twice, stable_time apart: the files unchanged are then stable."""
+    assert not watcher.poll()
+    clock.advance(watcher.stable_time)
+    return watcher.poll()
+
+
+def test_poll_scan_set(directory, tmp_path, clock):
+    paths = synthetic.write_scan_set(directory, 'scan', 16, num_channels=2,
+                                     seed=0, engine='scipy')
+    with watch.Watcher(directory, catalog=tmp_path / 'catalog.sqlite') \
+            as watcher:
+        # Files just seen are not stable yet
+        assert not watcher.poll()
+        assert watcher.catalog.query() == []
+
+        clock.advance()
+        event = watcher.poll()
+        assert event.scan_sets == {'scan': sorted(paths)}
+        assert event.errors == {}
+        assert sorted(watcher.catalog.query()) == sorted(paths)
+        assert not watcher.poll()
+
+        # A later channel re-reports the scan set
+        new_path = directory / synthetic.get_scan_filename('scan', 'Xp',
+                                                           'ADC0')
+        ds = synthetic.create_scan_dataset('ADC0', 'Xp', 16, 16)
+        ds.to_netcdf(new_path, format='NETCDF3_CLASSIC', engine='scipy')
+        event = poll_stable(watcher, clock)
+        assert event.scan_sets == {'scan': sorted(paths + [str(new_path)])}
+
+        # Removed files are forgotten
+        os.remove(new_path)
+        event = watcher.poll()
+        assert event.removed == [str(new_path)]
+        assert str(new_path) not in watcher.catalog.query()
+
+
+def test_poll_waits_for_main_file(directory, clock):
+    paths = synthetic.write_scan_set(directory, 'scan', 16, num_channels=3,
+                                     seed=0, engine='scipy')
+    watcher = watch.Watcher(directory)
+    watcher.poll()
+    # The main file is still being written
+    age(paths[0])
+    clock.advance()
+    assert watcher.poll().scan_sets == {}
+    clock.advance()
+    assert watcher.poll().scan_sets == {'scan': sorted(paths)}
+
+
+def test_poll_waits_for_pending_channels(directory, clock):
+    paths = synthetic.write_scan_set(directory, 'scan', 16, num_channels=3,
+                                     seed=0, engine='scipy')
+    watcher = watch.Watcher(directory)
+    watcher.poll()
+    age(paths[2])
+    clock.advance()
+    assert watcher.poll().scan_sets == {}
+    clock.advance()
+    assert watcher.poll().scan_sets == {'scan': sorted(paths)}
+
+
+def test_poll_modified_file(directory, clock):
+    paths = synthetic.write_scan_set(directory, 'scan', 16, seed=0,
+                                     engine='scipy')
+    watcher = watch.Watcher(directory)
+    assert poll_stable(watcher, clock).scan_sets == {'scan': paths}
+    age(*paths, seconds=5)
+    assert poll_stable(watcher, clock).scan_sets == {'scan': paths}
+
+
+def test_poll_old_mtime(directory, clock):
+    # A file copied with its mtime preserved (e.g. rsync), still being
+    # written: its mtime does not make it stable.
+    path = directory / 'test001-VP001-VP.vpdata'
+    path.write_text('#')
+    age(path, seconds=3600)
+    watcher = watch.Watcher(directory)
+    assert not watcher.poll()
+    with open(path, 'a') as file:
+        file.write('#')
+    age(path, seconds=3500)
+    clock.advance()
+    assert not watcher.poll()
+    clock.advance(watcher.stable_time / 2)
+    assert not watcher.poll()
+    clock.advance(watcher.stable_time / 2)
+    assert watcher.poll().spec_files == [str(path)]
+
+
+def test_poll_spec_files(directory, tmp_path, clock):
+    filename = synthetic.write_spec_file(directory / 'test001-VP001-VP.vpdata',
+                                         seed=0)
+    bad_filename = directory / 'bad-VP001-VP.vpdata'
+    bad_filename.write_text('not a spec file')
+
+    watcher = watch.Watcher(directory, spec_cache=tmp_path / 'cache')
+    event = poll_stable(watcher, clock)
+    assert event.spec_files == [str(filename)]
+    assert list(event.errors) == [str(bad_filename)]
+    assert watcher.spec_cache.get(filename) is not None
+
+
+def test_poll_convert(directory, tmp_path, clock):
+    output_dir = directory / 'converted'
+    synthetic.write_scan_set(directory, 'scan', 16, num_channels=2, seed=0,
+                             engine='scipy')
+    # NetCDF4 stores need no optional dependencies
+    watcher = watch.Watcher(directory, output_dir=output_dir,
+                            output_format=convert.FORMAT_NETCDF,
+                            use_physical_units=False, workers=4)
+    event = poll_stable(watcher, clock)
+    assert list(event.scan_sets) == ['scan']
+    assert os.listdir(output_dir) == ['scan.nc']
+    # The output directory is not watched
+    assert not watcher.poll()
+
+
+def test_poll_sub_directories(directory, tmp_path, clock):
+    # Two sessions holding scans with the same file_base
+    output_dir = tmp_path / 'converted'
+    paths = {}
+    for session in ['day1', 'day2']:
+        (directory / session).mkdir()
+        paths[os.path.join(session, 'scan')] = synthetic.write_scan_set(
+            directory / session, 'scan', 16, seed=0, engine='scipy')
+    watcher = watch.Watcher(directory, output_dir=output_dir,
+                            output_format=convert.FORMAT_NETCDF,
+                            use_physical_units=False)
+    event = poll_stable(watcher, clock)
+    assert event.scan_sets == paths
+    assert event.errors == {}
+    for scan_set in paths:
+        assert convert.get_store_path(output_dir, scan_set,
+                                      convert.FORMAT_NETCDF).exists()
+
+
+def test_poll_convert_retry(directory, tmp_path, clock, monkeypatch):
+    output_dir = tmp_path / 'converted'
+    synthetic.write_scan_set(directory, 'scan', 16, seed=0, engine='scipy')
+    watcher = watch.Watcher(directory, output_dir=output_dir,
+                            output_format=convert.FORMAT_NETCDF,
+                            use_physical_units=False)
+
+    def failing_open_mfdataset(*args, **kwargs):
+        raise OSError('unreadable')
+    with monkeypatch.context() as patch:
+        patch.setattr(read, 'open_mfdataset', failing_open_mfdataset)
+        event = poll_stable(watcher, clock)
+        assert event.scan_sets == {}
+        assert isinstance(event.errors['scan'], OSError)
+
+    # The failed scan set is converted on the next poll
+    event = watcher.poll()
+    assert list(event.scan_sets) == ['scan']
+    assert event.errors == {}
+    assert os.listdir(output_dir) == ['scan.nc']
+    assert not watcher.poll()
+
+
+def test_watcher_output_format(directory, tmp_path, monkeypatch):
+    with pytest.raises(ValueError):
+        watch.Watcher(directory, output_dir=tmp_path / 'converted',
+                      output_format='hdf4')
+    monkeypatch.setitem(sys.modules, 'numcodecs', None)
+    with pytest.raises(ImportError, match="'zarr' optional dependencies"):
+        watch.Watcher(directory, output_dir=tmp_path / 'converted')
+    # No conversion, no output format needed
+    watch.Watcher(directory)
+
+
+def test_watch(directory):
+    synthetic.write_scan_set(directory, 'scan', 16, seed=0, engine='scipy')
+    events = list(watch.watch(directory, poll_interval=0.01, timeout=0.2,
+                              stable_time=0.05))
+    assert len(events) == 1
+    ds = read.open_mfdataset(events[0].scan_sets['scan'],
+                             use_physical_units=False)
+    assert 'Topo-Xp' in ds
+
+
+def test_catalog_update(directory, tmp_path):
+    paths = synthetic.write_scan_set(directory, 'scan', 16, num_channels=2,
+                                     seed=0, engine='scipy')
+    with catalog.Catalog(tmp_path / 'catalog.sqlite') as scan_catalog:
+        assert scan_catalog.update(paths[:1]) == {}
+        assert scan_catalog.query() == paths[:1]
+        assert scan_catalog.update(paths) == {}
+        assert sorted(scan_catalog.query()) == sorted(paths)
+        os.remove(paths[0])
+        scan_catalog.update(paths[:1])
+        assert scan_catalog.query() == paths[1:]